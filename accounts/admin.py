@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.hashers import identify_hasher
-from .models import CreditCard, CreditCardExpense, TripPlan, TripToll, UserAccount, Vehicle, VehicleExpense, VehicleFrequentDestination
+from .models import CreditCard, CreditCardExpense, OutboundMessage, ReceiptBlob, TripPlan, TripToll, UserAccount, Vehicle, VehicleExpense, VehicleFrequentDestination
+from .views import rebuild_credit_card_bills, refresh_trip_totals, sync_credit_card_bills
 
 @admin.register(UserAccount)
 class UserAccountAdmin(admin.ModelAdmin):
@@ -57,14 +58,36 @@ class TripPlanAdmin(admin.ModelAdmin):
     list_display = ("title", "vehicle", "date", "distance_km", "user", "created_at")
     search_fields = ("title", "vehicle__name", "user__phone_number")
     list_filter = ("date",)
+    readonly_fields = ("toll_total", "estimated_cost")
     inlines = [TripTollInline]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_trip_totals(form.instance)
+
 
 @admin.register(CreditCard)
 class CreditCardAdmin(admin.ModelAdmin):
     list_display = ("nickname", "last4", "parent_card", "closing_day", "due_day", "best_purchase_day", "limit_amount", "miles_per_point", "user")
     search_fields = ("nickname", "last4", "user__phone_number")
     list_filter = ("closing_day", "due_day", "best_purchase_day", "parent_card")
+    readonly_fields = ("billing_owner",)
+
+    # titular, fechamento ou vencimento podem mudar: refaz titulares, competencias e faturas do usuario
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        rebuild_credit_card_bills(obj.user)
+
+    def delete_model(self, request, obj):
+        user = obj.user
+        super().delete_model(request, obj)
+        rebuild_credit_card_bills(user)
+
+    def delete_queryset(self, request, queryset):
+        users = {card.user for card in queryset.select_related("user")}
+        super().delete_queryset(request, queryset)
+        for user in users:
+            rebuild_credit_card_bills(user)
 
 
 @admin.register(CreditCardExpense)
@@ -72,3 +95,39 @@ class CreditCardExpenseAdmin(admin.ModelAdmin):
     list_display = ("card", "date", "category", "amount", "user")
     search_fields = ("card__last4", "category", "description", "user__phone_number")
     list_filter = ("category", "date")
+    readonly_fields = ("competence_year", "competence_month")
+
+    # mesmo caminho das views: carimba a competencia e recalcula so as faturas tocadas
+    def save_model(self, request, obj, form, change):
+        old = CreditCardExpense.objects.select_related("card").filter(pk=obj.pk).first() if change else None
+        super().save_model(request, obj, form, change)
+        if old is not None and old.card_id != obj.card_id:
+            sync_credit_card_bills(obj.user, old.card, purchase_dates=[old.date])
+            sync_credit_card_bills(obj.user, obj.card, purchase_dates=[obj.date])
+        else:
+            dates = [obj.date] if old is None else [old.date, obj.date]
+            sync_credit_card_bills(obj.user, obj.card, purchase_dates=dates)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        sync_credit_card_bills(obj.user, obj.card, purchase_dates=[obj.date])
+
+    def delete_queryset(self, request, queryset):
+        touched = [(e.user, e.card, e.date) for e in queryset.select_related("user", "card")]
+        super().delete_queryset(request, queryset)
+        for user, card, purchase_date in touched:
+            sync_credit_card_bills(user, card, purchase_dates=[purchase_date])
+
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    list_display = ("target_url", "status", "attempts", "next_attempt_at", "last_status_code", "sent_at", "user")
+    search_fields = ("target_url", "last_error", "user__phone_number")
+    list_filter = ("status", "target_url")
+
+
+@admin.register(ReceiptBlob)
+class ReceiptBlobAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "content_type", "size", "ref_count", "thumbnail_status", "created_at")
+    search_fields = ("sha256",)
+    list_filter = ("thumbnail_status", "content_type")
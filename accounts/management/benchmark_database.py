@@ -0,0 +1,17 @@
+from django.core.management.base import CommandError
+from django.db import connections
+
+
+LOCAL_HOSTS = {"", "localhost", "127.0.0.1", "::1"}
+
+
+def resolve_benchmark_database(alias):
+    # nunca cair no default por acaso: ele aponta para o Postgres de producao
+    if not alias:
+        raise CommandError("Informe --database (ou GENFIN_BENCHMARK_DATABASE) com um banco local descartavel.")
+    if alias not in connections.settings:
+        raise CommandError(f"Banco {alias!r} nao existe em DATABASES.")
+    host = str(connections.settings[alias].get("HOST") or "")
+    if host not in LOCAL_HOSTS and not host.startswith("/"):
+        raise CommandError(f"Banco {alias!r} aponta para {host}; o benchmark so roda em banco local.")
+    return alias
@@ -0,0 +1,661 @@
+import io
+import json
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from accounts import urls as account_urls
+from accounts.management.benchmark_database import resolve_benchmark_database
+from accounts.models import (
+    CreditCard,
+    CreditCardExpense,
+    FinancialEntry,
+    OutboundMessage,
+    PlannedExpense,
+    PlannedIncome,
+    PlannedReserve,
+    TripPlan,
+    TripToll,
+    UserAccount,
+    Vehicle,
+    VehicleExpense,
+    VehicleFrequentDestination,
+)
+from accounts.views import (
+    cache_usd_brl_quote,
+    fallback_usd_brl_quote,
+    generate_receipt_thumbnail,
+    rebuild_credit_card_bills,
+    rebuild_entry_rollups,
+    store_receipt_blob,
+)
+
+
+DATASET_SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+BENCH_PHONE = "00benchapi0001"
+BENCH_PASSWORD = "bench-api"
+# rotas que exigem staff do admin do Django em vez da sessao do GenFin
+STAFF_ROUTES = {"metrics/requests/"}
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(sorted_values, pct):
+    # nearest-rank: com poucas amostras o p95 e o pior caso, sem interpolar
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula uma massa sintetica, chama cada rota de /api/ pelo client de testes e grava "
+        "consultas, latencia p50/p95 e pico de memoria em um relatorio JSON. Tudo roda em uma "
+        "transacao desfeita no final; rotas que escrevem rodam em savepoints desfeitos a cada chamada. "
+        "As views usam a conexao default, entao ela e apontada para o banco local de --database "
+        "(ou GENFIN_BENCHMARK_DATABASE) enquanto o benchmark roda."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", choices=sorted(DATASET_SIZES), default="1k", help="Quantidade de movimentacoes.")
+        parser.add_argument("--cards", type=int, default=5, help="Cartoes de credito (1 a 50).")
+        parser.add_argument("--vehicles", type=int, default=3, help="Veiculos (1 a 30).")
+        parser.add_argument("--repeat", type=int, default=10, help="Chamadas medidas por rota.")
+        parser.add_argument("--route", default="", help="Mede so as rotas que contem este trecho.")
+        parser.add_argument("--output", default="", help="Arquivo do relatorio JSON (padrao: stdout).")
+        parser.add_argument("--baseline", default="", help="Relatorio anterior para comparar.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.25, help="Aumento relativo de p95 aceito contra o baseline."
+        )
+        parser.add_argument(
+            "--min-delta-ms", type=float, default=5.0, help="Diferenca de p95 abaixo disso e tratada como ruido."
+        )
+        parser.add_argument(
+            "--database",
+            default=os.getenv("GENFIN_BENCHMARK_DATABASE", ""),
+            help="Alias de DATABASES usado no benchmark (obrigatorio; precisa ser um banco local).",
+        )
+
+    def handle(self, *args, **options):
+        if not 1 <= options["cards"] <= 50:
+            raise CommandError("--cards deve estar entre 1 e 50")
+        if not 1 <= options["vehicles"] <= 30:
+            raise CommandError("--vehicles deve estar entre 1 e 30")
+        if options["repeat"] < 1:
+            raise CommandError("--repeat deve ser maior que zero")
+        using = resolve_benchmark_database(options["database"])
+
+        entries = DATASET_SIZES[options["size"]]
+        # client de testes, sessao e views falam com a conexao default desta thread;
+        # ela passa a ser a do banco local ate o fim da medicao
+        default_connection = connections["default"]
+        connections["default"] = connections[using]
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+                try:
+                    with transaction.atomic():
+                        started = time.perf_counter()
+                        ctx = self.seed(entries, options["cards"], options["vehicles"])
+                        seed_seconds = time.perf_counter() - started
+                        scenarios = [s for s in self.build_scenarios(ctx) if options["route"] in s[1]]
+                        results = self.measure(ctx, scenarios, options["repeat"])
+                        raise Rollback()
+                except Rollback:
+                    pass
+            vendor = connection.vendor
+        finally:
+            connections["default"] = default_connection
+
+        report = {
+            "generated_at": timezone.now().isoformat(),
+            "database": vendor,
+            "dataset": {
+                "size": options["size"],
+                "entries": entries,
+                "cards": options["cards"],
+                "vehicles": options["vehicles"],
+                "seed_seconds": round(seed_seconds, 2),
+            },
+            "repeat": options["repeat"],
+            "routes": results,
+            "uncovered": self.uncovered_routes(scenarios) if not options["route"] else [],
+        }
+        payload = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                fh.write(payload + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Relatorio gravado em {options['output']}"))
+        else:
+            self.stdout.write(payload)
+
+        for route in report["uncovered"]:
+            self.stderr.write(f"Rota sem cenario de benchmark: {route}")
+        if options["baseline"]:
+            self.compare(options["baseline"], results, options["tolerance"], options["min_delta_ms"])
+
+    def seed(self, entry_count, card_count, vehicle_count):
+        rng = random.Random(42)
+        today = date.today()
+        start = today - timedelta(days=3 * 365)
+        categories = ["Mercado", "Lazer", "Saude", "Transporte", "Moradia"]
+
+        def random_date():
+            return start + timedelta(days=rng.randrange(3 * 365 + 1))
+
+        def random_amount():
+            return Decimal(rng.randrange(100, 50000)) / 100
+
+        user = UserAccount(phone_number=BENCH_PHONE, first_name="Bench")
+        user.set_password(BENCH_PASSWORD)
+        user.save()
+
+        FinancialEntry.objects.bulk_create(
+            (
+                FinancialEntry(
+                    user=user,
+                    entry_type=rng.choice(["RECEITA", "DESPESA"]),
+                    amount=random_amount(),
+                    category=rng.choice(categories),
+                    date=random_date(),
+                )
+                for _ in range(entry_count)
+            ),
+            batch_size=5000,
+        )
+        PlannedExpense.objects.bulk_create(
+            (
+                PlannedExpense(
+                    user=user,
+                    date=random_date(),
+                    category=rng.choice(categories),
+                    amount=random_amount(),
+                    is_recurring=i % 10 == 0,
+                    recurrence_frequency="SEMANAL" if i % 20 == 0 else "MENSAL",
+                    is_paid=i % 3 == 0,
+                )
+                for i in range(max(entry_count // 20, 10))
+            ),
+            batch_size=5000,
+        )
+        for model in (PlannedIncome, PlannedReserve):
+            model.objects.bulk_create(
+                (
+                    model(user=user, date=random_date(), category="Fixo", amount=random_amount(), is_recurring=i % 2 == 0)
+                    for i in range(max(entry_count // 100, 5))
+                ),
+                batch_size=5000,
+            )
+
+        parent = CreditCard.objects.create(user=user, nickname="Titular", last4="0000", closing_day=14, due_day=20)
+        cards = [parent] + CreditCard.objects.bulk_create(
+            CreditCard(
+                user=user,
+                nickname=f"Cartao {i}",
+                last4=f"{i:04d}",
+                parent_card=parent if i % 3 == 0 else None,
+                closing_day=1 + i % 28,
+                due_day=1 + (i * 7) % 28,
+            )
+            for i in range(1, card_count)
+        )
+        CreditCardExpense.objects.bulk_create(
+            (
+                CreditCardExpense(
+                    user=user,
+                    card=cards[i % len(cards)],
+                    date=random_date(),
+                    category=rng.choice(categories),
+                    amount=random_amount(),
+                )
+                for i in range(max(entry_count // 5, card_count))
+            ),
+            batch_size=5000,
+        )
+
+        vehicles = Vehicle.objects.bulk_create(
+            Vehicle(
+                user=user,
+                name=f"Carro {i}",
+                ipva_cost=1200,
+                documentation_cost=300,
+                fuel_km_per_liter=10,
+                fuel_price_per_liter=Decimal("5.5"),
+                financing_remaining_installments=i % 2 * 12,
+                financing_installment_value=800,
+            )
+            for i in range(vehicle_count)
+        )
+        VehicleExpense.objects.bulk_create(
+            (
+                VehicleExpense(
+                    user=user,
+                    vehicle=vehicles[i % len(vehicles)],
+                    date=random_date(),
+                    expense_type=rng.choice(["COMBUSTIVEL", "MANUTENCAO", "PEDAGIO", "SEGURO"]),
+                    amount=random_amount(),
+                    is_recurring=i % 20 == 0,
+                )
+                for i in range(max(entry_count // 10, vehicle_count))
+            ),
+            batch_size=5000,
+        )
+        destinations = VehicleFrequentDestination.objects.bulk_create(
+            VehicleFrequentDestination(
+                user=user,
+                vehicle=vehicle,
+                name=name,
+                periodicity=periodicity,
+                distance_km=25,
+                has_paid_parking=periodicity == "SEMANAL",
+                parking_cost=15,
+            )
+            for vehicle in vehicles
+            for name, periodicity in (("Trabalho", "SEMANAL"), ("Familia", "MENSAL"))
+        )
+        trips = TripPlan.objects.bulk_create(
+            TripPlan(user=user, vehicle=vehicle, title="Viagem", date=today, distance_km=400, lodging_cost=300)
+            for vehicle in vehicles
+        )
+        TripToll.objects.bulk_create(
+            TripToll(trip=trip, name=f"Pedagio {i}", amount=12) for trip in trips for i in range(2)
+        )
+
+        rebuild_entry_rollups(user)
+        rebuild_credit_card_bills(user)
+        cache_usd_brl_quote(fallback_usd_brl_quote(), timezone.now())
+
+        image = io.BytesIO()
+        Image.new("RGB", (1200, 900), "white").save(image, "PNG")
+        receipt_entry = user.entries.order_by("-date", "-id").first()
+        blob = store_receipt_blob(SimpleUploadedFile("recibo.png", image.getvalue(), content_type="image/png"))
+        receipt_entry.receipt_blob = blob
+        receipt_entry.receipt_file = blob.file.name
+        receipt_entry.save(update_fields=["receipt_file", "receipt_blob"])
+        generate_receipt_thumbnail(blob)
+
+        message = OutboundMessage.objects.create(
+            user=user,
+            target_url="http://127.0.0.1:9/bench",
+            payload={"text": "bench"},
+            next_attempt_at=timezone.now() + timedelta(days=1),
+        )
+
+        with connection.cursor() as cursor:
+            for model in (FinancialEntry, PlannedExpense, CreditCardExpense, VehicleExpense):
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+        self.stderr.write(
+            f"Massa criada: {entry_count} movimentacoes, {card_count} cartoes, {vehicle_count} veiculos."
+        )
+        return {
+            "user": user,
+            "today": today,
+            "entry": user.entries.exclude(id=receipt_entry.id).order_by("-date", "-id").first(),
+            "receipt_entry": receipt_entry,
+            "planned_expense": user.planned_expenses.filter(source_key="").first(),
+            "planned_income": user.planned_incomes.first(),
+            "planned_reserve": user.planned_reserves.first(),
+            "card": cards[-1],
+            "card_expense": user.credit_card_expenses.order_by("-date").first(),
+            "vehicle": vehicles[0],
+            "vehicle_expense": user.vehicle_expenses.first(),
+            "destination": destinations[0],
+            "trip": trips[0],
+            "message": message,
+        }
+
+    def build_scenarios(self, ctx):
+        # (metodo, rota em accounts/urls.py, caminho, corpo, escreve no banco)
+        today = ctx["today"]
+        iso = today.isoformat()
+        br = today.strftime("%d/%m/%Y")
+        month = {"month": today.month, "year": today.year}
+        phone = ctx["user"].phone_number
+        vehicle_id = ctx["vehicle"].id
+        card_id = ctx["card"].id
+        entry_id = ctx["entry"].id
+        receipt_id = ctx["receipt_entry"].id
+        trip_body = {
+            "vehicle_id": vehicle_id,
+            "title": "Serra",
+            "date": iso,
+            "distance_km": 320,
+            "lodging_cost": 250,
+            "meal_cost": 120,
+            "extra_cost": 40,
+            "tolls": [{"name": "Pedagio", "amount": 18.5}, {"name": "Pedagio 2", "amount": 9}],
+        }
+        vehicle_body = {"name": "Bench", "brand": "Marca", "model": "Modelo", "year": 2022, "fipe_value": 90000}
+        planned_body = {"date": iso, "category": "Bench", "amount": "150.00", "description": "bench", "is_recurring": True}
+        png = io.BytesIO()
+        Image.new("RGB", (800, 600), "gray").save(png, "PNG")
+
+        return [
+            ("POST", "validate-phone/", "/api/validate-phone/", {"phone_number": phone}, False),
+            (
+                "POST",
+                "register/",
+                "/api/register/",
+                {
+                    "phone_number": "00benchapi0002",
+                    "first_name": "Novo",
+                    "last_name": "Bench",
+                    "email": "novo@bench.invalid",
+                    "password": "senha-bench",
+                },
+                True,
+            ),
+            (
+                "POST",
+                "financial-entry/",
+                "/api/financial-entry/",
+                {"phone_number": phone, "categoria": "Bench", "data": br, "despesa": "12.50"},
+                True,
+            ),
+            (
+                "POST",
+                "financial-entry/bulk/",
+                "/api/financial-entry/bulk/",
+                {
+                    "entries": [
+                        {"phone_number": phone, "categoria": "Bench", "data": br, "despesa": f"{i}.00"}
+                        for i in range(1, 101)
+                    ]
+                },
+                True,
+            ),
+            ("POST", "login/", "/api/login/", {"phone_number": phone, "password": BENCH_PASSWORD}, False),
+            ("GET", "profile/", "/api/profile/", None, False),
+            ("PUT", "profile/", "/api/profile/", {"first_name": "Bench", "phone_number": phone}, True),
+            ("GET", "profile/manual-pdf/", "/api/profile/manual-pdf/", None, False),
+            ("GET", "profile/statement-pdf/", "/api/profile/statement-pdf/", month, False),
+            ("DELETE", "profile/reset-data/", "/api/profile/reset-data/", {"confirmation": "ZERAR"}, True),
+            ("GET", "dashboard/", "/api/dashboard/", None, False),
+            ("GET", "dashboard/bootstrap/", "/api/dashboard/bootstrap/", None, False),
+            ("GET", "dashboard/categories/", "/api/dashboard/categories/", None, False),
+            ("GET", "entries/", "/api/entries/", {"limit": 50}, False),
+            (
+                "PUT",
+                "entries/<int:entry_id>/",
+                f"/api/entries/{entry_id}/",
+                {"entry_type": "DESPESA", "category": "Bench", "amount": "99.90", "date": iso},
+                True,
+            ),
+            ("DELETE", "entries/<int:entry_id>/", f"/api/entries/{entry_id}/", None, True),
+            ("GET", "entries/<int:entry_id>/receipt/", f"/api/entries/{receipt_id}/receipt/", None, False),
+            ("POST", "entries/<int:entry_id>/receipt/", f"/api/entries/{entry_id}/receipt/", png, True),
+            ("DELETE", "entries/<int:entry_id>/receipt/", f"/api/entries/{receipt_id}/receipt/", None, True),
+            (
+                "GET",
+                "entries/<int:entry_id>/receipt/thumbnail/",
+                f"/api/entries/{receipt_id}/receipt/thumbnail/",
+                None,
+                False,
+            ),
+            ("GET", "planner/", "/api/planner/", None, False),
+            ("POST", "planner/create/", "/api/planner/create/", planned_body, True),
+            (
+                "PUT",
+                "planner/<int:expense_id>/",
+                f"/api/planner/{ctx['planned_expense'].id}/",
+                dict(planned_body, is_paid=True),
+                True,
+            ),
+            ("DELETE", "planner/<int:expense_id>/", f"/api/planner/{ctx['planned_expense'].id}/", None, True),
+            (
+                "GET",
+                "planner/occurrences/",
+                "/api/planner/occurrences/",
+                {"start": f"{today.year - 1}-01-01", "end": f"{today.year + 1}-12-31"},
+                False,
+            ),
+            ("GET", "planner/projection/", "/api/planner/projection/", dict(month, months=36), False),
+            ("GET", "forecast/", "/api/forecast/", {"months": 12}, False),
+            ("GET", "fixed-incomes/", "/api/fixed-incomes/", None, False),
+            ("POST", "fixed-incomes/create/", "/api/fixed-incomes/create/", planned_body, True),
+            (
+                "PUT",
+                "fixed-incomes/<int:income_id>/",
+                f"/api/fixed-incomes/{ctx['planned_income'].id}/",
+                planned_body,
+                True,
+            ),
+            (
+                "DELETE",
+                "fixed-incomes/<int:income_id>/",
+                f"/api/fixed-incomes/{ctx['planned_income'].id}/",
+                None,
+                True,
+            ),
+            ("GET", "reserves/", "/api/reserves/", None, False),
+            ("POST", "reserves/create/", "/api/reserves/create/", planned_body, True),
+            ("PUT", "reserves/<int:reserve_id>/", f"/api/reserves/{ctx['planned_reserve'].id}/", planned_body, True),
+            ("DELETE", "reserves/<int:reserve_id>/", f"/api/reserves/{ctx['planned_reserve'].id}/", None, True),
+            ("GET", "vehicles/", "/api/vehicles/", None, False),
+            ("POST", "vehicles/create/", "/api/vehicles/create/", vehicle_body, True),
+            ("PUT", "vehicles/<int:vehicle_id>/", f"/api/vehicles/{vehicle_id}/", vehicle_body, True),
+            ("DELETE", "vehicles/<int:vehicle_id>/", f"/api/vehicles/{vehicle_id}/", None, True),
+            ("GET", "vehicle-expenses/", "/api/vehicle-expenses/", {"vehicle_id": vehicle_id}, False),
+            (
+                "POST",
+                "vehicle-expenses/create/",
+                "/api/vehicle-expenses/create/",
+                {"vehicle_id": vehicle_id, "date": iso, "expense_type": "COMBUSTIVEL", "amount": "250.00"},
+                True,
+            ),
+            (
+                "PUT",
+                "vehicle-expenses/<int:expense_id>/",
+                f"/api/vehicle-expenses/{ctx['vehicle_expense'].id}/",
+                {"vehicle_id": vehicle_id, "date": iso, "expense_type": "MANUTENCAO", "amount": "480.00"},
+                True,
+            ),
+            (
+                "DELETE",
+                "vehicle-expenses/<int:expense_id>/",
+                f"/api/vehicle-expenses/{ctx['vehicle_expense'].id}/",
+                None,
+                True,
+            ),
+            ("GET", "vehicle-destinations/", "/api/vehicle-destinations/", {"vehicle_id": vehicle_id}, False),
+            (
+                "POST",
+                "vehicle-destinations/create/",
+                "/api/vehicle-destinations/create/",
+                {"vehicle_id": vehicle_id, "name": "Academia", "periodicity": "SEMANAL", "distance_km": 8},
+                True,
+            ),
+            (
+                "PUT",
+                "vehicle-destinations/<int:destination_id>/",
+                f"/api/vehicle-destinations/{ctx['destination'].id}/",
+                {"vehicle_id": vehicle_id, "name": "Trabalho", "periodicity": "DIARIO", "distance_km": 30},
+                True,
+            ),
+            (
+                "DELETE",
+                "vehicle-destinations/<int:destination_id>/",
+                f"/api/vehicle-destinations/{ctx['destination'].id}/",
+                None,
+                True,
+            ),
+            ("GET", "vehicles/summary/", "/api/vehicles/summary/", month, False),
+            ("GET", "trips/", "/api/trips/", None, False),
+            ("POST", "trips/create/", "/api/trips/create/", trip_body, True),
+            ("PUT", "trips/<int:trip_id>/", f"/api/trips/{ctx['trip'].id}/", trip_body, True),
+            ("DELETE", "trips/<int:trip_id>/", f"/api/trips/{ctx['trip'].id}/", None, True),
+            ("POST", "trips/evaluate/", "/api/trips/evaluate/", trip_body, False),
+            (
+                "POST",
+                "trips/evaluate/batch/",
+                "/api/trips/evaluate/batch/",
+                {"scenarios": [dict(trip_body, distance_km=km, label=f"{km} km") for km in (80, 320, 900)]},
+                False,
+            ),
+            ("GET", "credit-cards/", "/api/credit-cards/", None, False),
+            (
+                "POST",
+                "credit-cards/create/",
+                "/api/credit-cards/create/",
+                {"nickname": "Novo", "last4": "9999", "closing_day": 10, "due_day": 17, "limit_amount": "5000"},
+                True,
+            ),
+            (
+                "PUT",
+                "credit-cards/<int:card_id>/",
+                f"/api/credit-cards/{card_id}/",
+                {"nickname": "Editado", "closing_day": 5, "due_day": 12, "limit_amount": "8000"},
+                True,
+            ),
+            ("DELETE", "credit-cards/<int:card_id>/", f"/api/credit-cards/{card_id}/", None, True),
+            ("GET", "credit-card-expenses/", "/api/credit-card-expenses/", {"card_id": card_id}, False),
+            (
+                "POST",
+                "credit-card-expenses/create/",
+                "/api/credit-card-expenses/create/",
+                {"card_id": card_id, "date": iso, "category": "Bench", "amount": "89.90"},
+                True,
+            ),
+            (
+                "PUT",
+                "credit-card-expenses/<int:expense_id>/",
+                f"/api/credit-card-expenses/{ctx['card_expense'].id}/",
+                {"card_id": ctx["card_expense"].card_id, "date": iso, "category": "Bench", "amount": "45.00"},
+                True,
+            ),
+            (
+                "DELETE",
+                "credit-card-expenses/<int:expense_id>/",
+                f"/api/credit-card-expenses/{ctx['card_expense'].id}/",
+                None,
+                True,
+            ),
+            ("GET", "credit-cards/summary/", "/api/credit-cards/summary/", month, False),
+            ("GET", "stats/", "/api/stats/?windows=1,7,30,90,365", None, False),
+            ("GET", "stats/daily/", "/api/stats/daily/", None, False),
+            ("GET", "stats/weekly/", "/api/stats/weekly/", None, False),
+            ("GET", "stats/monthly/", "/api/stats/monthly/", None, False),
+            ("POST", "whatsapp-summary/", "/api/whatsapp-summary/", {"text": "Resumo bench"}, True),
+            (
+                "GET",
+                "whatsapp-summary/<int:message_id>/",
+                f"/api/whatsapp-summary/{ctx['message'].id}/",
+                None,
+                False,
+            ),
+            ("GET", "metrics/requests/", "/api/metrics/requests/", None, False),
+        ]
+
+    def login(self, ctx):
+        client = Client()
+        session = client.session
+        session["user_id"] = ctx["user"].id
+        session["user_phone"] = ctx["user"].phone_number
+        session.save()
+        return client
+
+    def staff_login(self):
+        client = Client()
+        client.force_login(User.objects.create_user("bench-api-staff", is_staff=True))
+        return client
+
+    def call(self, client, method, path, body):
+        if method == "GET":
+            response = client.get(path, body or {})
+        elif isinstance(body, io.BytesIO):
+            upload = SimpleUploadedFile("recibo.png", body.getvalue(), content_type="image/png")
+            response = client.post(path, {"receipt": upload})
+        else:
+            response = client.generic(
+                method, path, json.dumps(body or {}), content_type="application/json"
+            )
+        if response.streaming:
+            # o client fecha a resposta ao fim da iteracao sem derrubar a conexao da transacao
+            for _chunk in response.streaming_content:
+                pass
+        return response.status_code
+
+    def run_once(self, client, scenario):
+        method, _route, path, body, writes = scenario
+        if not writes:
+            return self.call(client, method, path, body)
+        with transaction.atomic():
+            status_code = self.call(client, method, path, body)
+            transaction.set_rollback(True)
+        return status_code
+
+    def measure(self, ctx, scenarios, repeat):
+        user_client = self.login(ctx)
+        staff_client = self.staff_login()
+        results = {}
+        for scenario in scenarios:
+            method, route = scenario[0], scenario[1]
+            client = staff_client if route in STAFF_ROUTES else user_client
+            self.run_once(client, scenario)
+
+            with CaptureQueriesContext(connection) as queries:
+                status_code = self.run_once(client, scenario)
+            query_count = len(queries.captured_queries)
+
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                self.run_once(client, scenario)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+
+            tracemalloc.start()
+            try:
+                self.run_once(client, scenario)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+            results[f"{method} {route}"] = {
+                "status": status_code,
+                "queries": query_count,
+                "p50_ms": round(statistics.median(timings), 3),
+                "p95_ms": round(percentile(timings, 95), 3),
+                "peak_kib": round(peak / 1024, 1),
+            }
+            self.stderr.write(f"{method:6} /api/{route}: {query_count} consultas, p95 {percentile(timings, 95):.1f}ms")
+        return results
+
+    def uncovered_routes(self, scenarios):
+        covered = {route for _method, route, *_rest in scenarios}
+        return sorted({str(p.pattern) for p in account_urls.urlpatterns} - covered)
+
+    def compare(self, baseline_path, results, tolerance, min_delta_ms):
+        with open(baseline_path, encoding="utf-8") as fh:
+            baseline = json.load(fh)["routes"]
+        regressions = []
+        for key, current in sorted(results.items()):
+            previous = baseline.get(key)
+            if previous is None:
+                continue
+            if current["queries"] > previous["queries"]:
+                regressions.append(f"{key}: consultas {previous['queries']} -> {current['queries']}")
+            slower = current["p95_ms"] - previous["p95_ms"]
+            if slower > min_delta_ms and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{key}: p95 {previous['p95_ms']:.1f}ms -> {current['p95_ms']:.1f}ms")
+        for line in regressions:
+            self.stderr.write(line)
+        if regressions:
+            raise CommandError(f"{len(regressions)} regressoes contra {baseline_path}")
+        self.stdout.write(self.style.SUCCESS(f"Sem regressoes contra {baseline_path}"))
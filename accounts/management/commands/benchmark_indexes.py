@@ -0,0 +1,220 @@
+import os
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Q, Sum
+
+from accounts.management.benchmark_database import resolve_benchmark_database
+from accounts.models import (
+    CreditCard,
+    CreditCardExpense,
+    FinancialEntry,
+    PlannedExpense,
+    UserAccount,
+    Vehicle,
+    VehicleExpense,
+)
+from accounts.views import month_range_q
+
+
+INDEXED_MODELS = (FinancialEntry, PlannedExpense, VehicleExpense, CreditCardExpense)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula uma massa de dados temporaria e mede as consultas principais com e sem os indices "
+        "de acesso. Tudo roda em uma transacao desfeita no final, mas o DROP INDEX trava as tabelas "
+        "ate o fim: use so um banco local descartavel (--database ou GENFIN_BENCHMARK_DATABASE)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50, help="Quantidade de usuarios ficticios.")
+        parser.add_argument("--rows", type=int, default=2000, help="Linhas por tabela para cada usuario.")
+        parser.add_argument("--repeat", type=int, default=20, help="Execucoes de cada consulta.")
+        parser.add_argument(
+            "--database",
+            default=os.getenv("GENFIN_BENCHMARK_DATABASE", ""),
+            help="Alias de DATABASES usado no benchmark (obrigatorio; precisa ser um banco local).",
+        )
+
+    def handle(self, *args, **options):
+        self.using = resolve_benchmark_database(options["database"])
+        self.connection = connections[self.using]
+        try:
+            with transaction.atomic(using=self.using):
+                user = self.seed(options["users"], options["rows"])
+                cases = self.build_cases(user)
+
+                with_indexes = self.measure(cases, options["repeat"])
+                self.drop_indexes()
+                without_indexes = self.measure(cases, options["repeat"])
+
+                self.report(cases, without_indexes, with_indexes)
+                raise Rollback()
+        except Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS("Massa de dados temporaria descartada."))
+
+    def seed(self, user_count, rows):
+        rng = random.Random(42)
+        start = date.today() - timedelta(days=3 * 365)
+        categories = ["Mercado", "Lazer", "Saude", "Transporte", "Moradia"]
+
+        users = UserAccount.objects.using(self.using).bulk_create(
+            UserAccount(phone_number=f"00bench{i:06d}", first_name="Bench") for i in range(user_count)
+        )
+
+        vehicles = Vehicle.objects.using(self.using).bulk_create(Vehicle(user=u, name="Carro") for u in users)
+        cards = CreditCard.objects.using(self.using).bulk_create(CreditCard(user=u, last4="0000") for u in users)
+
+        def random_date():
+            return start + timedelta(days=rng.randrange(3 * 365))
+
+        for user, vehicle, card in zip(users, vehicles, cards):
+            FinancialEntry.objects.using(self.using).bulk_create(
+                (
+                    FinancialEntry(
+                        user=user,
+                        entry_type=rng.choice(["RECEITA", "DESPESA"]),
+                        amount=Decimal(rng.randrange(100, 50000)) / 100,
+                        category=rng.choice(categories),
+                        date=random_date(),
+                    )
+                    for _ in range(rows)
+                ),
+                batch_size=1000,
+            )
+            PlannedExpense.objects.using(self.using).bulk_create(
+                (
+                    PlannedExpense(
+                        user=user,
+                        date=random_date(),
+                        category="Cartao" if i % 4 == 0 else rng.choice(categories),
+                        amount=Decimal(rng.randrange(100, 50000)) / 100,
+                        is_recurring=i % 10 == 0,
+                        source_key=f"CC:{card.id}:{i:06d}" if i % 4 == 0 else "",
+                    )
+                    for i in range(rows)
+                ),
+                batch_size=1000,
+            )
+            VehicleExpense.objects.using(self.using).bulk_create(
+                (
+                    VehicleExpense(
+                        user=user,
+                        vehicle=vehicle,
+                        date=random_date(),
+                        expense_type=rng.choice(["COMBUSTIVEL", "MANUTENCAO", "PEDAGIO"]),
+                        amount=Decimal(rng.randrange(100, 50000)) / 100,
+                        is_recurring=i % 20 == 0,
+                    )
+                    for i in range(rows)
+                ),
+                batch_size=1000,
+            )
+            CreditCardExpense.objects.using(self.using).bulk_create(
+                (
+                    CreditCardExpense(
+                        user=user,
+                        card=card,
+                        date=random_date(),
+                        category=rng.choice(categories),
+                        amount=Decimal(rng.randrange(100, 50000)) / 100,
+                    )
+                    for _ in range(rows)
+                ),
+                batch_size=1000,
+            )
+
+        with self.connection.cursor() as cursor:
+            for model in INDEXED_MODELS:
+                cursor.execute(f"ANALYZE {self.connection.ops.quote_name(model._meta.db_table)}")
+
+        self.stdout.write(f"Massa criada: {len(users)} usuarios x {rows} linhas por tabela.")
+        return users[len(users) // 2]
+
+    def build_cases(self, user):
+        today = date.today()
+        year, month = today.year, today.month
+        card_ids = list(user.credit_cards.values_list("id", flat=True))
+        month_start = today.replace(day=1)
+
+        return [
+            ("entries: ultima pagina", lambda: list(user.entries.order_by("-date", "-id")[:20])),
+            (
+                "entries: total por tipo",
+                lambda: user.entries.filter(entry_type="DESPESA").aggregate(total=Sum("amount")),
+            ),
+            (
+                "planned: faturas CC do mes (__year/__month)",
+                lambda: list(
+                    user.planned_expenses.filter(source_key__startswith="CC:", date__year=year, date__month=month)
+                ),
+            ),
+            (
+                "planned: faturas CC do mes (intervalo)",
+                lambda: list(user.planned_expenses.filter(month_range_q(year, month), source_key__startswith="CC:")),
+            ),
+            (
+                "planned: recorrentes",
+                lambda: user.planned_expenses.filter(is_recurring=True).aggregate(total=Sum("amount")),
+            ),
+            (
+                "vehicle: resumo do mes (__year/__month)",
+                lambda: list(
+                    user.vehicle_expenses.filter(
+                        Q(is_recurring=True) | Q(date__year=year, date__month=month, is_recurring=False)
+                    ).values("vehicle_id", "expense_type").annotate(total=Sum("amount"))
+                ),
+            ),
+            (
+                "vehicle: resumo do mes (intervalo)",
+                lambda: list(
+                    user.vehicle_expenses.filter(
+                        Q(is_recurring=True) | (month_range_q(year, month) & Q(is_recurring=False))
+                    ).values("vehicle_id", "expense_type").annotate(total=Sum("amount"))
+                ),
+            ),
+            (
+                "card: compras da fatura",
+                lambda: list(
+                    user.credit_card_expenses.filter(
+                        card_id__in=card_ids,
+                        date__gte=month_start - timedelta(days=31),
+                        date__lt=month_start,
+                    )
+                ),
+            ),
+        ]
+
+    def measure(self, cases, repeat):
+        results = []
+        for _label, run in cases:
+            run()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                run()
+            results.append((time.perf_counter() - started) * 1000 / repeat)
+        return results
+
+    def drop_indexes(self):
+        # DROP INDEX e transacional no Postgres e no SQLite, o rollback final recria os indices
+        with self.connection.cursor() as cursor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    cursor.execute(f"DROP INDEX {self.connection.ops.quote_name(index.name)}")
+
+    def report(self, cases, before, after):
+        width = max(len(label) for label, _run in cases)
+        self.stdout.write(f"{'consulta'.ljust(width)}  {'sem indices':>12}  {'com indices':>12}  {'ganho':>7}")
+        for (label, _run), old_ms, new_ms in zip(cases, before, after):
+            gain = old_ms / new_ms if new_ms else 0
+            self.stdout.write(f"{label.ljust(width)}  {old_ms:>10.2f}ms  {new_ms:>10.2f}ms  {gain:>6.1f}x")
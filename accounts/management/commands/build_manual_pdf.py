@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from accounts.views import load_manual_pdf, manual_pdf_path, manual_pdf_version, write_manual_pdf
+
+
+class Command(BaseCommand):
+    help = "Gera o PDF do manual da versao atual (GENFIN_MANUAL_VERSION) em MEDIA_ROOT para o deploy."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--manual-version", help="Gera uma versao especifica do manual.")
+        parser.add_argument("--force", action="store_true", help="Regera o arquivo mesmo se ja existir.")
+
+    def handle(self, *args, **options):
+        version = options.get("manual_version") or manual_pdf_version()
+        if options["force"]:
+            write_manual_pdf(version)
+            load_manual_pdf.cache_clear()
+
+        pdf_bytes, etag, _last_modified = load_manual_pdf(version)
+        self.stdout.write(f"{manual_pdf_path(version)} ({len(pdf_bytes)} bytes, ETag {etag})")
+        self.stdout.write(self.style.SUCCESS(f"Manual {version} pronto."))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.views import process_outbound_messages
+
+
+class Command(BaseCommand):
+    help = "Entrega as mensagens pendentes da fila de saida (webhooks do n8n) com retentativas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Maximo de mensagens por rodada.")
+        parser.add_argument("--loop", action="store_true", help="Continua processando a fila indefinidamente.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Segundos de espera quando a fila esta vazia.")
+
+    def handle(self, *args, **options):
+        while True:
+            result = process_outbound_messages(limit=options["batch_size"])
+            if result["sent"] or result["failed"]:
+                self.stdout.write(f"{result['sent']} enviadas, {result['failed']} com falha")
+            if not options["loop"]:
+                break
+            if not result["sent"] and not result["failed"]:
+                time.sleep(options["interval"])
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.views import process_receipt_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Gera as previas (thumbnails) pendentes dos comprovantes de imagem."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50, help="Maximo de comprovantes por rodada.")
+        parser.add_argument("--loop", action="store_true", help="Continua processando a fila indefinidamente.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Segundos de espera quando a fila esta vazia.")
+
+    def handle(self, *args, **options):
+        while True:
+            result = process_receipt_thumbnails(limit=options["batch_size"])
+            if result["generated"] or result["skipped"]:
+                self.stdout.write(f"{result['generated']} previas geradas, {result['skipped']} sem previa")
+            if not options["loop"]:
+                break
+            if not result["generated"] and not result["skipped"]:
+                time.sleep(options["interval"])
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import UserAccount
+from accounts.views import rebuild_credit_card_bills
+
+
+class Command(BaseCommand):
+    help = "Recalcula do zero as faturas de cartao (despesas fixas CC:*) a partir dos gastos registrados."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--phone", help="Reconstroi apenas o usuario com este telefone.")
+
+    def handle(self, *args, **options):
+        users = UserAccount.objects.order_by("id")
+        if options.get("phone"):
+            users = users.filter(phone_number=options["phone"])
+
+        for user in users.iterator():
+            result = rebuild_credit_card_bills(user)
+            self.stdout.write(
+                f"{user.phone_number}: {result['created']} criadas, "
+                f"{result['updated']} atualizadas, {result['deleted']} removidas"
+            )
+        self.stdout.write(self.style.SUCCESS("Faturas de cartao reconstruidas."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import UserAccount
+from accounts.views import rebuild_entry_rollups
+
+
+class Command(BaseCommand):
+    help = "Recalcula do zero os totais mensais (FinancialEntryMonthlyRollup) a partir das movimentacoes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--phone", help="Reconstroi apenas o usuario com este telefone.")
+
+    def handle(self, *args, **options):
+        users = UserAccount.objects.order_by("id")
+        if options.get("phone"):
+            users = users.filter(phone_number=options["phone"])
+
+        for user in users.iterator():
+            count = rebuild_entry_rollups(user)
+            self.stdout.write(f"{user.phone_number}: {count} totais mensais")
+        self.stdout.write(self.style.SUCCESS("Totais mensais reconstruidos."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.views import refresh_usd_brl_quote
+
+
+class Command(BaseCommand):
+    help = "Busca a cotacao USD-BRL e atualiza o cache e o ultimo valor salvo no banco."
+
+    def handle(self, *args, **options):
+        quote = refresh_usd_brl_quote()
+        if quote is None:
+            raise CommandError("Nao foi possivel obter a cotacao USD-BRL.")
+        self.stdout.write(self.style.SUCCESS(f"USD-BRL {quote['rate']} ({quote.get('create_date') or '-'})"))
@@ -0,0 +1,115 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# limites superiores (ms) dos baldes do histograma de duracao por rota
+DURATION_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_current = contextvars.ContextVar("genfin_request_metrics", default=None)
+
+
+def request_metrics_enabled():
+    return os.getenv("GENFIN_REQUEST_METRICS", "").strip().lower() in {"1", "true", "sim"}
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_ms = 0.0
+        self.external_ms = {}
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_ms += (time.perf_counter() - started) * 1000
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+def start_request_metrics():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request_metrics(token):
+    _current.reset(token)
+
+
+@contextmanager
+def external_call(label):
+    # fora de uma requisicao instrumentada (worker, thread de refresh) nao mede nada
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        metrics.external_ms[label] = metrics.external_ms.get(label, 0.0) + elapsed
+
+
+class RouteHistograms:
+    """Histogramas por rota mantidos em memoria no processo (cada worker tem os seus)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, key, total_ms, metrics):
+        with self.lock:
+            row = self.routes.get(key)
+            if row is None:
+                row = self.routes[key] = {
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "db_ms": 0.0,
+                    "queries": 0,
+                    "max_queries": 0,
+                    "external_ms": {},
+                    "buckets": [0] * (len(DURATION_BUCKETS_MS) + 1),
+                }
+            row["count"] += 1
+            row["total_ms"] += total_ms
+            row["max_ms"] = max(row["max_ms"], total_ms)
+            row["db_ms"] += metrics.db_ms
+            row["queries"] += metrics.queries
+            row["max_queries"] = max(row["max_queries"], metrics.queries)
+            for label, elapsed in metrics.external_ms.items():
+                row["external_ms"][label] = row["external_ms"].get(label, 0.0) + elapsed
+            row["buckets"][bisect.bisect_left(DURATION_BUCKETS_MS, total_ms)] += 1
+
+    def snapshot(self, reset=False):
+        with self.lock:
+            routes = {}
+            for key, row in self.routes.items():
+                count = row["count"]
+                routes[key] = {
+                    "count": count,
+                    "avg_ms": round(row["total_ms"] / count, 3),
+                    "max_ms": round(row["max_ms"], 3),
+                    "avg_db_ms": round(row["db_ms"] / count, 3),
+                    "avg_queries": round(row["queries"] / count, 2),
+                    "max_queries": row["max_queries"],
+                    "external_ms": {label: round(value, 3) for label, value in row["external_ms"].items()},
+                    "buckets": {
+                        f"le_{limit}" if limit is not None else "inf": hits
+                        for limit, hits in zip(DURATION_BUCKETS_MS + (None,), row["buckets"])
+                    },
+                }
+            if reset:
+                self.routes = {}
+        return routes
+
+
+route_histograms = RouteHistograms()
@@ -0,0 +1,65 @@
+import json
+import logging
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils.functional import SimpleLazyObject
+
+from .metrics import finish_request_metrics, request_metrics_enabled, route_histograms, start_request_metrics
+from .views import resolve_session_user
+
+logger = logging.getLogger("genfin.requests")
+
+
+class LoggedUserMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # resolvido so no primeiro acesso, como o request.user do Django
+        request.logged_user = SimpleLazyObject(lambda: resolve_session_user(request))
+        return self.get_response(request)
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        # desligado (padrao) o Django remove o middleware da cadeia: custo zero por requisicao
+        if not request_metrics_enabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics, token = start_request_metrics()
+        try:
+            with connection.execute_wrapper(metrics.db_wrapper):
+                response = self.get_response(request)
+        finally:
+            finish_request_metrics(token)
+
+        # respostas em streaming so contam o que rodou ate aqui
+        total_ms = metrics.total_ms()
+        external_ms = sum(metrics.external_ms.values())
+        match = getattr(request, "resolver_match", None)
+        route = f"{request.method} /{match.route}" if match else f"{request.method} <sem rota>"
+
+        timings = [f'db;dur={metrics.db_ms:.1f};desc="{metrics.queries} queries"']
+        timings.extend(f"ext-{label};dur={elapsed:.1f}" for label, elapsed in metrics.external_ms.items())
+        timings.append(f"app;dur={max(total_ms - metrics.db_ms - external_ms, 0):.1f}")
+        timings.append(f"total;dur={total_ms:.1f}")
+        response["Server-Timing"] = ", ".join(timings)
+
+        route_histograms.record(route, total_ms, metrics)
+        logger.info(
+            json.dumps(
+                {
+                    "route": route,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "total_ms": round(total_ms, 2),
+                    "db_ms": round(metrics.db_ms, 2),
+                    "queries": metrics.queries,
+                    "external_ms": {label: round(value, 2) for label, value in metrics.external_ms.items()},
+                }
+            )
+        )
+        return response
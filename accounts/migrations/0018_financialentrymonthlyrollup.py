@@ -0,0 +1,58 @@
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def build_rollups(apps, schema_editor):
+    FinancialEntry = apps.get_model("accounts", "FinancialEntry")
+    FinancialEntryMonthlyRollup = apps.get_model("accounts", "FinancialEntryMonthlyRollup")
+    rows = (
+        FinancialEntry.objects.annotate(year=ExtractYear("date"), month=ExtractMonth("date"))
+        .values("user_id", "year", "month", "entry_type", "category")
+        .annotate(total=Sum("amount"), count=Count("id"))
+        .order_by()
+    )
+    FinancialEntryMonthlyRollup.objects.bulk_create(
+        (
+            FinancialEntryMonthlyRollup(
+                user_id=row["user_id"],
+                year=row["year"],
+                month=row["month"],
+                entry_type=row["entry_type"],
+                category=row["category"],
+                total_amount=row["total"] or 0,
+                entry_count=row["count"],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0017_alter_creditcard_id_alter_creditcardexpense_id_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FinancialEntryMonthlyRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("year", models.PositiveSmallIntegerField()),
+                ("month", models.PositiveSmallIntegerField()),
+                ("entry_type", models.CharField(choices=[("RECEITA", "Receita"), ("DESPESA", "Despesa")], max_length=10)),
+                ("category", models.CharField(max_length=100)),
+                ("total_amount", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("entry_count", models.PositiveIntegerField(default=0)),
+                ("user", models.ForeignKey(on_delete=models.deletion.CASCADE, related_name="entry_rollups", to="accounts.useraccount")),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=("user", "year", "month", "entry_type", "category"), name="unique_entry_rollup_bucket"),
+                ],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
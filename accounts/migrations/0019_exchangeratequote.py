@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0018_financialentrymonthlyrollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExchangeRateQuote",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("pair", models.CharField(max_length=10, unique=True)),
+                ("rate", models.DecimalField(decimal_places=6, max_digits=12)),
+                ("name", models.CharField(blank=True, default="", max_length=80)),
+                ("source", models.CharField(blank=True, default="", max_length=40)),
+                ("quote_timestamp", models.CharField(blank=True, default="", max_length=40)),
+                ("quote_create_date", models.CharField(blank=True, default="", max_length=40)),
+                ("fetched_at", models.DateTimeField()),
+            ],
+        ),
+    ]
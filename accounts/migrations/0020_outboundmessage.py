@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0019_exchangeratequote"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboundMessage",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("target_url", models.URLField(max_length=300)),
+                ("payload", models.JSONField(default=dict)),
+                ("status", models.CharField(choices=[("PENDENTE", "Pendente"), ("ENVIADO", "Enviado"), ("FALHOU", "Falhou")], default="PENDENTE", max_length=10)),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("max_attempts", models.PositiveSmallIntegerField(default=6)),
+                ("next_attempt_at", models.DateTimeField()),
+                ("last_status_code", models.PositiveSmallIntegerField(blank=True, null=True)),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("user", models.ForeignKey(on_delete=models.deletion.CASCADE, related_name="outbound_messages", to="accounts.useraccount")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["status", "next_attempt_at"], name="outbound_due_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0020_outboundmessage"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="financialentry",
+            index=models.Index(fields=["user", "-date", "-id"], name="entry_user_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="financialentry",
+            index=models.Index(fields=["user", "entry_type", "date"], name="entry_user_type_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="plannedexpense",
+            index=models.Index(fields=["user", "date"], name="plannedexp_user_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="plannedexpense",
+            index=models.Index(condition=models.Q(("is_recurring", True)), fields=["user"], name="plannedexp_recurring_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="plannedexpense",
+            index=models.Index(
+                condition=models.Q(("source_key", ""), _negated=True),
+                fields=["user", "source_key"],
+                name="plannedexp_user_source_idx",
+                opclasses=["int8_ops", "varchar_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="plannedincome",
+            index=models.Index(fields=["user", "date"], name="plannedinc_user_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="plannedreserve",
+            index=models.Index(fields=["user", "date"], name="plannedres_user_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="vehicleexpense",
+            index=models.Index(fields=["user", "is_recurring", "date"], name="vehexp_user_recur_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="creditcardexpense",
+            index=models.Index(fields=["user", "card", "date"], name="ccexp_user_card_date_idx"),
+        ),
+    ]
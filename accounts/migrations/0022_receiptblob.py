@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0021_access_path_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReceiptBlob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("sha256", models.CharField(max_length=64, unique=True)),
+                ("file", models.FileField(upload_to="receipt_blobs/")),
+                ("size", models.PositiveBigIntegerField(default=0)),
+                ("content_type", models.CharField(blank=True, default="", max_length=100)),
+                ("ref_count", models.PositiveIntegerField(default=0)),
+                ("thumbnail", models.FileField(blank=True, null=True, upload_to="receipt_thumbnails/")),
+                ("thumbnail_status", models.CharField(choices=[("PENDENTE", "Pendente"), ("PRONTA", "Pronta"), ("SEM_PREVIA", "Sem previa")], default="PENDENTE", max_length=10)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["thumbnail_status"], name="receiptblob_thumb_idx")],
+            },
+        ),
+        migrations.AddField(
+            model_name="financialentry",
+            name="receipt_blob",
+            field=models.ForeignKey(blank=True, null=True, on_delete=models.deletion.PROTECT, related_name="entries", to="accounts.receiptblob"),
+        ),
+    ]
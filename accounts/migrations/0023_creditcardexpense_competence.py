@@ -0,0 +1,61 @@
+from django.db import migrations, models
+
+
+def shift_month(year, month, delta):
+    total = year * 12 + (month - 1) + delta
+    return total // 12, total % 12 + 1
+
+
+def fill_competence(apps, schema_editor):
+    CreditCard = apps.get_model("accounts", "CreditCard")
+    CreditCardExpense = apps.get_model("accounts", "CreditCardExpense")
+
+    cards_by_id = {c.id: c for c in CreditCard.objects.all()}
+
+    def closing_day_for(card_id):
+        # mesma regra de resolve_billing_owner: o fechamento vem do cartao titular
+        current = cards_by_id[card_id]
+        visited = set()
+        while current.parent_card_id and current.id not in visited and current.parent_card_id in cards_by_id:
+            visited.add(current.id)
+            current = cards_by_id[current.parent_card_id]
+        return int(current.closing_day or 20)
+
+    batch = []
+    for expense in CreditCardExpense.objects.only("id", "card_id", "date").iterator(chunk_size=2000):
+        year, month = expense.date.year, expense.date.month
+        if expense.date.day > closing_day_for(expense.card_id):
+            year, month = shift_month(year, month, 1)
+        expense.competence_year = year
+        expense.competence_month = month
+        batch.append(expense)
+        if len(batch) >= 2000:
+            CreditCardExpense.objects.bulk_update(batch, ["competence_year", "competence_month"])
+            batch = []
+    if batch:
+        CreditCardExpense.objects.bulk_update(batch, ["competence_year", "competence_month"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0022_receiptblob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="creditcardexpense",
+            name="competence_year",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="creditcardexpense",
+            name="competence_month",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="creditcardexpense",
+            index=models.Index(fields=["user", "competence_year", "competence_month"], name="ccexp_user_competence_idx"),
+        ),
+        migrations.RunPython(fill_competence, migrations.RunPython.noop),
+    ]
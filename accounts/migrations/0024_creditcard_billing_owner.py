@@ -0,0 +1,49 @@
+from django.db import migrations, models
+
+
+def fill_billing_owner(apps, schema_editor):
+    CreditCard = apps.get_model("accounts", "CreditCard")
+    parent_by_id = dict(CreditCard.objects.values_list("id", "parent_card_id"))
+
+    owners = {}
+    for card_id in parent_by_id:
+        path = []
+        current = card_id
+        while current not in owners:
+            parent_id = parent_by_id.get(current)
+            if not parent_id or parent_id not in parent_by_id or current in path:
+                break
+            path.append(current)
+            current = parent_id
+        owner_id = owners.get(current, current)
+        for visited_id in path:
+            owners[visited_id] = owner_id
+        owners.setdefault(current, owner_id)
+
+    by_owner = {}
+    for card_id, owner_id in owners.items():
+        by_owner.setdefault(owner_id, []).append(card_id)
+    for owner_id, card_ids in by_owner.items():
+        CreditCard.objects.filter(id__in=card_ids).update(billing_owner_id=owner_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0023_creditcardexpense_competence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="creditcard",
+            name="billing_owner",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=models.deletion.SET_NULL,
+                related_name="billed_cards",
+                to="accounts.creditcard",
+            ),
+        ),
+        migrations.RunPython(fill_billing_owner, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0024_creditcard_billing_owner"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="plannedexpense",
+            name="recurrence_frequency",
+            field=models.CharField(
+                choices=[("DIARIO", "Diario"), ("SEMANAL", "Semanal"), ("MENSAL", "Mensal"), ("ANUAL", "Anual")],
+                default="MENSAL",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="plannedexpense",
+            name="recurrence_interval",
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="plannedexpense",
+            name="recurrence_end",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="plannedexpense",
+            name="recurrence_exceptions",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="plannedincome",
+            name="recurrence_frequency",
+            field=models.CharField(
+                choices=[("DIARIO", "Diario"), ("SEMANAL", "Semanal"), ("MENSAL", "Mensal"), ("ANUAL", "Anual")],
+                default="MENSAL",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="plannedincome",
+            name="recurrence_interval",
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="plannedincome",
+            name="recurrence_end",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="plannedincome",
+            name="recurrence_exceptions",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="plannedreserve",
+            name="recurrence_frequency",
+            field=models.CharField(
+                choices=[("DIARIO", "Diario"), ("SEMANAL", "Semanal"), ("MENSAL", "Mensal"), ("ANUAL", "Anual")],
+                default="MENSAL",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="plannedreserve",
+            name="recurrence_interval",
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="plannedreserve",
+            name="recurrence_end",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="plannedreserve",
+            name="recurrence_exceptions",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
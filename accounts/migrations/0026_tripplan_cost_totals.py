@@ -0,0 +1,47 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+CENTS = Decimal("0.01")
+
+
+def fill_trip_totals(apps, schema_editor):
+    TripPlan = apps.get_model("accounts", "TripPlan")
+    TripToll = apps.get_model("accounts", "TripToll")
+
+    toll_totals = dict(TripToll.objects.values("trip_id").annotate(total=Sum("amount")).values_list("trip_id", "total"))
+    batch = []
+    for trip in TripPlan.objects.select_related("vehicle").iterator(chunk_size=2000):
+        # mesma conta de apply_trip_costs: combustivel + pedagios + hospedagem + refeicao + extras
+        km_per_liter = trip.vehicle.fuel_km_per_liter or 0
+        fuel = trip.distance_km / km_per_liter * trip.vehicle.fuel_price_per_liter if km_per_liter > 0 else 0
+        trip.toll_total = Decimal(toll_totals.get(trip.id) or 0).quantize(CENTS)
+        trip.estimated_cost = (fuel + trip.toll_total + trip.lodging_cost + trip.meal_cost + trip.extra_cost).quantize(CENTS)
+        batch.append(trip)
+        if len(batch) >= 2000:
+            TripPlan.objects.bulk_update(batch, ["toll_total", "estimated_cost"])
+            batch = []
+    if batch:
+        TripPlan.objects.bulk_update(batch, ["toll_total", "estimated_cost"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0025_planned_recurrence_rule"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tripplan",
+            name="toll_total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name="tripplan",
+            name="estimated_cost",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(fill_trip_totals, migrations.RunPython.noop),
+    ]
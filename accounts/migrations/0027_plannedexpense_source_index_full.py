@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0026_tripplan_cost_totals"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="plannedexpense",
+            name="plannedexp_user_source_idx",
+        ),
+        migrations.AddIndex(
+            model_name="plannedexpense",
+            index=models.Index(
+                fields=["user", "source_key"],
+                name="plannedexp_user_source_idx",
+                opclasses=["int8_ops", "varchar_pattern_ops"],
+            ),
+        ),
+    ]
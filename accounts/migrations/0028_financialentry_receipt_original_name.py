@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0027_plannedexpense_source_index_full"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="financialentry",
+            name="receipt_original_name",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.hashers import check_password, identify_hasher, make_password
 
+from .recurrence import FREQUENCY_CHOICES
+
 class UserAccount(models.Model):
     phone_number = models.CharField(max_length=20, unique=True)
     first_name = models.CharField(max_length=80, blank=True, default="")
@@ -56,14 +58,94 @@ class FinancialEntry(models.Model):
 
     date = models.DateField()
     receipt_file = models.FileField(upload_to="entry_receipts/", blank=True, null=True)
+    receipt_original_name = models.CharField(max_length=255, blank=True, default="")
+    receipt_blob = models.ForeignKey(
+        "ReceiptBlob",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="entries",
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-date", "-id"], name="entry_user_date_idx"),
+            models.Index(fields=["user", "entry_type", "date"], name="entry_user_type_date_idx"),
+        ]
+
     def __str__(self):
         return f"{self.entry_type} - {self.amount}"
 
 
-class PlannedExpense(models.Model):
+class ReceiptBlob(models.Model):
+    THUMBNAIL_STATUS_CHOICES = (
+        ("PENDENTE", "Pendente"),
+        ("PRONTA", "Pronta"),
+        ("SEM_PREVIA", "Sem previa"),
+    )
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to="receipt_blobs/")
+    size = models.PositiveBigIntegerField(default=0)
+    content_type = models.CharField(max_length=100, blank=True, default="")
+    ref_count = models.PositiveIntegerField(default=0)
+    thumbnail = models.FileField(upload_to="receipt_thumbnails/", blank=True, null=True)
+    thumbnail_status = models.CharField(max_length=10, choices=THUMBNAIL_STATUS_CHOICES, default="PENDENTE")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["thumbnail_status"], name="receiptblob_thumb_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count})"
+
+
+class FinancialEntryMonthlyRollup(models.Model):
+    user = models.ForeignKey(
+        UserAccount,
+        on_delete=models.CASCADE,
+        related_name="entry_rollups"
+    )
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    entry_type = models.CharField(
+        max_length=10,
+        choices=FinancialEntry.ENTRY_TYPE_CHOICES
+    )
+    category = models.CharField(max_length=100)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    entry_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "year", "month", "entry_type", "category"],
+                name="unique_entry_rollup_bucket",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.year}-{self.month:02d} {self.entry_type} {self.category} - {self.total_amount}"
+
+
+class RecurringSeries(models.Model):
+    """Regra de recorrencia dos itens planejados: com is_recurring a serie comeca em `date`."""
+
+    recurrence_frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default="MENSAL")
+    recurrence_interval = models.PositiveSmallIntegerField(default=1)
+    recurrence_end = models.DateField(null=True, blank=True)
+    # datas ISO (AAAA-MM-DD) puladas pela serie
+    recurrence_exceptions = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        abstract = True
+
+
+class PlannedExpense(RecurringSeries):
     user = models.ForeignKey(
         UserAccount,
         on_delete=models.CASCADE,
@@ -79,11 +161,24 @@ class PlannedExpense(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "date"], name="plannedexp_user_date_idx"),
+            models.Index(fields=["user"], condition=models.Q(is_recurring=True), name="plannedexp_recurring_idx"),
+            # varchar_pattern_ops deixa o source_key__startswith (LIKE 'CC:%') usar o indice no Postgres;
+            # sem condicao parcial: o planner nao deduz source_key <> '' a partir do LIKE
+            models.Index(
+                fields=["user", "source_key"],
+                opclasses=["int8_ops", "varchar_pattern_ops"],
+                name="plannedexp_user_source_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.date} - {self.category} - {self.amount}"
 
 
-class PlannedIncome(models.Model):
+class PlannedIncome(RecurringSeries):
     user = models.ForeignKey(
         UserAccount,
         on_delete=models.CASCADE,
@@ -97,11 +192,16 @@ class PlannedIncome(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "date"], name="plannedinc_user_date_idx"),
+        ]
+
     def __str__(self):
         return f"{self.date} - {self.category} - {self.amount}"
 
 
-class PlannedReserve(models.Model):
+class PlannedReserve(RecurringSeries):
     user = models.ForeignKey(
         UserAccount,
         on_delete=models.CASCADE,
@@ -115,6 +215,11 @@ class PlannedReserve(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "date"], name="plannedres_user_date_idx"),
+        ]
+
     def __str__(self):
         return f"{self.date} - {self.category} - {self.amount}"
 
@@ -170,6 +275,11 @@ class VehicleExpense(models.Model):
     is_recurring = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "is_recurring", "date"], name="vehexp_user_recur_date_idx"),
+        ]
+
     def __str__(self):
         return f"{self.vehicle.name} - {self.expense_type} - {self.amount}"
 
@@ -220,6 +330,9 @@ class TripPlan(models.Model):
     lodging_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     meal_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     extra_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # gravados junto com os pedagios para a listagem nao reagregar TripToll
+    toll_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    estimated_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -253,6 +366,15 @@ class CreditCard(models.Model):
         blank=True,
         related_name="child_cards",
     )
+    # raiz da cadeia parent_card (o proprio cartao quando nao herda);
+    # mantido por refresh_billing_owners sempre que a hierarquia muda
+    billing_owner = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="billed_cards",
+    )
     nickname = models.CharField(max_length=80, blank=True, default="")
     last4 = models.CharField(max_length=4)
     closing_day = models.PositiveSmallIntegerField(default=20)
@@ -281,7 +403,62 @@ class CreditCardExpense(models.Model):
     category = models.CharField(max_length=80)
     description = models.TextField(blank=True, default="")
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # fatura (competencia) em que a compra cai pela regra do cartao titular;
+    # mantida por sync_credit_card_bills
+    competence_year = models.PositiveSmallIntegerField(null=True, blank=True)
+    competence_month = models.PositiveSmallIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "card", "date"], name="ccexp_user_card_date_idx"),
+            models.Index(fields=["user", "competence_year", "competence_month"], name="ccexp_user_competence_idx"),
+        ]
+
     def __str__(self):
         return f"****{self.card.last4} - {self.category} - {self.amount}"
+
+
+class ExchangeRateQuote(models.Model):
+    pair = models.CharField(max_length=10, unique=True)
+    rate = models.DecimalField(max_digits=12, decimal_places=6)
+    name = models.CharField(max_length=80, blank=True, default="")
+    source = models.CharField(max_length=40, blank=True, default="")
+    quote_timestamp = models.CharField(max_length=40, blank=True, default="")
+    quote_create_date = models.CharField(max_length=40, blank=True, default="")
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.pair} {self.rate}"
+
+
+class OutboundMessage(models.Model):
+    STATUS_CHOICES = (
+        ("PENDENTE", "Pendente"),
+        ("ENVIADO", "Enviado"),
+        ("FALHOU", "Falhou"),
+    )
+
+    user = models.ForeignKey(
+        UserAccount,
+        on_delete=models.CASCADE,
+        related_name="outbound_messages"
+    )
+    target_url = models.URLField(max_length=300)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="PENDENTE")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=6)
+    next_attempt_at = models.DateTimeField()
+    last_status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outbound_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.target_url} - {self.status}"
@@ -0,0 +1,184 @@
+import textwrap
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+CONTENT_BOTTOM = 44
+
+
+def pdf_escape(text):
+    return str(text).replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text_style(kind):
+    # (largura de quebra, cor, tamanho da fonte)
+    if kind == "mono":
+        return 92, "0.82 0.88 0.95", 10
+    return 96, "0.90 0.93 0.98", 11
+
+
+def _item_text(item):
+    kind, text = item[0], item[1]
+    if kind == "li":
+        return f"- {text}"
+    if kind == "q":
+        return f'"{text}"'
+    return text
+
+
+def item_height(item):
+    kind = item[0]
+    if kind == "sp":
+        return 8
+    if kind == "h2":
+        return 18
+    if kind in {"concept", "alert", "tip"}:
+        return 54
+    wrap_width = _text_style(kind)[0]
+    return 14 * max(1, len(textwrap.wrap(_item_text(item), width=wrap_width)))
+
+
+def page_top(page):
+    return 728 if page.get("subtitle") else 744
+
+
+def render_page_commands(page, footer, header=None):
+    """Monta os operadores de conteudo de uma pagina no layout escuro do GenFin.
+
+    header e uma tupla (texto a esquerda, texto a direita) omitida nas capas.
+    """
+    title = page.get("title", "")
+    subtitle = page.get("subtitle", "")
+    is_cover = bool(page.get("cover"))
+
+    cmds = []
+    cmds.append(f"0.04 0.07 0.12 rg 0 0 {PAGE_WIDTH} {PAGE_HEIGHT} re f")
+    if header and not is_cover:
+        left, right = header
+        cmds.append("0.58 0.76 1 rg 40 816 515 1 re f")
+        cmds.append(f"BT /F1 9 Tf 0.75 0.82 0.95 rg 42 824 Td ({pdf_escape(left)}) Tj ET")
+        cmds.append(f"BT /F1 9 Tf 0.75 0.82 0.95 rg 425 824 Td ({pdf_escape(right)}) Tj ET")
+
+    cmds.append("BT")
+    cmds.append("/F1 22 Tf")
+    cmds.append("0.91 0.94 0.98 rg")
+    cmds.append(f"1 0 0 1 50 782 Tm ({pdf_escape(title)}) Tj")
+    if subtitle:
+        cmds.append("/F1 12 Tf")
+        cmds.append("0.58 0.73 0.94 rg")
+        cmds.append(f"1 0 0 1 50 758 Tm ({pdf_escape(subtitle)}) Tj")
+    cmds.append("ET")
+
+    y = page_top(page)
+    for item in page.get("items", []):
+        kind = item[0]
+        if kind == "sp":
+            y -= 8
+            continue
+        if kind == "h2":
+            cmds.append("BT /F1 13 Tf 0.72 0.86 1 rg")
+            cmds.append(f"1 0 0 1 50 {y} Tm ({pdf_escape(item[1])}) Tj ET")
+            y -= 18
+            continue
+        if kind in {"concept", "alert", "tip"}:
+            stroke = {"concept": "0.25 0.68 1", "alert": "0.95 0.35 0.35", "tip": "0.30 0.82 0.52"}[kind]
+            title_box = item[1]
+            body_box = item[2]
+            cmds.append(f"{stroke} RG 50 {y-40} 495 46 re S")
+            cmds.append("BT /F1 10 Tf 0.90 0.93 0.98 rg")
+            cmds.append(f"1 0 0 1 58 {y-16} Tm ({pdf_escape(title_box)}) Tj")
+            yy = y - 30
+            for part in textwrap.wrap(body_box, width=90)[:2]:
+                cmds.append(f"1 0 0 1 58 {yy} Tm ({pdf_escape(part)}) Tj")
+                yy -= 12
+            cmds.append("ET")
+            y -= 54
+            continue
+
+        wrap_width, color, size = _text_style(kind)
+        for part in textwrap.wrap(_item_text(item), width=wrap_width):
+            cmds.append(f"BT /F1 {size} Tf {color} rg 1 0 0 1 50 {y} Tm ({pdf_escape(part)}) Tj ET")
+            y -= 14
+
+    cmds.append("0.58 0.76 1 rg 40 28 515 1 re f")
+    cmds.append(f"BT /F1 9 Tf 0.75 0.82 0.95 rg 50 14 Td ({pdf_escape(footer)}) Tj ET")
+    return cmds
+
+
+def paginate_items(items, title, subtitle=""):
+    """Agrupa um iteravel de itens em paginas que cabem na area util.
+
+    Consome items sob demanda: so a pagina corrente fica em memoria.
+    """
+    page = {"title": title, "subtitle": subtitle, "items": []}
+    remaining = page_top(page) - CONTENT_BOTTOM
+    for item in items:
+        height = item_height(item)
+        if page["items"] and height > remaining:
+            yield page
+            page = {"title": title, "items": []}
+            remaining = page_top(page) - CONTENT_BOTTOM
+            if item[0] == "sp":
+                continue
+        page["items"].append(item)
+        remaining -= height
+    yield page
+
+
+class PdfStreamWriter:
+    """Escreve um PDF objeto a objeto, devolvendo os bytes de cada trecho.
+
+    O objeto /Pages e reservado no inicio e gravado em finish(); assim cada
+    pagina pode ser enviada assim que e gerada e o writer so guarda os
+    offsets da tabela xref.
+    """
+
+    FONT_ID = 1
+    PAGES_ID = 2
+
+    def __init__(self):
+        self.position = 0
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = self.PAGES_ID + 1
+
+    def _allocate(self):
+        obj_id = self.next_id
+        self.next_id += 1
+        return obj_id
+
+    def _object(self, obj_id, body):
+        data = f"{obj_id} 0 obj\n{body}\nendobj\n".encode("latin-1", errors="ignore")
+        self.offsets[obj_id] = self.position
+        self.position += len(data)
+        return data
+
+    def begin(self):
+        header = b"%PDF-1.4\n"
+        self.position = len(header)
+        return header + self._object(self.FONT_ID, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    def add_page(self, cmds):
+        stream = "\n".join(cmds)
+        stream_len = len(stream.encode("latin-1", errors="ignore"))
+        content_id = self._allocate()
+        data = self._object(content_id, f"<< /Length {stream_len} >>\nstream\n{stream}\nendstream")
+        page_id = self._allocate()
+        self.page_ids.append(page_id)
+        data += self._object(
+            page_id,
+            f"<< /Type /Page /Parent {self.PAGES_ID} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 {self.FONT_ID} 0 R >> >> /Contents {content_id} 0 R >>",
+        )
+        return data
+
+    def finish(self):
+        kids = " ".join(f"{pid} 0 R" for pid in self.page_ids)
+        data = self._object(self.PAGES_ID, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>")
+        catalog_id = self._allocate()
+        data += self._object(catalog_id, f"<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>")
+        xref_pos = self.position
+        size = self.next_id
+        parts = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        parts.extend(f"{self.offsets[obj_id]:010d} 00000 n \n" for obj_id in range(1, size))
+        parts.append(f"trailer\n<< /Size {size} /Root {catalog_id} 0 R >>\nstartxref\n{xref_pos}\n%%EOF")
+        return data + "".join(parts).encode("latin-1")
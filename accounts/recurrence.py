@@ -0,0 +1,134 @@
+import calendar
+import heapq
+from datetime import date, timedelta
+
+FREQUENCY_CHOICES = (
+    ("DIARIO", "Diario"),
+    ("SEMANAL", "Semanal"),
+    ("MENSAL", "Mensal"),
+    ("ANUAL", "Anual"),
+)
+# passo fixo em dias ou em meses (o dia do mes e o da ancora, limitado ao fim do mes)
+DAY_STEPS = {"DIARIO": 1, "SEMANAL": 7}
+MONTH_STEPS = {"MENSAL": 1, "ANUAL": 12}
+
+
+def add_months(anchor, months):
+    idx = anchor.year * 12 + (anchor.month - 1) + months
+    year, month = idx // 12, idx % 12 + 1
+    return date(year, month, min(anchor.day, calendar.monthrange(year, month)[1]))
+
+
+def month_index(value):
+    return value.year * 12 + value.month - 1
+
+
+class RecurrenceRule:
+    """Serie que comeca em `anchor`; sem `frequency` e uma ocorrencia unica.
+
+    As datas sao calculadas por aritmetica a partir da ancora, entao expandir uma
+    janela distante nao percorre as ocorrencias anteriores a ela.
+    """
+
+    __slots__ = ("anchor", "frequency", "interval", "until", "exceptions")
+
+    def __init__(self, anchor, frequency=None, interval=1, until=None, exceptions=()):
+        self.anchor = anchor
+        self.frequency = frequency if frequency in DAY_STEPS or frequency in MONTH_STEPS else None
+        self.interval = max(int(interval or 1), 1)
+        self.until = until
+        self.exceptions = frozenset(exceptions)
+
+    def bounds(self, start, end):
+        start = max(start, self.anchor)
+        if self.frequency is None:
+            end = min(end, self.anchor)
+        if self.until is not None:
+            end = min(end, self.until)
+        return start, end
+
+    def dates(self, start, end):
+        """Gera, em ordem e sob demanda, as ocorrencias em [start, end]."""
+        start, end = self.bounds(start, end)
+        if start > end:
+            return
+        if self.frequency is None:
+            if self.anchor not in self.exceptions:
+                yield self.anchor
+            return
+
+        if self.frequency in DAY_STEPS:
+            step = DAY_STEPS[self.frequency] * self.interval
+            skipped = -(-(start - self.anchor).days // step)
+            current = self.anchor + timedelta(days=skipped * step)
+            delta = timedelta(days=step)
+            while current <= end:
+                if current not in self.exceptions:
+                    yield current
+                current += delta
+            return
+
+        step = MONTH_STEPS[self.frequency] * self.interval
+        n = max(-(-(month_index(start) - month_index(self.anchor)) // step), 0)
+        while True:
+            current = add_months(self.anchor, n * step)
+            if current > end:
+                return
+            if current >= start and current not in self.exceptions:
+                yield current
+            n += 1
+
+    def count(self, start, end):
+        """Quantidade de ocorrencias em [start, end] sem gerar as datas."""
+        start, end = self.bounds(start, end)
+        if start > end:
+            return 0
+        if self.frequency is None:
+            return 0 if self.anchor in self.exceptions else 1
+        if self.frequency in DAY_STEPS:
+            step = DAY_STEPS[self.frequency] * self.interval
+            first = -(-(start - self.anchor).days // step)
+            last = (end - self.anchor).days // step
+        else:
+            step = MONTH_STEPS[self.frequency] * self.interval
+            first = -(-(month_index(start) - month_index(self.anchor)) // step)
+            if add_months(self.anchor, first * step) < start:
+                first += 1
+            last = (month_index(end) - month_index(self.anchor)) // step
+            if add_months(self.anchor, last * step) > end:
+                last -= 1
+        total = max(last - first + 1, 0)
+        return total - sum(1 for skipped in self.exceptions if start <= skipped <= end and self.is_occurrence(skipped))
+
+    def is_occurrence(self, value):
+        if value < self.anchor or (self.until is not None and value > self.until):
+            return False
+        if self.frequency is None:
+            return value == self.anchor
+        if self.frequency in DAY_STEPS:
+            return (value - self.anchor).days % (DAY_STEPS[self.frequency] * self.interval) == 0
+        months = month_index(value) - month_index(self.anchor)
+        step = MONTH_STEPS[self.frequency] * self.interval
+        return months % step == 0 and add_months(self.anchor, months) == value
+
+
+def parse_exception_dates(values):
+    dates = set()
+    for value in values or []:
+        try:
+            dates.add(date.fromisoformat(str(value)))
+        except ValueError:
+            continue
+    return dates
+
+
+def tagged_dates(rule, index, item, start, end):
+    for when in rule.dates(start, end):
+        yield when, index, item
+
+
+def merge_occurrences(series, start, end):
+    """Intercala as ocorrencias de varias series em ordem de data: (data, item) sob demanda."""
+    streams = [tagged_dates(rule, index, item, start, end) for index, (rule, item) in enumerate(series)]
+    for when, _, item in heapq.merge(*streams):
+        yield when, item
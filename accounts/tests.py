@@ -1,3 +1,1357 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from .metrics import finish_request_metrics, route_histograms, start_request_metrics
+from .models import (
+    CreditCard,
+    CreditCardExpense,
+    FinancialEntry,
+    OutboundMessage,
+    PlannedExpense,
+    ReceiptBlob,
+    TripPlan,
+    TripToll,
+    UserAccount,
+    Vehicle,
+    VehicleExpense,
+    VehicleFrequentDestination,
+)
+from .recurrence import RecurrenceRule
+from .views import (
+    USD_BRL_QUOTE_FAILURES_KEY,
+    USD_BRL_QUOTE_LOCK_KEY,
+    TripRunwayIndex,
+    build_cash_flow_forecast,
+    forecast_runway_days,
+    fetch_usd_brl_quote,
+    get_usd_brl_quote,
+    load_manual_pdf,
+    month_range_q,
+    process_outbound_messages,
+    rebuild_credit_card_bills,
+    rebuild_entry_rollups,
+    refresh_usd_brl_quote,
+    schedule_usd_brl_quote_refresh,
+    usd_brl_refresh_backoff,
+)
+
+
+class StubHTTPServer:
+    """Servidor HTTP local que responde com status/corpo fixos e guarda as requisicoes."""
+
+    def __init__(self, status=200, body=None):
+        self.status = status
+        self.body = body if body is not None else {}
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                stub.requests.append({"method": self.command, "path": self.path, "body": self.rfile.read(length)})
+                payload = json.dumps(stub.body).encode("utf-8")
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = _reply
+            do_POST = _reply
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class LoggedUserTestCase(TestCase):
+    phone_number = "5511999990000"
+
+    def setUp(self):
+        cache.clear()
+        self.user = UserAccount.objects.create(phone_number=self.phone_number, first_name="Teste")
+        session = self.client.session
+        session["user_id"] = self.user.id
+        session["user_phone"] = self.phone_number
+        session.save()
+
+
+class VehicleSummaryViewTests(LoggedUserTestCase):
+    def add_vehicle(self, idx):
+        vehicle = Vehicle.objects.create(
+            user=self.user,
+            name=f"Carro {idx}",
+            ipva_cost=1200,
+            fuel_km_per_liter=10,
+            fuel_price_per_liter=5,
+        )
+        VehicleExpense.objects.create(
+            user=self.user, vehicle=vehicle, date=date(2026, 3, 5), expense_type="COMBUSTIVEL", amount=100
+        )
+        VehicleExpense.objects.create(
+            user=self.user, vehicle=vehicle, date=date(2026, 1, 5), expense_type="SEGURO", amount=50, is_recurring=True
+        )
+        VehicleExpense.objects.create(
+            user=self.user, vehicle=vehicle, date=date(2026, 2, 5), expense_type="MANUTENCAO", amount=999
+        )
+        VehicleFrequentDestination.objects.create(
+            user=self.user, vehicle=vehicle, name="Trabalho", periodicity="MENSAL", distance_km=100
+        )
+        return vehicle
+
+    def fetch_summary(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/vehicles/summary/", {"month": 3, "year": 2026})
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_totals(self):
+        self.add_vehicle(1)
+        payload, _ = self.fetch_summary()
+
+        # 100 ipva/mes + 100 combustivel + 50 seguro recorrente + 50 deslocamento
+        self.assertEqual(payload["monthly_total"], 300)
+        self.assertEqual(payload["commute_monthly_cost"], 50)
+        categories = {row["category"]: row["total"] for row in payload["by_category"]}
+        self.assertEqual(categories["COMBUSTIVEL"], 100)
+        self.assertEqual(categories["SEGURO"], 50)
+        self.assertNotIn("MANUTENCAO", categories)
+
+    def test_query_count_does_not_scale_with_vehicles(self):
+        self.add_vehicle(1)
+        self.fetch_summary()
+        _, single_vehicle_queries = self.fetch_summary()
+
+        for idx in range(2, 21):
+            self.add_vehicle(idx)
+        payload, fleet_queries = self.fetch_summary()
+
+        self.assertEqual(payload["vehicle_count"], 20)
+        self.assertEqual(single_vehicle_queries, fleet_queries)
+
+
+class DashboardBootstrapViewTests(LoggedUserTestCase):
+    def setUp(self):
+        super().setUp()
+        today = date.today()
+        FinancialEntry.objects.create(user=self.user, entry_type="RECEITA", amount=1000, category="Salario", date=today)
+        FinancialEntry.objects.create(user=self.user, entry_type="DESPESA", amount=200, category="Mercado", date=today)
+        FinancialEntry.objects.create(user=self.user, entry_type="DESPESA", amount=50, category="Lazer", date=date(2020, 1, 1))
+        rebuild_entry_rollups(self.user)
+        schedule = mock.patch("accounts.views.schedule_usd_brl_quote_refresh")
+        schedule.start()
+        self.addCleanup(schedule.stop)
+
+    def test_sections_match_individual_endpoints(self):
+        response = self.client.get("/api/dashboard/bootstrap/")
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+
+        for field, url in (
+            ("dashboard", "/api/dashboard/"),
+            ("categories", "/api/dashboard/categories/"),
+            ("stats_daily", "/api/stats/daily/"),
+            ("stats_monthly", "/api/stats/monthly/"),
+            ("planner", "/api/planner/"),
+            ("vehicle_summary", "/api/vehicles/summary/"),
+        ):
+            self.assertEqual(payload[field], self.client.get(url).json(), field)
+
+    def test_field_selection(self):
+        response = self.client.get("/api/dashboard/bootstrap/", {"fields": "dashboard,stats_weekly"})
+        self.assertEqual(set(response.json()), {"dashboard", "stats_weekly"})
+
+        response = self.client.get("/api/dashboard/bootstrap/", {"fields": "dashboard,nope"})
+        self.assertEqual(response.status_code, 400)
+
+
+class FinancialEntryRollupTests(LoggedUserTestCase):
+    def rollup_rows(self):
+        return sorted(
+            self.user.entry_rollups.values_list("year", "month", "entry_type", "category", "total_amount", "entry_count")
+        )
+
+    def test_rollup_follows_entry_writes(self):
+        for amount, categoria, data in (
+            ("100.50", "Mercado", "05/01/2026"),
+            ("20.00", "Mercado", "20/01/2026"),
+            ("300.00", "Aluguel", "03/02/2026"),
+        ):
+            response = self.client.post(
+                "/api/financial-entry/",
+                {"phone_number": self.phone_number, "categoria": categoria, "data": data, "despesa": amount},
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 201)
+        self.client.post(
+            "/api/financial-entry/",
+            {"phone_number": self.phone_number, "categoria": "Salario", "data": "01/02/2026", "receita": "5000"},
+            content_type="application/json",
+        )
+
+        entry = self.user.entries.get(category="Aluguel")
+        response = self.client.put(
+            f"/api/entries/{entry.id}/",
+            {"date": "2026-03-03", "category": "Moradia", "amount": "350.00"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.client.delete(f"/api/entries/{self.user.entries.get(amount=20).id}/")
+
+        maintained = self.rollup_rows()
+        rebuild_entry_rollups(self.user)
+        self.assertEqual(maintained, self.rollup_rows())
+        self.assertEqual(len(maintained), 3)
+
+        dashboard = self.client.get("/api/dashboard/").json()
+        self.assertEqual(float(dashboard["saldo"]), 5000 - 100.50 - 350)
+        categories = self.client.get("/api/dashboard/categories/").json()
+        self.assertEqual([row["category"] for row in categories], ["Moradia", "Mercado"])
+
+
+class UsdBrlQuoteCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.stub = StubHTTPServer(body={"USDBRL": {"bid": "5.4321", "name": "Dolar/Real", "create_date": "2026-10-01"}})
+        self.addCleanup(self.stub.close)
+        env = mock.patch.dict(os.environ, {"GENFIN_USD_BRL_QUOTE_URL": self.stub.url, "GENFIN_FX_QUOTE_TTL": "300"})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def test_refresh_persists_last_good_quote(self):
+        quote = refresh_usd_brl_quote()
+        self.assertEqual(quote["rate"], 5.4321)
+        cache.clear()
+
+        with mock.patch("accounts.views.schedule_usd_brl_quote_refresh") as schedule:
+            cached = get_usd_brl_quote()
+        self.assertEqual(cached["rate"], 5.4321)
+        schedule.assert_not_called()
+        self.assertEqual(len(self.stub.requests), 1)
+
+    def test_stale_quote_is_served_while_refresh_is_scheduled(self):
+        refresh_usd_brl_quote()
+        with mock.patch("accounts.views.time.time", return_value=time.time() + 3600):
+            with mock.patch("accounts.views.schedule_usd_brl_quote_refresh") as schedule:
+                quote = get_usd_brl_quote()
+        self.assertEqual(quote["rate"], 5.4321)
+        schedule.assert_called_once()
+
+    def test_failed_refresh_backs_off_before_the_next_attempt(self):
+        self.stub.status = 503
+        # a "thread" do refresh roda inline para o teste enxergar o resultado
+        with mock.patch("accounts.views.threading") as threading_mock, mock.patch("accounts.views.db_connection"):
+            threading_mock.Thread.side_effect = lambda target, daemon: mock.Mock(start=target)
+            self.assertTrue(schedule_usd_brl_quote_refresh())
+            self.assertEqual(len(self.stub.requests), 1)
+            # a API caiu: nenhuma nova thread nem chamada ate o backoff vencer
+            for _ in range(5):
+                self.assertFalse(schedule_usd_brl_quote_refresh())
+            self.assertEqual(len(self.stub.requests), 1)
+            self.assertEqual(cache.get(USD_BRL_QUOTE_FAILURES_KEY), 1)
+            self.assertEqual(usd_brl_refresh_backoff(1), 60)
+            self.assertEqual(usd_brl_refresh_backoff(3), 240)
+            self.assertEqual(usd_brl_refresh_backoff(50), 3600)
+
+            # backoff vencido e API de volta: o sucesso zera o contador e libera o lock
+            cache.delete(USD_BRL_QUOTE_LOCK_KEY)
+            self.stub.status = 200
+            self.assertTrue(schedule_usd_brl_quote_refresh())
+        self.assertIsNone(cache.get(USD_BRL_QUOTE_FAILURES_KEY))
+        self.assertIsNone(cache.get(USD_BRL_QUOTE_LOCK_KEY))
+        self.assertEqual(get_usd_brl_quote()["rate"], 5.4321)
+
+    def test_missing_quote_falls_back_without_waiting(self):
+        with mock.patch("accounts.views.schedule_usd_brl_quote_refresh") as schedule:
+            quote = get_usd_brl_quote()
+        self.assertEqual(quote["source"], "fallback")
+        schedule.assert_called_once()
+        self.assertEqual(self.stub.requests, [])
+
+
+class OutboundMessageQueueTests(LoggedUserTestCase):
+    def setUp(self):
+        super().setUp()
+        self.stub = StubHTTPServer(body={"ok": True})
+        self.addCleanup(self.stub.close)
+
+    def enqueue(self, text):
+        response = self.client.post("/api/whatsapp-summary/", {"text": text}, content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        OutboundMessage.objects.filter(id=response.json()["id"]).update(target_url=self.stub.url + "webhook/genfinWpp")
+        return response.json()["id"]
+
+    def test_messages_are_delivered_by_the_worker(self):
+        first = self.enqueue("Resumo 1")
+        self.enqueue("Resumo 2")
+        self.assertEqual(self.stub.requests, [])
+
+        self.assertEqual(process_outbound_messages(), {"sent": 2, "failed": 0})
+        self.assertEqual(
+            [json.loads(r["body"])["text"] for r in self.stub.requests],
+            ["Resumo 1", "Resumo 2"],
+        )
+        self.assertEqual(self.stub.requests[0]["path"], "/webhook/genfinWpp")
+
+        status_payload = self.client.get(f"/api/whatsapp-summary/{first}/").json()
+        self.assertEqual(status_payload["status"], "ENVIADO")
+        self.assertEqual(status_payload["last_status_code"], 200)
+        self.assertEqual(process_outbound_messages(), {"sent": 0, "failed": 0})
+
+    def test_failures_back_off_until_max_attempts(self):
+        self.stub.status = 500
+        message_id = self.enqueue("Resumo")
+
+        self.assertEqual(process_outbound_messages(), {"sent": 0, "failed": 1})
+        message = OutboundMessage.objects.get(id=message_id)
+        self.assertEqual((message.status, message.attempts), ("PENDENTE", 1))
+        self.assertEqual(process_outbound_messages(), {"sent": 0, "failed": 0})
+
+        OutboundMessage.objects.filter(id=message_id).update(attempts=message.max_attempts - 1, next_attempt_at=message.created_at)
+        process_outbound_messages()
+        self.assertEqual(OutboundMessage.objects.get(id=message_id).status, "FALHOU")
+
+
+class FinancialEntryBulkCreateViewTests(LoggedUserTestCase):
+    def setUp(self):
+        super().setUp()
+        UserAccount.objects.create(phone_number="5511888880000")
+
+    def test_rows_are_validated_and_inserted_in_bulk(self):
+        rows = [
+            {"phone_number": self.phone_number, "categoria": "Mercado", "data": "05/01/2026", "despesa": "10.50"},
+            {"phone_number": "5511888880000", "categoria": "Salario", "data": "05/01/2026", "receita": 3000},
+            {"phone_number": self.phone_number, "categoria": "Mercado", "data": "2026-01-05", "despesa": 1},
+            {"phone_number": "0000", "categoria": "Mercado", "data": "05/01/2026", "despesa": 1},
+        ] + [
+            {"phone_number": self.phone_number, "categoria": "Lazer", "data": "06/01/2026", "despesa": 2}
+            for _ in range(50)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post("/api/financial-entry/bulk/", rows, content_type="application/json")
+        self.assertLess(len(ctx.captured_queries), 20)
+
+        self.assertEqual(response.status_code, 201)
+        payload = response.json()
+        self.assertEqual((payload["created"], payload["errors"]), (52, 2))
+        self.assertIn("id", payload["results"][0])
+        self.assertEqual(payload["results"][2]["error"], "Formato de data invalido. Use DD/MM/YYYY")
+        self.assertEqual(payload["results"][3]["error"], "Usuario nao encontrado")
+        self.assertEqual(float(self.client.get("/api/dashboard/").json()["total_despesa"]), 110.50)
+
+    def test_ndjson_stream(self):
+        body = "\n".join(
+            [
+                json.dumps({"phone_number": self.phone_number, "categoria": "Mercado", "data": "05/01/2026", "despesa": 5}),
+                "nao e json",
+                "",
+            ]
+        )
+        response = self.client.post("/api/financial-entry/bulk/", body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()["created"], response.json()["errors"]), (1, 1))
+
+
+class FinancialEntryListViewTests(LoggedUserTestCase):
+    def setUp(self):
+        super().setUp()
+        FinancialEntry.objects.bulk_create(
+            FinancialEntry(
+                user=self.user,
+                entry_type="DESPESA" if i % 3 else "RECEITA",
+                amount=i + 1,
+                category="Mercado" if i % 2 else "Lazer",
+                date=date(2026, 1 + i % 3, 1 + i % 5),
+            )
+            for i in range(30)
+        )
+
+    def test_cursor_walks_every_entry_once(self):
+        seen = []
+        cursor = ""
+        while True:
+            response = self.client.get("/api/entries/", {"limit": 7, "cursor": cursor})
+            self.assertEqual(response.status_code, 200)
+            seen.extend(response.json())
+            cursor = response.get("X-Next-Cursor", "")
+            if not cursor:
+                break
+
+        expected = list(FinancialEntry.objects.order_by("-date", "-id").values_list("id", flat=True))
+        self.assertEqual([e["id"] for e in seen], expected)
+
+    def test_filters_and_stream(self):
+        params = {"date_from": "2026-02-01", "date_to": "28/02/2026", "entry_type": "despesa", "category": "Mercado"}
+        expected = FinancialEntry.objects.filter(
+            date__month=2, entry_type="DESPESA", category="Mercado"
+        ).count()
+        self.assertEqual(len(self.client.get("/api/entries/", {**params, "limit": 500}).json()), expected)
+
+        response = self.client.get("/api/entries/", {**params, "stream": "1"})
+        self.assertEqual(len(json.loads(b"".join(response.streaming_content))), expected)
+
+        self.assertEqual(self.client.get("/api/entries/", {"cursor": "???"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/entries/", {"date_from": "2026-13-01"}).status_code, 400)
+
+
+class AccessPathIndexTests(TestCase):
+    def test_month_range_matches_year_month_lookup(self):
+        user = UserAccount.objects.create(phone_number="5511999990000")
+        for day in (date(2026, 1, 31), date(2026, 2, 1), date(2026, 2, 28), date(2026, 3, 1)):
+            FinancialEntry.objects.create(user=user, entry_type="DESPESA", amount=1, category="Mercado", date=day)
+
+        by_range = set(user.entries.filter(month_range_q(2026, 2)).values_list("id", flat=True))
+        by_lookup = set(user.entries.filter(date__year=2026, date__month=2).values_list("id", flat=True))
+        self.assertEqual(by_range, by_lookup)
+        self.assertFalse(user.entries.filter(month_range_q(2026, 13)).exists())
+
+    def test_benchmark_leaves_no_data_behind(self):
+        out = io.StringIO()
+        call_command("benchmark_indexes", users=2, rows=20, repeat=1, database="default", stdout=out)
+        self.assertIn("com indices", out.getvalue())
+        self.assertFalse(UserAccount.objects.filter(phone_number__startswith="00bench").exists())
+
+    def test_benchmark_refuses_missing_or_remote_database(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark_indexes", database="", stdout=io.StringIO())
+        with mock.patch.dict(connections.settings["default"], {"HOST": "db.example.com"}):
+            with self.assertRaises(CommandError):
+                call_command("benchmark_indexes", database="default", stdout=io.StringIO())
+        self.assertFalse(UserAccount.objects.filter(phone_number__startswith="00bench").exists())
+
+
+class SessionUserTests(LoggedUserTestCase):
+    def test_user_is_cached_and_invalidated_on_profile_update(self):
+        self.client.get("/api/profile/")
+        self.assertEqual(self.client.session["user_id"], self.user.id)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/profile/")
+        user_queries = [q for q in ctx.captured_queries if "accounts_useraccount" in q["sql"]]
+        self.assertEqual(user_queries, [])
+        cached = cache.get(f"session-user:{self.user.id}")
+        self.assertNotIn("password", cached)
+
+        response = self.client.put(
+            "/api/profile/", {"first_name": "Novo", "phone_number": "5511777770000"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        profile = self.client.get("/api/profile/").json()
+        self.assertEqual((profile["first_name"], profile["phone_number"]), ("Novo", "5511777770000"))
+
+    def test_password_change_from_cached_user(self):
+        self.user.set_password("antiga1")
+        self.user.save()
+        self.client.get("/api/profile/")
+        response = self.client.put(
+            "/api/profile/",
+            {"first_name": "Teste", "phone_number": self.phone_number, "password": "nova123"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("nova123"))
+        self.assertEqual(self.user.first_name, "Teste")
+
+
+class UserManualPdfViewTests(LoggedUserTestCase):
+    def setUp(self):
+        super().setUp()
+        load_manual_pdf.cache_clear()
+        self.addCleanup(load_manual_pdf.cache_clear)
+
+    def test_prebuilt_manual_is_served_with_validators(self):
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            call_command("build_manual_pdf", stdout=io.StringIO())
+            with mock.patch("accounts.views.build_manual_pdf_bytes") as build:
+                response = self.client.get("/api/profile/manual-pdf/")
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.content.startswith(b"%PDF-1.4"))
+
+                etag = response["ETag"]
+                cached = self.client.get("/api/profile/manual-pdf/", HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(cached.status_code, 304)
+                since = self.client.get("/api/profile/manual-pdf/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+                self.assertEqual(since.status_code, 304)
+            build.assert_not_called()
+
+
+class FinancialStatementPdfViewTests(LoggedUserTestCase):
+    def test_statement_is_streamed_page_by_page(self):
+        FinancialEntry.objects.bulk_create(
+            FinancialEntry(user=self.user, entry_type="DESPESA", amount=10, category=f"Cat {idx}", date=date(2026, 3, 1 + idx % 28))
+            for idx in range(300)
+        )
+        FinancialEntry.objects.create(user=self.user, entry_type="RECEITA", amount=5000, category="Salario", date=date(2026, 3, 5))
+
+        response = self.client.get("/api/profile/statement-pdf/", {"month": 3, "year": 2026})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        pdf = b"".join(chunks)
+        self.assertTrue(pdf.startswith(b"%PDF-1.4"))
+        self.assertTrue(pdf.endswith(b"%%EOF"))
+
+        page_count = pdf.count(b"/Type /Page ")
+        self.assertGreater(page_count, 1)
+        self.assertEqual(len(chunks), page_count + 2)
+        self.assertIn(f"/Count {page_count}".encode(), pdf)
+        self.assertIn(b"R$ 3.000,00", pdf)
+
+        # cada entrada do xref aponta para o inicio do objeto correspondente
+        xref_pos = int(pdf.rsplit(b"startxref\n", 1)[1].split(b"\n", 1)[0])
+        rows = pdf[xref_pos:].split(b"\n")[3:]
+        for obj_id, row in enumerate(rows, start=1):
+            if not row.endswith(b" n "):
+                break
+            offset = int(row[:10])
+            self.assertTrue(pdf[offset:].startswith(f"{obj_id} 0 obj".encode()))
+
+    def test_invalid_month(self):
+        response = self.client.get("/api/profile/statement-pdf/", {"month": 13, "year": 2026})
+        self.assertEqual(response.status_code, 400)
+
+
+class FinancialEntryReceiptViewTests(LoggedUserTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = self.settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.entry = FinancialEntry.objects.create(
+            user=self.user, entry_type="DESPESA", amount=10, category="Mercado", date=date(2026, 3, 1)
+        )
+        self.content = bytes(range(256)) * 40
+        self.url = f"/api/entries/{self.entry.id}/receipt/"
+        upload = SimpleUploadedFile("nota.pdf", self.content, content_type="application/pdf")
+        self.assertEqual(self.client.post(self.url, {"receipt": upload}).status_code, 200)
+
+    def test_range_and_conditional_requests(self):
+        full = self.client.get(self.url)
+        self.assertEqual(full.status_code, 200)
+        self.assertEqual(b"".join(full.streaming_content), self.content)
+        self.assertEqual(full["Accept-Ranges"], "bytes")
+        self.assertEqual(full["Content-Type"], "application/pdf")
+
+        partial = self.client.get(self.url, HTTP_RANGE="bytes=100-199")
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial["Content-Range"], f"bytes 100-199/{len(self.content)}")
+        self.assertEqual(b"".join(partial.streaming_content), self.content[100:200])
+
+        suffix = self.client.get(self.url, HTTP_RANGE="bytes=-50")
+        self.assertEqual(b"".join(suffix.streaming_content), self.content[-50:])
+
+        stale = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"outro"')
+        self.assertEqual(stale.status_code, 200)
+
+        unsatisfiable = self.client.get(self.url, HTTP_RANGE=f"bytes={len(self.content)}-")
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable["Content-Range"], f"bytes */{len(self.content)}")
+
+        cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=full["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_sendfile_mode_only_authorizes(self):
+        with mock.patch.dict(os.environ, {"GENFIN_RECEIPT_SENDFILE": "nginx"}):
+            response = self.client.get(self.url, HTTP_RANGE="bytes=0-9")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+        self.entry.refresh_from_db()
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/" + self.entry.receipt_file.name)
+
+    def test_identical_uploads_share_one_blob(self):
+        other = FinancialEntry.objects.create(
+            user=self.user, entry_type="DESPESA", amount=20, category="Mercado", date=date(2026, 3, 2)
+        )
+        # mesmo conteudo com outra extensao: nenhum arquivo novo fica orfao no disco
+        upload = SimpleUploadedFile("copia.bin", self.content, content_type="application/octet-stream")
+        self.assertEqual(self.client.post(f"/api/entries/{other.id}/receipt/", {"receipt": upload}).status_code, 200)
+
+        blob = ReceiptBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.sha256, hashlib.sha256(self.content).hexdigest())
+        path = blob.file.path
+        stored = [name for _, _, names in os.walk(os.path.dirname(os.path.dirname(path))) for name in names]
+        self.assertEqual(stored, [blob.sha256])
+
+        first = self.client.get(self.url)
+        self.assertIn('filename="nota.pdf"', first["Content-Disposition"])
+        self.assertEqual(first["Content-Type"], "application/pdf")
+        second = self.client.get(f"/api/entries/{other.id}/receipt/")
+        self.assertIn('filename="copia.bin"', second["Content-Disposition"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(self.url).status_code, 204)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f"/api/entries/{other.id}/").status_code, 204)
+        self.assertFalse(ReceiptBlob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_image_thumbnail_is_generated_in_background(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 900), "white").save(buffer, "PNG")
+        upload = SimpleUploadedFile("foto.png", buffer.getvalue(), content_type="image/png")
+        self.assertEqual(self.client.post(self.url, {"receipt": upload}).status_code, 200)
+        self.assertEqual(self.client.get(f"{self.url}thumbnail/").status_code, 404)
+
+        call_command("process_receipt_thumbnails", stdout=io.StringIO())
+        response = self.client.get(f"{self.url}thumbnail/")
+        self.assertEqual(response.status_code, 200)
+        with Image.open(io.BytesIO(b"".join(response.streaming_content))) as thumbnail:
+            self.assertLessEqual(max(thumbnail.size), 320)
+        # o pdf anterior perdeu a ultima referencia ao ser substituido
+        self.assertEqual(list(ReceiptBlob.objects.values_list("content_type", flat=True)), ["image/png"])
+
+
+class ProfileResetDataViewTests(LoggedUserTestCase):
+    def test_reset_deletes_by_set_and_reports_counts(self):
+        parent = CreditCard.objects.create(user=self.user, last4="1111")
+        child = CreditCard.objects.create(user=self.user, last4="2222", parent_card=parent)
+        CreditCardExpense.objects.create(user=self.user, card=child, date=date(2026, 3, 1), category="Mercado", amount=50)
+        vehicle = Vehicle.objects.create(user=self.user, name="Carro")
+        VehicleExpense.objects.create(user=self.user, vehicle=vehicle, date=date(2026, 3, 1), expense_type="OUTRO", amount=10)
+        trip = TripPlan.objects.create(user=self.user, vehicle=vehicle, title="Praia")
+        TripToll.objects.bulk_create([TripToll(trip=trip, amount=5), TripToll(trip=trip, amount=7)])
+        FinancialEntry.objects.bulk_create(
+            FinancialEntry(user=self.user, entry_type="DESPESA", amount=1, category="X", date=date(2026, 3, 1))
+            for _ in range(50)
+        )
+        rebuild_entry_rollups(self.user)
+        other = UserAccount.objects.create(phone_number="5511888880000")
+        FinancialEntry.objects.create(user=other, entry_type="RECEITA", amount=1, category="X", date=date(2026, 3, 1))
+
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                "/api/profile/reset-data/", data=json.dumps({"confirmation": "zerar"}), content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 200)
+        deleted = response.json()["deleted"]
+        self.assertEqual(deleted["entries"], 50)
+        self.assertEqual(deleted["credit_cards"], 2)
+        self.assertEqual(deleted["trip_tolls"], 2)
+        self.assertEqual(deleted["vehicles"], 1)
+        self.assertEqual(deleted["entry_rollups"], 1)
+        self.assertLess(len(ctx.captured_queries), 25)
+
+        self.assertFalse(FinancialEntry.objects.filter(user=self.user).exists())
+        self.assertFalse(TripToll.objects.exists())
+        self.assertEqual(FinancialEntry.objects.filter(user=other).count(), 1)
+
+    def test_reset_removes_legacy_receipt_files_after_commit(self):
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            os.makedirs(os.path.join(media_root, "receipts"))
+            path = os.path.join(media_root, "receipts", "antigo.pdf")
+            with open(path, "wb") as fh:
+                fh.write(b"%PDF-1.4")
+            FinancialEntry.objects.create(
+                user=self.user, entry_type="DESPESA", amount=1, category="X", date=date(2026, 3, 1),
+                receipt_file="receipts/antigo.pdf",
+            )
+
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                response = self.client.delete(
+                    "/api/profile/reset-data/", data=json.dumps({"confirmation": "zerar"}), content_type="application/json"
+                )
+                # nada sai do disco antes do commit
+                self.assertTrue(os.path.exists(path))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(callbacks), 1)
+            self.assertFalse(os.path.exists(path))
+
+
+class CreditCardCompetenceTests(LoggedUserTestCase):
+    def setUp(self):
+        super().setUp()
+        schedule = mock.patch("accounts.views.schedule_usd_brl_quote_refresh")
+        schedule.start()
+        self.addCleanup(schedule.stop)
+        self.owner = CreditCard.objects.create(user=self.user, last4="1111", closing_day=14, due_day=20, limit_amount=1000)
+        self.child = CreditCard.objects.create(user=self.user, last4="2222", parent_card=self.owner, closing_day=28, due_day=5)
+
+    def add_expense(self, card, day, amount):
+        response = self.client.post(
+            "/api/credit-card-expenses/create/",
+            {"card_id": card.id, "date": day, "category": "Mercado", "amount": amount},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+    def summary_total(self, month, year):
+        return self.client.get("/api/credit-cards/summary/", {"month": month, "year": year}).json()["total_spent"]
+
+    def competences(self):
+        return sorted(self.user.credit_card_expenses.values_list("date", "competence_year", "competence_month"))
+
+    def test_competence_is_stored_on_write_and_follows_owner_rules(self):
+        self.add_expense(self.owner, "2026-02-14", "100.00")
+        # o filho segue o fechamento do titular (14), nao o proprio (28)
+        child_expense = self.add_expense(self.child, "2026-02-15", "40.00")
+        self.assertEqual(
+            self.competences(),
+            [(date(2026, 2, 14), 2026, 2), (date(2026, 2, 15), 2026, 3)],
+        )
+        self.assertEqual(self.summary_total(2, 2026), 100.0)
+        self.assertEqual(self.summary_total(3, 2026), 40.0)
+
+        self.client.put(
+            f"/api/credit-card-expenses/{child_expense}/",
+            {"date": "2026-01-20", "category": "Mercado", "amount": "40.00"},
+            content_type="application/json",
+        )
+        self.assertEqual(self.summary_total(2, 2026), 140.0)
+
+        response = self.client.put(
+            f"/api/credit-cards/{self.owner.id}/",
+            {"last4": "1111", "closing_day": 10, "due_day": 20, "limit_amount": "1000"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.competences(),
+            [(date(2026, 1, 20), 2026, 2), (date(2026, 2, 14), 2026, 3)],
+        )
+        self.assertEqual(self.summary_total(2, 2026), 40.0)
+        self.assertEqual(self.summary_total(3, 2026), 100.0)
+
+    def test_admin_writes_stamp_competence_and_refresh_bills(self):
+        admin_client = self.client_class()
+        admin_client.force_login(User.objects.create_superuser("root", password="x"))
+        expense_form = {"user": self.user.id, "card": self.child.id, "category": "Mercado", "description": "", "amount": "40.00"}
+
+        response = admin_client.post("/admin/accounts/creditcardexpense/add/", dict(expense_form, date="2026-02-15"))
+        self.assertEqual(response.status_code, 302)
+        expense = self.user.credit_card_expenses.get()
+        self.assertEqual(self.competences(), [(date(2026, 2, 15), 2026, 3)])
+        self.assertEqual(self.summary_total(3, 2026), 40.0)
+
+        response = admin_client.post(
+            f"/admin/accounts/creditcardexpense/{expense.id}/change/", dict(expense_form, date="2026-02-10")
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.competences(), [(date(2026, 2, 10), 2026, 2)])
+        self.assertEqual(self.summary_total(2, 2026), 40.0)
+
+        card_form = {
+            "user": self.user.id, "nickname": "", "last4": "1111", "closing_day": 5, "due_day": 20,
+            "best_purchase_day": 1, "limit_amount": "1000", "miles_per_point": "1",
+        }
+        response = admin_client.post(f"/admin/accounts/creditcard/{self.owner.id}/change/", card_form)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.competences(), [(date(2026, 2, 10), 2026, 3)])
+        self.assertEqual(self.summary_total(3, 2026), 40.0)
+        self.assertEqual(
+            list(self.user.planned_expenses.filter(source_key__startswith="CC:").values_list("source_key", "amount")),
+            [(f"CC:{self.owner.id}:2026-03", 40)],
+        )
+
+        response = admin_client.post(f"/admin/accounts/creditcardexpense/{expense.id}/delete/", {"post": "yes"})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(self.user.planned_expenses.filter(source_key__startswith="CC:").exists())
+
+
+class CreditCardBillSyncTests(LoggedUserTestCase):
+    def setUp(self):
+        super().setUp()
+        schedule = mock.patch("accounts.views.schedule_usd_brl_quote_refresh")
+        schedule.start()
+        self.addCleanup(schedule.stop)
+        self.owner = CreditCard.objects.create(user=self.user, last4="1111", closing_day=10, due_day=17, limit_amount=1000)
+        self.child = CreditCard.objects.create(user=self.user, last4="2222", parent_card=self.owner, closing_day=25, due_day=5)
+        self.other = CreditCard.objects.create(user=self.user, last4="3333", closing_day=20, due_day=28, limit_amount=1000)
+
+    def bills(self):
+        return sorted(
+            self.user.planned_expenses.filter(source_key__startswith="CC:").values_list(
+                "source_key", "date", "category", "description", "amount", "is_recurring"
+            )
+        )
+
+    def assert_matches_rebuild(self):
+        # o caminho incremental deve deixar exatamente o que a reconstrucao completa geraria
+        incremental = self.bills()
+        self.assertEqual(rebuild_credit_card_bills(self.user), {"created": 0, "updated": 0, "deleted": 0})
+        self.assertEqual(self.bills(), incremental)
+        return incremental
+
+    def create(self, card, day, amount):
+        response = self.client.post(
+            "/api/credit-card-expenses/create/",
+            {"card_id": card.id, "date": day, "category": "Mercado", "amount": amount},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+    def edit(self, expense_id, card, day, amount):
+        response = self.client.put(
+            f"/api/credit-card-expenses/{expense_id}/",
+            {"card_id": card.id, "date": day, "category": "Mercado", "amount": amount},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_incremental_sync_matches_full_rebuild(self):
+        first = self.create(self.owner, "2026-03-10", "100.00")
+        second = self.create(self.child, "2026-03-11", "40.00")
+        third = self.create(self.other, "2026-03-05", "25.00")
+        bills = self.assert_matches_rebuild()
+        self.assertEqual(
+            [(key, amount) for key, *_rest, amount, _recurring in bills],
+            [(f"CC:{self.owner.id}:2026-03", 100), (f"CC:{self.owner.id}:2026-04", 40), (f"CC:{self.other.id}:2026-03", 25)],
+        )
+
+        # atravessa o fechamento (10): a compra sai da fatura de marco e vai para abril
+        self.edit(first, self.owner, "2026-03-12", "100.00")
+        self.assert_matches_rebuild()
+        self.assertFalse(self.user.planned_expenses.filter(source_key=f"CC:{self.owner.id}:2026-03").exists())
+
+        # volta para antes do fechamento e muda o valor
+        self.edit(second, self.child, "2026-02-28", "55.00")
+        self.assert_matches_rebuild()
+
+        # troca de familia de cartao e de competencia na mesma edicao
+        self.edit(third, self.owner, "2026-04-20", "25.00")
+        self.assert_matches_rebuild()
+        self.assertFalse(self.user.planned_expenses.filter(source_key__startswith=f"CC:{self.other.id}:").exists())
+
+        for expense_id in (first, second, third):
+            response = self.client.delete(f"/api/credit-card-expenses/{expense_id}/")
+            self.assertIn(response.status_code, (200, 204))
+            self.assert_matches_rebuild()
+        self.assertEqual(self.bills(), [])
+
+
+class CreditCardBillingOwnerTests(LoggedUserTestCase):
+    def create_card(self, last4, parent=None):
+        response = self.client.post(
+            "/api/credit-cards/create/",
+            {"last4": last4, "closing_day": 10, "due_day": 17, "limit_amount": "1000", "parent_card_id": parent},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+    def owners(self):
+        return dict(self.user.credit_cards.values_list("id", "billing_owner_id"))
+
+    def test_owner_is_maintained_across_hierarchy_changes(self):
+        root = self.create_card("1111")
+        child = self.create_card("2222", root)
+        grandchild = self.create_card("3333", child)
+        self.assertEqual(self.owners(), {root: root, child: root, grandchild: root})
+
+        response = self.client.put(
+            f"/api/credit-cards/{root}/",
+            {"last4": "1111", "parent_card_id": grandchild},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+        CreditCardExpense.objects.create(user=self.user, card_id=grandchild, date=date(2026, 3, 5), category="Mercado", amount=50)
+        self.client.delete(f"/api/credit-cards/{child}/")
+        self.assertEqual(self.owners(), {root: root, grandchild: grandchild})
+        self.assertEqual(
+            list(self.user.planned_expenses.values_list("source_key", flat=True)),
+            [f"CC:{grandchild}:2026-03"],
+        )
+
+        with mock.patch("accounts.views.schedule_usd_brl_quote_refresh"):
+            summary = self.client.get("/api/credit-cards/summary/", {"month": 3, "year": 2026}).json()
+        self.assertEqual(
+            {row["owner_card_id"]: len(row["member_cards"]) for row in summary["by_billing"]},
+            {root: 1, grandchild: 1},
+        )
+
+
+class RecurrenceRuleTests(TestCase):
+    def test_dates_and_count_agree_with_brute_force(self):
+        anchor = date(2024, 1, 31)
+        for frequency, interval in (("DIARIO", 3), ("SEMANAL", 2), ("MENSAL", 1), ("ANUAL", 1), (None, 1)):
+            full = RecurrenceRule(anchor, frequency, interval, until=date(2030, 12, 31))
+            every = list(full.dates(date(2000, 1, 1), date(2031, 1, 1)))
+            skipped = set(every[1:3])
+            rule = RecurrenceRule(anchor, frequency, interval, until=date(2030, 12, 31), exceptions=skipped)
+            for start, end in ((date(2024, 2, 1), date(2024, 3, 31)), (date(2023, 1, 1), date(2029, 6, 15))):
+                expected = [d for d in every if start <= d <= end and d not in skipped]
+                self.assertEqual(list(rule.dates(start, end)), expected)
+                self.assertEqual(rule.count(start, end), len(expected))
+
+        # dia 31 cai no ultimo dia dos meses curtos
+        monthly = RecurrenceRule(anchor, "MENSAL")
+        self.assertEqual(list(monthly.dates(date(2024, 2, 1), date(2024, 4, 30))), [date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)])
+
+
+class PlannedSeriesViewTests(LoggedUserTestCase):
+    def test_series_are_expanded_on_demand_and_projection_follows_writes(self):
+        response = self.client.post(
+            "/api/planner/create/",
+            {
+                "date": "2026-01-05",
+                "category": "Academia",
+                "amount": "25.00",
+                "is_recurring": True,
+                "recurrence_frequency": "SEMANAL",
+                "recurrence_exceptions": ["2026-01-12"],
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.client.post(
+            "/api/fixed-incomes/create/",
+            {"date": "2025-12-10", "category": "Salario", "amount": "3000", "is_recurring": True, "recurrence_end": "2026-02-28"},
+            content_type="application/json",
+        )
+        self.client.post(
+            "/api/reserves/create/",
+            {"date": "2026-01-20", "category": "Viagem", "amount": "200"},
+            content_type="application/json",
+        )
+        invalid = self.client.post(
+            "/api/planner/create/",
+            {"date": "2026-01-05", "category": "X", "amount": "1", "recurrence_frequency": "HORARIO"},
+            content_type="application/json",
+        )
+        self.assertEqual(invalid.status_code, 400)
+
+        payload = self.client.get("/api/planner/occurrences/", {"start": "2026-01-01", "end": "2026-01-31"}).json()
+        self.assertEqual(
+            [(row["date"], row["kind"]) for row in payload["occurrences"]],
+            [
+                ("2026-01-05", "expense"),
+                ("2026-01-10", "income"),
+                ("2026-01-19", "expense"),
+                ("2026-01-20", "reserve"),
+                ("2026-01-26", "expense"),
+            ],
+        )
+        limited = self.client.get("/api/planner/occurrences/", {"start": "2026-01-01", "end": "2030-12-31", "limit": 3}).json()
+        self.assertTrue(limited["truncated"])
+        self.assertEqual(len(limited["occurrences"]), 3)
+
+        months = self.client.get("/api/planner/projection/", {"month": 1, "year": 2026, "months": 3}).json()["months"]
+        self.assertEqual([float(row["expense"]) for row in months], [75.0, 100.0, 125.0])
+        self.assertEqual([float(row["income"]) for row in months], [3000.0, 3000.0, 0.0])
+        self.assertEqual(float(months[0]["net"]), 3000 - 75 - 200)
+
+        planned = self.user.planned_expenses.get()
+        self.client.put(
+            f"/api/planner/{planned.id}/",
+            {"date": "2026-01-05", "category": "Academia", "amount": "30.00", "is_recurring": True},
+            content_type="application/json",
+        )
+        planned.refresh_from_db()
+        self.assertEqual((planned.recurrence_frequency, planned.recurrence_exceptions), ("SEMANAL", ["2026-01-12"]))
+        months = self.client.get("/api/planner/projection/", {"month": 1, "year": 2026, "months": 3}).json()["months"]
+        self.assertEqual(float(months[1]["expense"]), 120.0)
+
+    def test_zero_or_negative_interval_is_rejected(self):
+        for interval in (0, "0", -2, "abc"):
+            response = self.client.post(
+                "/api/planner/create/",
+                {"date": "2026-01-05", "category": "X", "amount": "1", "is_recurring": True, "recurrence_interval": interval},
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 400, interval)
+        planned = PlannedExpense.objects.create(
+            user=self.user, date=date(2026, 1, 5), category="X", amount=1, is_recurring=True, recurrence_interval=2
+        )
+        response = self.client.put(
+            f"/api/planner/{planned.id}/",
+            {"date": "2026-01-05", "category": "X", "amount": "1", "is_recurring": True, "recurrence_interval": 0},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.put(
+            f"/api/planner/{planned.id}/",
+            {"date": "2026-01-05", "category": "X", "amount": "1", "is_recurring": True, "recurrence_interval": ""},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        planned.refresh_from_db()
+        self.assertEqual(planned.recurrence_interval, 2)
+        self.assertFalse(PlannedExpense.objects.filter(recurrence_interval__lt=1).exists())
+
+    def test_projection_rejects_years_outside_date_range(self):
+        for params in ({"year": 0}, {"year": -3}, {"year": 9999, "month": 12, "months": 120}, {"year": 10000}):
+            response = self.client.get("/api/planner/projection/", params)
+            self.assertEqual(response.status_code, 400, params)
+        response = self.client.get("/api/planner/projection/", {"year": 9989, "month": 12, "months": 120})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["months"]), 120)
+
+
+class CashFlowForecastTests(LoggedUserTestCase):
+    def test_daily_projection_combines_planned_items_bills_and_vehicles(self):
+        today = date(2026, 4, 1)
+        self.user.planned_incomes.create(date=date(2026, 4, 11), category="Freela", amount=500)
+        self.user.planned_expenses.create(date=date(2026, 4, 4), category="Aluguel", amount=800)
+        self.user.planned_expenses.create(
+            date=date(2026, 4, 6), category="Fatura", amount=300, source_key="CC:1:2026-04", is_recurring=True
+        )
+        Vehicle.objects.create(user=self.user, name="Carro", ipva_cost=3600)  # 300/mes = 10/dia em abril
+
+        forecast = build_cash_flow_forecast(self.user, months=1, start_balance=1000, today=today)
+        balances = forecast["balances"]
+        self.assertEqual(len(balances), 30)
+        self.assertEqual(dict(forecast["totals"]), {"income": 500, "expense": 800, "card_bill": 300, "vehicle": 300, "variable": 0})
+        self.assertAlmostEqual(balances[0], 990)
+        self.assertAlmostEqual(balances[3], 1000 - 40 - 800)
+        self.assertAlmostEqual(balances[-1], 1000 + 500 - 800 - 300 - 300)
+        self.assertEqual(forecast_runway_days(balances), 5)
+        self.assertEqual(forecast_runway_days(balances, 200), 3)
+
+    def test_endpoint(self):
+        FinancialEntry.objects.create(user=self.user, entry_type="RECEITA", amount=1000, category="Salario", date=date.today())
+        rebuild_entry_rollups(self.user)
+        payload = self.client.get("/api/forecast/", {"months": 2}).json()
+        self.assertEqual(payload["start_balance"], 1000)
+        self.assertEqual(payload["daily"][0]["date"], date.today().strftime("%Y-%m-%d"))
+        self.assertIsNone(payload["runway_days"])
+
+
+class TripEvaluateBatchTests(LoggedUserTestCase):
+    def test_runway_index_matches_linear_scan(self):
+        balances = [900, 700, 650, 800, 400, 300, 350, 100, -50, 20]
+        index = TripRunwayIndex(balances)
+        for offset in range(12):
+            for cost in (0, 50, 120, 360, 500, 1000):
+                shifted = [value - (cost if day >= offset else 0) for day, value in enumerate(balances)]
+                self.assertEqual(index.runway(cost, offset), forecast_runway_days(shifted), (cost, offset))
+
+    def test_scenarios_share_baseline_and_are_ranked_by_risk(self):
+        FinancialEntry.objects.create(user=self.user, entry_type="RECEITA", amount=5000, category="Salario", date=date.today())
+        rebuild_entry_rollups(self.user)
+        car = Vehicle.objects.create(user=self.user, name="Carro", fuel_km_per_liter=10, fuel_price_per_liter=6)
+        van = Vehicle.objects.create(user=self.user, name="Van", fuel_km_per_liter=5, fuel_price_per_liter=6)
+        scenarios = [
+            {"label": "longa", "vehicle_id": van.id, "distance_km": 2000},
+            {"label": "curta", "vehicle_id": car.id, "distance_km": 100, "tolls": [{"amount": 20}]},
+            {"label": "sem veiculo", "vehicle_id": 999999, "distance_km": 10},
+            {"label": "media", "vehicle_id": car.id, "distance_km": 1200, "date": date.today().strftime("%Y-%m-%d")},
+        ]
+
+        with CaptureQueriesContext(connection) as single:
+            self.client.post("/api/trips/evaluate/", scenarios[1], content_type="application/json")
+        with CaptureQueriesContext(connection) as batch:
+            response = self.client.post("/api/trips/evaluate/batch/", {"scenarios": scenarios}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(batch), len(single) + 1)
+
+        payload = response.json()
+        self.assertEqual(payload["baseline"]["current_balance"], 5000)
+        labels = [item["label"] for item in payload["scenarios"]]
+        self.assertEqual(labels, ["curta", "media", "longa", "sem veiculo"])
+        self.assertEqual([item["rank"] for item in payload["scenarios"]], [1, 2, 3, 4])
+        self.assertEqual(payload["scenarios"][0]["trip_total_cost"], 80)
+        self.assertEqual(payload["scenarios"][0]["risk_level"], "baixo")
+        self.assertEqual(payload["scenarios"][2]["risk_level"], "alto")
+        self.assertEqual(payload["scenarios"][3]["error"], "Veiculo nao encontrado")
+
+        single_payload = self.client.post("/api/trips/evaluate/", scenarios[1], content_type="application/json").json()
+        ranked = {key: value for key, value in payload["scenarios"][0].items() if key not in ("index", "label", "rank")}
+        self.assertEqual(ranked, single_payload)
+
+    def test_result_does_not_depend_on_the_other_scenarios(self):
+        FinancialEntry.objects.create(user=self.user, entry_type="RECEITA", amount=5000, category="Salario", date=date.today())
+        rebuild_entry_rollups(self.user)
+        # compromisso alem dos 6 meses, mas antes da viagem: entra no horizonte dela nas duas rotas
+        PlannedExpense.objects.create(
+            user=self.user, date=date.today() + timedelta(days=300), category="IPVA", amount=9000
+        )
+        car = Vehicle.objects.create(user=self.user, name="Carro", fuel_km_per_liter=10, fuel_price_per_liter=6)
+        nearby = {
+            "label": "perto", "vehicle_id": car.id, "distance_km": 100,
+            "date": (date.today() + timedelta(days=320)).strftime("%Y-%m-%d"),
+        }
+        distant = {
+            "label": "longe", "vehicle_id": car.id, "distance_km": 100,
+            "date": (date.today() + timedelta(days=600)).strftime("%Y-%m-%d"),
+        }
+
+        single = self.client.post("/api/trips/evaluate/", nearby, content_type="application/json").json()
+        self.assertEqual(single["runway_days_before"], 300)
+        for scenarios in ([nearby], [nearby, distant]):
+            response = self.client.post("/api/trips/evaluate/batch/", {"scenarios": scenarios}, content_type="application/json")
+            result = next(item for item in response.json()["scenarios"] if item["label"] == "perto")
+            self.assertEqual({k: v for k, v in result.items() if k not in ("index", "label", "rank")}, single)
+
+    def test_bad_date_only_fails_its_scenario(self):
+        car = Vehicle.objects.create(user=self.user, name="Carro", fuel_km_per_liter=10, fuel_price_per_liter=6)
+        scenarios = [
+            {"label": "numero", "vehicle_id": car.id, "distance_km": 10, "date": 5},
+            {"label": "lista", "vehicle_id": car.id, "distance_km": 10, "date": ["2026-01-01"]},
+            {"label": "texto", "vehicle_id": car.id, "distance_km": 10, "date": "amanha"},
+            {"label": "ok", "vehicle_id": car.id, "distance_km": 10, "date": date.today().strftime("%Y-%m-%d")},
+        ]
+        response = self.client.post("/api/trips/evaluate/batch/", {"scenarios": scenarios}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        by_label = {item["label"]: item for item in response.json()["scenarios"]}
+        self.assertEqual({label: by_label[label].get("error") for label in by_label}, {
+            "numero": "date invalida", "lista": "date invalida", "texto": "date invalida", "ok": None,
+        })
+        self.assertEqual(by_label["ok"]["rank"], 1)
+
+        response = self.client.post("/api/trips/evaluate/", scenarios[0], content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_invalid_body(self):
+        response = self.client.post("/api/trips/evaluate/batch/", {"scenarios": []}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            "/api/trips/evaluate/batch/", {"scenarios": [{}] * 51}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class TripPlanPersistenceTests(LoggedUserTestCase):
+    def setUp(self):
+        super().setUp()
+        self.vehicle = Vehicle.objects.create(user=self.user, name="Carro", fuel_km_per_liter=10, fuel_price_per_liter=6)
+
+    def create_trip(self, **extra):
+        body = {"vehicle_id": self.vehicle.id, "title": "Serra", "distance_km": 100, "lodging_cost": 50}
+        body.update(extra)
+        response = self.client.post("/api/trips/create/", body, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        return TripPlan.objects.get(id=response.json()["id"])
+
+    def test_create_stores_totals_and_bulk_inserts_tolls(self):
+        with CaptureQueriesContext(connection) as ctx:
+            trip = self.create_trip(tolls=[{"name": "A", "amount": 10}, {"name": "B", "amount": 5.5}, {"name": "C", "amount": 1}])
+        inserts = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("INSERT") and "triptoll" in q["sql"].lower()]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(str(trip.toll_total), "16.50")
+        self.assertEqual(str(trip.estimated_cost), "126.50")  # 60 combustivel + 16.50 + 50
+
+        for body in (
+            {"tolls": [{"amount": "abc"}]},
+            {"tolls": [{"amount": "NaN"}]},
+            {"tolls": [{"amount": "Infinity"}]},
+            {"distance_km": "NaN"},
+            {"lodging_cost": "-inf"},
+            {"meal_cost": "1e30"},
+            {"extra_cost": "99999999.999"},
+        ):
+            response = self.client.post(
+                "/api/trips/create/", dict(body, vehicle_id=self.vehicle.id), content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400, body)
+        # cada campo cabe, mas o custo estimado passaria de max_digits
+        thirsty = Vehicle.objects.create(user=self.user, name="Trator", fuel_km_per_liter="0.001", fuel_price_per_liter=9999)
+        response = self.client.post(
+            "/api/trips/create/", {"vehicle_id": thirsty.id, "distance_km": "99999999"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(TripPlan.objects.count(), 1)
+
+        response = self.client.put(
+            f"/api/trips/{trip.id}/", {"vehicle_id": self.vehicle.id, "distance_km": "NaN"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_update_only_writes_changed_tolls(self):
+        trip = self.create_trip(tolls=[{"name": "A", "amount": 10}, {"name": "B", "amount": 5}, {"name": "C", "amount": 1}])
+        a, b, c = trip.tolls.order_by("id")
+        body = {
+            "vehicle_id": self.vehicle.id,
+            "distance_km": 100,
+            "tolls": [{"name": "A", "amount": 10}, {"id": b.id, "name": "B", "amount": 8}],
+        }
+        response = self.client.put(f"/api/trips/{trip.id}/", body, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(trip.tolls.order_by("id").values_list("id", "name", "amount")),
+            [(a.id, "A", 10), (b.id, "B", 8)],
+        )
+        self.assertFalse(TripToll.objects.filter(id=c.id).exists())
+        trip.refresh_from_db()
+        self.assertEqual((trip.toll_total, trip.estimated_cost), (18, 78))
+
+        # sem "tolls" no corpo os pedagios ficam como estao
+        body = {"vehicle_id": self.vehicle.id, "distance_km": 200}
+        self.client.put(f"/api/trips/{trip.id}/", body, content_type="application/json")
+        trip.refresh_from_db()
+        self.assertEqual((trip.toll_total, trip.estimated_cost), (18, 138))
+
+    def test_vehicle_fuel_change_refreshes_estimated_cost(self):
+        trip = self.create_trip()
+        body = {"name": "Carro", "fuel_km_per_liter": 10, "fuel_price_per_liter": 7}
+        self.client.put(f"/api/vehicles/{self.vehicle.id}/", body, content_type="application/json")
+        trip.refresh_from_db()
+        self.assertEqual(trip.estimated_cost, 120)
+
+        # o novo consumo estouraria o custo de uma viagem longa: nada e gravado
+        self.create_trip(distance_km="99999999")
+        body = {"name": "Trator", "fuel_km_per_liter": "0.001", "fuel_price_per_liter": 9999}
+        response = self.client.put(f"/api/vehicles/{self.vehicle.id}/", body, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.vehicle.refresh_from_db()
+        self.assertEqual((self.vehicle.name, self.vehicle.fuel_price_per_liter), ("Carro", 7))
+        trip.refresh_from_db()
+        self.assertEqual(trip.estimated_cost, 120)
+
+    def test_listing_is_prefetched_and_paginated(self):
+        for index in range(5):
+            self.create_trip(title=f"T{index}", tolls=[{"name": "A", "amount": index}, {"name": "B", "amount": 1}])
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/trips/", {"limit": 2})
+        trip_queries = [q for q in ctx.captured_queries if "trip" in q["sql"].lower()]
+        self.assertEqual(len(trip_queries), 2)
+        self.assertEqual([t["title"] for t in response.json()], ["T4", "T3"])
+        self.assertEqual(response.json()[0]["toll_total"], 5)
+
+        titles = []
+        cursor = ""
+        while True:
+            params = {"limit": 2, "cursor": cursor} if cursor else {"limit": 2}
+            response = self.client.get("/api/trips/", params)
+            titles.extend(t["title"] for t in response.json())
+            cursor = response.get("X-Next-Cursor")
+            if not cursor:
+                break
+        self.assertEqual(titles, ["T4", "T3", "T2", "T1", "T0"])
+        self.assertEqual(self.client.get("/api/trips/", {"cursor": "@@"}).status_code, 400)
+
+
+class RollingStatsTests(LoggedUserTestCase):
+    def setUp(self):
+        super().setUp()
+        today = date.today()
+        for days_ago, entry_type, amount in ((0, "RECEITA", 100), (3, "DESPESA", 40), (20, "DESPESA", 60), (200, "RECEITA", 1000)):
+            FinancialEntry.objects.create(
+                user=self.user, entry_type=entry_type, amount=amount, category="X", date=today - timedelta(days=days_ago)
+            )
+
+    def test_all_windows_in_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/stats/", {"windows": "30,1,7,365,7"})
+        entry_queries = [q for q in ctx.captured_queries if "financialentry" in q["sql"].lower()]
+        self.assertEqual(len(entry_queries), 1)
+
+        windows = response.json()["windows"]
+        self.assertEqual(list(windows), ["1", "7", "30", "365"])
+        self.assertEqual((windows["1"]["total_receita"], windows["1"]["total_despesa"], windows["1"]["movimentacoes"]), (100, 0, 1))
+        self.assertEqual((windows["7"]["total_despesa"], windows["7"]["movimentacoes"]), (40, 2))
+        self.assertEqual((windows["30"]["total_despesa"], windows["30"]["movimentacoes"]), (100, 3))
+        self.assertEqual((windows["365"]["total_receita"], windows["365"]["movimentacoes"]), (1100, 4))
+        self.assertEqual(windows["7"]["start_date"], (date.today() - timedelta(days=6)).strftime("%Y-%m-%d"))
+
+        for days, url in ((1, "/api/stats/daily/"), (7, "/api/stats/weekly/"), (30, "/api/stats/monthly/")):
+            expected = {k: v for k, v in windows[str(days)].items() if k != "start_date"}
+            self.assertEqual(self.client.get(url).json(), expected)
+
+    def test_default_and_invalid_windows(self):
+        self.assertEqual(list(self.client.get("/api/stats/").json()["windows"]), ["1", "7", "30"])
+        for raw in ("abc", "0", "5000", ",".join(str(n) for n in range(1, 14))):
+            self.assertEqual(self.client.get("/api/stats/", {"windows": raw}).status_code, 400, raw)
+
+
+class ApiBenchmarkTests(TestCase):
+    def test_every_route_is_benchmarked(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "report.json")
+            call_command(
+                "benchmark_api", size="1k", cards=2, vehicles=1, repeat=1, output=output, database="default",
+                stdout=io.StringIO(), stderr=io.StringIO(),
+            )
+            with open(output, encoding="utf-8") as fh:
+                report = json.load(fh)
+
+            self.assertEqual(report["uncovered"], [])
+            failing = {route: row["status"] for route, row in report["routes"].items() if row["status"] >= 400}
+            self.assertEqual(failing, {})
+            self.assertEqual(
+                set(report["routes"]["GET credit-cards/summary/"]), {"status", "queries", "p50_ms", "p95_ms", "peak_kib"}
+            )
+            self.assertFalse(UserAccount.objects.filter(phone_number__startswith="00bench").exists())
+
+            # o proprio relatorio como baseline nao acusa aumento de consultas
+            call_command(
+                "benchmark_api", route="stats/", repeat=1, baseline=output, tolerance=100, database="default",
+                stdout=io.StringIO(), stderr=io.StringIO(),
+            )
+
+    def test_refuses_remote_or_missing_database(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark_api", database="", stdout=io.StringIO())
+        with mock.patch.dict(connections.settings["default"], {"HOST": "db.example.com"}):
+            with self.assertRaises(CommandError):
+                call_command("benchmark_api", database="default", stdout=io.StringIO())
+
+
+class RequestMetricsMiddlewareTests(LoggedUserTestCase):
+    def setUp(self):
+        super().setUp()
+        route_histograms.snapshot(reset=True)
+        self.addCleanup(route_histograms.snapshot, reset=True)
+
+    def test_disabled_by_default(self):
+        with mock.patch.dict(os.environ, {"GENFIN_REQUEST_METRICS": ""}):
+            response = self.client.get("/api/dashboard/")
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(route_histograms.snapshot(), {})
+
+    def test_timings_histograms_and_admin_dump(self):
+        with mock.patch.dict(os.environ, {"GENFIN_REQUEST_METRICS": "1"}), self.assertLogs("genfin.requests") as logs:
+            response = self.client.get("/api/dashboard/")
+            self.client.get("/api/dashboard/")
+
+            self.assertIn("db;dur=", response["Server-Timing"])
+            self.assertIn("total;dur=", response["Server-Timing"])
+            line = json.loads(logs.records[0].getMessage())
+            self.assertEqual((line["route"], line["status"]), ("GET /api/dashboard/", 200))
+            self.assertGreater(line["queries"], 0)
+
+            self.assertEqual(self.client.get("/api/metrics/requests/").status_code, 403)
+            staff = User.objects.create_user("ops", password="x", is_staff=True)
+            self.client.force_login(staff)
+            dump = self.client.get("/api/metrics/requests/").json()
+
+        self.assertTrue(dump["enabled"])
+        self.assertEqual(dump["routes"]["GET /api/dashboard/"]["count"], 2)
+        self.assertEqual(sum(dump["routes"]["GET /api/dashboard/"]["buckets"].values()), 2)
+
+    def test_external_calls_are_attributed_to_the_request(self):
+        offline = mock.patch("accounts.views.urllib_request.urlopen", side_effect=OSError("offline"))
+        with offline:
+            metrics, token = start_request_metrics()
+            try:
+                fetch_usd_brl_quote()
+            finally:
+                finish_request_metrics(token)
+            fetch_usd_brl_quote()
+        self.assertEqual(list(metrics.external_ms), ["fx"])
 
-# Create your tests here.
@@ -1,6 +1,7 @@
 ﻿from django.urls import path
 
 from .views import (
+    CashFlowForecastView,
     CreditCardCreateView,
     CreditCardDetailView,
     CreditCardExpenseCreateView,
@@ -9,13 +10,19 @@ from .views import (
     CreditCardListView,
     CreditCardSummaryView,
     DailyStatsView,
+    DashboardBootstrapView,
     DashboardCategoryView,
     DashboardView,
+    FinancialEntryBulkCreateView,
     FinancialEntryCreateView,
     FinancialEntryDetailView,
     FinancialEntryListView,
+    FinancialEntryReceiptThumbnailView,
     FinancialEntryReceiptView,
+    FinancialStatementPdfView,
     MonthlyStatsView,
+    PlannedOccurrenceListView,
+    PlannedProjectionView,
     PlannedIncomeCreateView,
     PlannedIncomeDetailView,
     PlannedIncomeListView,
@@ -29,6 +36,9 @@ from .views import (
     PlannerDetailView,
     PlannerListView,
     RegisterView,
+    RequestMetricsView,
+    StatsView,
+    TripEvaluateBatchView,
     TripEvaluateView,
     TripPlanCreateView,
     TripPlanDetailView,
@@ -44,6 +54,7 @@ from .views import (
     VehicleDestinationListView,
     VehicleListView,
     VehicleSummaryView,
+    WhatsAppSummaryStatusView,
     WhatsAppSummaryWebhookView,
     WeeklyStatsView,
     UserManualPdfView,
@@ -54,17 +65,24 @@ urlpatterns = [
     path("validate-phone/", ValidatePhoneView.as_view()),
     path("register/", RegisterView.as_view()),
     path("financial-entry/", FinancialEntryCreateView.as_view()),
+    path("financial-entry/bulk/", FinancialEntryBulkCreateView.as_view()),
     path("login/", PhoneLoginView.as_view()),
     path("profile/", ProfileView.as_view()),
     path("profile/manual-pdf/", UserManualPdfView.as_view()),
+    path("profile/statement-pdf/", FinancialStatementPdfView.as_view()),
     path("dashboard/", DashboardView.as_view()),
+    path("dashboard/bootstrap/", DashboardBootstrapView.as_view()),
     path("entries/", FinancialEntryListView.as_view()),
     path("entries/<int:entry_id>/", FinancialEntryDetailView.as_view()),
     path("entries/<int:entry_id>/receipt/", FinancialEntryReceiptView.as_view()),
+    path("entries/<int:entry_id>/receipt/thumbnail/", FinancialEntryReceiptThumbnailView.as_view()),
     path("dashboard/categories/", DashboardCategoryView.as_view()),
     path("planner/", PlannerListView.as_view()),
     path("planner/create/", PlannerCreateView.as_view()),
     path("planner/<int:expense_id>/", PlannerDetailView.as_view()),
+    path("planner/occurrences/", PlannedOccurrenceListView.as_view()),
+    path("planner/projection/", PlannedProjectionView.as_view()),
+    path("forecast/", CashFlowForecastView.as_view()),
     path("fixed-incomes/", PlannedIncomeListView.as_view()),
     path("fixed-incomes/create/", PlannedIncomeCreateView.as_view()),
     path("fixed-incomes/<int:income_id>/", PlannedIncomeDetailView.as_view()),
@@ -85,6 +103,7 @@ urlpatterns = [
     path("trips/create/", TripPlanCreateView.as_view()),
     path("trips/<int:trip_id>/", TripPlanDetailView.as_view()),
     path("trips/evaluate/", TripEvaluateView.as_view()),
+    path("trips/evaluate/batch/", TripEvaluateBatchView.as_view()),
     path("credit-cards/", CreditCardListView.as_view()),
     path("credit-cards/create/", CreditCardCreateView.as_view()),
     path("credit-cards/<int:card_id>/", CreditCardDetailView.as_view()),
@@ -92,10 +111,13 @@ urlpatterns = [
     path("credit-card-expenses/create/", CreditCardExpenseCreateView.as_view()),
     path("credit-card-expenses/<int:expense_id>/", CreditCardExpenseDetailView.as_view()),
     path("credit-cards/summary/", CreditCardSummaryView.as_view()),
+    path("stats/", StatsView.as_view()),
     path("stats/daily/", DailyStatsView.as_view()),
     path("stats/weekly/", WeeklyStatsView.as_view()),
     path("stats/monthly/", MonthlyStatsView.as_view()),
     path("whatsapp-summary/", WhatsAppSummaryWebhookView.as_view()),
+    path("whatsapp-summary/<int:message_id>/", WhatsAppSummaryStatusView.as_view()),
+    path("metrics/requests/", RequestMetricsView.as_view()),
 path("profile/", ProfileView.as_view()),
 path("profile/reset-data/", ProfileResetDataView.as_view()),
 path("profile/manual-pdf/", UserManualPdfView.as_view()),
@@ -1,19 +1,38 @@
-﻿import calendar
+﻿import base64
+import bisect
+import calendar
+import functools
+import hashlib
+import itertools
+import operator
+from array import array
 from collections import defaultdict
 from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
 
 import json
+import mimetypes
 import os
-import textwrap
+import tempfile
+import threading
+import time
+from http.client import HTTPConnection, HTTPSConnection
 from urllib import request as urllib_request
+from urllib.parse import urlsplit
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
-from django.db.models import Sum
-from django.db import transaction
-from django.http import FileResponse, HttpResponse
+from django.db.models import Count, F, Prefetch, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.db import IntegrityError, connection as db_connection, transaction
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from rest_framework import status
@@ -25,10 +44,14 @@ from rest_framework.views import APIView
 from .models import (
     CreditCard,
     CreditCardExpense,
+    ExchangeRateQuote,
     FinancialEntry,
+    FinancialEntryMonthlyRollup,
+    OutboundMessage,
     PlannedExpense,
     PlannedIncome,
     PlannedReserve,
+    ReceiptBlob,
     TripPlan,
     TripToll,
     UserAccount,
@@ -36,21 +59,77 @@ from .models import (
     VehicleFrequentDestination,
     VehicleExpense,
 )
+from .metrics import external_call, request_metrics_enabled, route_histograms
+from .pdf import PdfStreamWriter, paginate_items, render_page_commands
+from .recurrence import FREQUENCY_CHOICES, RecurrenceRule, add_months, merge_occurrences, parse_exception_dates
 
 
-def get_logged_user(request):
-    phone = request.session.get("user_phone")
-    if not phone:
+# campos do usuario guardados no cache compartilhado; o hash da senha fica de fora
+# (e carregado sob demanda do banco se alguma view precisar dele)
+SESSION_USER_FIELDS = tuple(f.attname for f in UserAccount._meta.concrete_fields if f.attname != "password")
+
+
+def session_user_cache_key(user_id):
+    return f"session-user:{user_id}"
+
+
+def forget_session_user(user_id):
+    cache.delete(session_user_cache_key(user_id))
+
+
+def cache_session_user(user):
+    values = {name: getattr(user, name) for name in SESSION_USER_FIELDS}
+    cache.set(session_user_cache_key(user.id), values, int(os.getenv("GENFIN_SESSION_USER_TTL", "60")))
+
+
+def cached_session_user(user_id):
+    values = cache.get(session_user_cache_key(user_id))
+    if not isinstance(values, dict) or any(name not in values for name in SESSION_USER_FIELDS):
         return None
-    return UserAccount.objects.filter(phone_number=phone).first()
+    return UserAccount.from_db("default", SESSION_USER_FIELDS, [values[name] for name in SESSION_USER_FIELDS])
+
+
+def login_session_user(request, user):
+    request.session["user_id"] = user.id
+    request.session["user_phone"] = user.phone_number
+    request.logged_user = user
+
+
+def resolve_session_user(request):
+    user_id = request.session.get("user_id")
+    users = UserAccount.objects.defer("password")
+    if user_id:
+        user = cached_session_user(user_id)
+        if user is not None:
+            return user
+        user = users.filter(id=user_id).first()
+    else:
+        # sessoes antigas guardam so o telefone; migra para o id no primeiro acesso
+        phone = request.session.get("user_phone")
+        if not phone:
+            return None
+        user = users.filter(phone_number=phone).first()
+        if user:
+            request.session["user_id"] = user.id
+
+    if user:
+        cache_session_user(user)
+    return user
+
+
+def get_logged_user(request):
+    # LoggedUserMiddleware resolve o usuario uma vez por request
+    if hasattr(request, "logged_user"):
+        return request.logged_user or None
+    return resolve_session_user(request)
 
 
-def _pdf_escape(text):
-    return str(text).replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+def manual_pdf_version():
+    return os.getenv("GENFIN_MANUAL_VERSION", "v1.0")
 
 
-def build_manual_pdf_bytes():
-    version = os.getenv("GENFIN_MANUAL_VERSION", "v1.0")
+def build_manual_pdf_bytes(version=None):
+    version = version or manual_pdf_version()
     updated_at = timezone.now().strftime("%d/%m/%Y")
     generated_at = timezone.now().strftime("%d/%m/%Y %H:%M")
 
@@ -405,111 +484,42 @@ def build_manual_pdf_bytes():
         },
     ]
 
-    objects = []
+    writer = PdfStreamWriter()
+    chunks = [writer.begin()]
+    header = ("GenFin - Manual Oficial", f"Versao {version}")
+    total_pages = len(pages)
+    for idx, page in enumerate(pages, start=1):
+        footer = f"Pagina {idx}/{total_pages} | Gerado em {generated_at}"
+        chunks.append(writer.add_page(render_page_commands(page, footer, header=header)))
+    chunks.append(writer.finish())
+    return b"".join(chunks)
 
-    def add_obj(content):
-        objects.append(content)
-        return len(objects)
 
-    font_obj = add_obj("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
-    page_obj_ids = []
-    content_obj_ids = []
-    total_pages = len(pages)
+def manual_pdf_path(version):
+    safe_version = "".join(ch if ch.isalnum() or ch in "._-" else "_" for ch in version)
+    return os.path.join(settings.MEDIA_ROOT, "manual", f"Manual-GenFin-{safe_version}.pdf")
 
-    for idx, page in enumerate(pages, start=1):
-        title = page.get("title", "")
-        subtitle = page.get("subtitle", "")
-        items = page.get("items", [])
-        is_cover = bool(page.get("cover"))
-
-        cmds = []
-        cmds.append("0.04 0.07 0.12 rg 0 0 595 842 re f")
-        if not is_cover:
-            cmds.append("0.58 0.76 1 rg 40 816 515 1 re f")
-            cmds.append("BT /F1 9 Tf 0.75 0.82 0.95 rg 42 824 Td (GenFin - Manual Oficial) Tj ET")
-            cmds.append(f"BT /F1 9 Tf 0.75 0.82 0.95 rg 425 824 Td (Versao {_pdf_escape(version)}) Tj ET")
-
-        cmds.append("BT")
-        cmds.append("/F1 22 Tf")
-        cmds.append("0.91 0.94 0.98 rg")
-        cmds.append(f"1 0 0 1 50 782 Tm ({_pdf_escape(title)}) Tj")
-        if subtitle:
-            cmds.append("/F1 12 Tf")
-            cmds.append("0.58 0.73 0.94 rg")
-            cmds.append(f"1 0 0 1 50 758 Tm ({_pdf_escape(subtitle)}) Tj")
-        cmds.append("ET")
-
-        y = 728 if subtitle else 744
-        for item in items:
-            kind = item[0]
-            if kind == "sp":
-                y -= 8
-                continue
-            if kind == "h2":
-                cmds.append("BT /F1 13 Tf 0.72 0.86 1 rg")
-                cmds.append(f"1 0 0 1 50 {y} Tm ({_pdf_escape(item[1])}) Tj ET")
-                y -= 18
-                continue
-            if kind in {"concept", "alert", "tip"}:
-                stroke = {"concept": "0.25 0.68 1", "alert": "0.95 0.35 0.35", "tip": "0.30 0.82 0.52"}[kind]
-                title_box = item[1]
-                body_box = item[2]
-                cmds.append(f"{stroke} RG 50 {y-40} 495 46 re S")
-                cmds.append("BT /F1 10 Tf 0.90 0.93 0.98 rg")
-                cmds.append(f"1 0 0 1 58 {y-16} Tm ({_pdf_escape(title_box)}) Tj")
-                yy = y - 30
-                for part in textwrap.wrap(body_box, width=90)[:2]:
-                    cmds.append(f"1 0 0 1 58 {yy} Tm ({_pdf_escape(part)}) Tj")
-                    yy -= 12
-                cmds.append("ET")
-                y -= 54
-                continue
 
-            text = item[1]
-            if kind == "li":
-                text = f"- {text}"
-            if kind == "q":
-                text = f'"{text}"'
-            wrap_width = 92 if kind == "mono" else 96
-            color = "0.82 0.88 0.95" if kind == "mono" else "0.90 0.93 0.98"
-            size = 10 if kind == "mono" else 11
-            for part in textwrap.wrap(text, width=wrap_width):
-                cmds.append(f"BT /F1 {size} Tf {color} rg 1 0 0 1 50 {y} Tm ({_pdf_escape(part)}) Tj ET")
-                y -= 14
-
-        cmds.append("0.58 0.76 1 rg 40 28 515 1 re f")
-        footer = f"Pagina {idx}/{total_pages} | Gerado em {generated_at}"
-        cmds.append(f"BT /F1 9 Tf 0.75 0.82 0.95 rg 50 14 Td ({_pdf_escape(footer)}) Tj ET")
-
-        stream = "\n".join(cmds)
-        stream_len = len(stream.encode("latin-1", errors="ignore"))
-        content_obj_id = add_obj(f"<< /Length {stream_len} >>\nstream\n{stream}\nendstream")
-        content_obj_ids.append(content_obj_id)
-        page_obj_ids.append(add_obj("__PAGE__"))
-
-    kids = " ".join(f"{pid} 0 R" for pid in page_obj_ids)
-    pages_obj = add_obj(f"<< /Type /Pages /Kids [{kids}] /Count {len(page_obj_ids)} >>")
-    for i, page_obj_id in enumerate(page_obj_ids):
-        content_id = content_obj_ids[i]
-        objects[page_obj_id - 1] = (
-            f"<< /Type /Page /Parent {pages_obj} 0 R /MediaBox [0 0 595 842] "
-            f"/Resources << /Font << /F1 {font_obj} 0 R >> >> /Contents {content_id} 0 R >>"
-        )
+def write_manual_pdf(version):
+    path = manual_pdf_path(version)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(build_manual_pdf_bytes(version))
+    os.replace(tmp_path, path)
+    return path
 
-    catalog_obj = add_obj(f"<< /Type /Catalog /Pages {pages_obj} 0 R >>")
-    result = bytearray(b"%PDF-1.4\n")
-    offsets = [0]
-    for i, obj in enumerate(objects, start=1):
-        offsets.append(len(result))
-        result.extend(f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1", errors="ignore"))
-    xref_pos = len(result)
-    result.extend(f"xref\n0 {len(objects)+1}\n".encode("latin-1"))
-    result.extend(b"0000000000 65535 f \n")
-    for off in offsets[1:]:
-        result.extend(f"{off:010d} 00000 n \n".encode("latin-1"))
-    trailer = f"trailer\n<< /Size {len(objects)+1} /Root {catalog_obj} 0 R >>\nstartxref\n{xref_pos}\n%%EOF"
-    result.extend(trailer.encode("latin-1"))
-    return bytes(result)
+
+@functools.lru_cache(maxsize=4)
+def load_manual_pdf(version):
+    # o manual so muda com GENFIN_MANUAL_VERSION; o arquivo em MEDIA_ROOT sobrevive a reinicios
+    path = manual_pdf_path(version)
+    if not os.path.exists(path):
+        write_manual_pdf(version)
+    with open(path, "rb") as fh:
+        pdf_bytes = fh.read()
+    etag = f'"{hashlib.sha256(pdf_bytes).hexdigest()[:32]}"'
+    return pdf_bytes, etag, int(os.path.getmtime(path))
 
 
 def parse_bool(value):
@@ -533,10 +543,57 @@ def resolve_billing_owner(card, cards_by_id=None):
 
 
 def get_owner_id_for_card(card, cards_by_id):
+    if card.billing_owner_id:
+        return card.billing_owner_id
     owner = resolve_billing_owner(card, cards_by_id)
     return owner.id if owner else card.id
 
 
+def compute_billing_owners(parent_by_id):
+    # {card_id: parent_card_id} -> {card_id: raiz da cadeia}; cada cadeia e percorrida
+    # uma vez (as raizes ja resolvidas sao reaproveitadas) e um ciclo para no cartao repetido.
+    owners = {}
+    for card_id in parent_by_id:
+        path = []
+        current = card_id
+        while current not in owners:
+            parent_id = parent_by_id.get(current)
+            if not parent_id or parent_id not in parent_by_id or current in path:
+                break
+            path.append(current)
+            current = parent_id
+        owner_id = owners.get(current, current)
+        for visited_id in path:
+            owners[visited_id] = owner_id
+        owners.setdefault(current, owner_id)
+    return owners
+
+
+def is_card_ancestor(parent_by_id, ancestor_id, card_id):
+    seen = set()
+    current = card_id
+    while current and current not in seen:
+        if current == ancestor_id:
+            return True
+        seen.add(current)
+        current = parent_by_id.get(current)
+    return False
+
+
+def refresh_billing_owners(user):
+    # Recalcula o billing_owner desnormalizado de todos os cartoes do usuario;
+    # grava so o que mudou, um UPDATE por titular.
+    rows = list(user.credit_cards.values_list("id", "parent_card_id", "billing_owner_id"))
+    owners = compute_billing_owners({card_id: parent_id for card_id, parent_id, _ in rows})
+    stale = defaultdict(list)
+    for card_id, _, billing_owner_id in rows:
+        if owners[card_id] != billing_owner_id:
+            stale[owners[card_id]].append(card_id)
+    for owner_id, card_ids in stale.items():
+        CreditCard.objects.filter(id__in=card_ids).update(billing_owner_id=owner_id)
+    return owners
+
+
 def clamp_day(year, month, day):
     max_day = calendar.monthrange(year, month)[1]
     return max(1, min(int(day), max_day))
@@ -549,9 +606,34 @@ def shift_month(year, month, delta):
     return new_year, new_month
 
 
-def fetch_usd_brl_quote():
-    url = "https://economia.awesomeapi.com.br/json/last/USD-BRL"
+def month_range_q(year, month, field="date"):
+    # intervalo de datas no lugar de __year/__month para aproveitar os indices
+    try:
+        last_day = calendar.monthrange(year, month)[1]
+        start = datetime(year, month, 1).date()
+    except (ValueError, OverflowError):
+        return Q(pk__in=[])
+    return Q(**{f"{field}__gte": start, f"{field}__lte": start.replace(day=last_day)})
+
+
+USD_BRL_QUOTE_CACHE_KEY = "genfin:fx:USD-BRL"
+USD_BRL_QUOTE_LOCK_KEY = "genfin:fx:USD-BRL:refreshing"
+USD_BRL_QUOTE_FAILURES_KEY = "genfin:fx:USD-BRL:failures"
+
+
+def fallback_usd_brl_quote():
     fallback_rate = float(os.getenv("GENFIN_USD_BRL_FALLBACK", "5.2"))
+    return {
+        "rate": fallback_rate if fallback_rate > 0 else 5.2,
+        "timestamp": None,
+        "create_date": None,
+        "name": "Cotacao fallback",
+        "source": "fallback",
+    }
+
+
+def fetch_usd_brl_quote():
+    url = os.getenv("GENFIN_USD_BRL_QUOTE_URL", "https://economia.awesomeapi.com.br/json/last/USD-BRL")
     try:
         req = urllib_request.Request(
             url,
@@ -560,7 +642,7 @@ def fetch_usd_brl_quote():
                 "Accept": "application/json",
             },
         )
-        with urllib_request.urlopen(req, timeout=5) as response:
+        with external_call("fx"), urllib_request.urlopen(req, timeout=5) as response:
             payload = json.loads(response.read().decode("utf-8"))
         quote = payload.get("USDBRL", {}) if isinstance(payload, dict) else {}
         bid = quote.get("bid")
@@ -577,13 +659,106 @@ def fetch_usd_brl_quote():
             "source": "awesomeapi",
         }
     except Exception:
-        return {
-            "rate": fallback_rate if fallback_rate > 0 else 5.2,
-            "timestamp": None,
-            "create_date": None,
-            "name": "Cotacao fallback",
-            "source": "fallback",
-        }
+        return fallback_usd_brl_quote()
+
+
+def cache_usd_brl_quote(quote, fetched_at):
+    entry = {"quote": quote, "fetched_at": fetched_at.timestamp()}
+    cache.set(USD_BRL_QUOTE_CACHE_KEY, entry, timeout=int(os.getenv("GENFIN_FX_QUOTE_STALE_TTL", "604800")))
+    return entry
+
+
+def refresh_usd_brl_quote():
+    quote = fetch_usd_brl_quote()
+    if quote.get("source") == "fallback":
+        return None
+    fetched_at = timezone.now()
+    ExchangeRateQuote.objects.update_or_create(
+        pair="USD-BRL",
+        defaults={
+            "rate": Decimal(str(quote["rate"])),
+            "name": quote.get("name") or "",
+            "source": quote.get("source") or "",
+            "quote_timestamp": quote.get("timestamp") or "",
+            "quote_create_date": quote.get("create_date") or "",
+            "fetched_at": fetched_at,
+        },
+    )
+    cache_usd_brl_quote(quote, fetched_at)
+    return quote
+
+
+def usd_brl_refresh_backoff(failures):
+    # 60s, 120s, 240s... ate o teto; com a API fora o lock segura as proximas tentativas
+    base = int(os.getenv("GENFIN_FX_RETRY_BACKOFF", "60"))
+    ceiling = int(os.getenv("GENFIN_FX_RETRY_MAX_BACKOFF", "3600"))
+    return min(base * 2 ** min(failures - 1, 16), ceiling)
+
+
+def _refresh_usd_brl_quote_worker():
+    quote = None
+    try:
+        quote = refresh_usd_brl_quote()
+    finally:
+        if quote is None:
+            failures = (cache.get(USD_BRL_QUOTE_FAILURES_KEY) or 0) + 1
+            cache.set(USD_BRL_QUOTE_FAILURES_KEY, failures, timeout=86400)
+            cache.set(USD_BRL_QUOTE_LOCK_KEY, True, timeout=usd_brl_refresh_backoff(failures))
+        else:
+            cache.delete(USD_BRL_QUOTE_FAILURES_KEY)
+            cache.delete(USD_BRL_QUOTE_LOCK_KEY)
+        db_connection.close()
+
+
+def schedule_usd_brl_quote_refresh():
+    # Apenas um refresh por vez; quem nao pega o lock segue com o valor atual.
+    # Depois de uma falha o worker mantem o lock pelo backoff (ver usd_brl_refresh_backoff).
+    if not cache.add(USD_BRL_QUOTE_LOCK_KEY, True, timeout=30):
+        return False
+    threading.Thread(target=_refresh_usd_brl_quote_worker, daemon=True).start()
+    return True
+
+
+def get_usd_brl_quote():
+    # Nunca espera a rede: devolve o valor em cache (mesmo vencido) ou o ultimo
+    # salvo no banco e agenda a atualizacao em segundo plano quando passar do TTL.
+    entry = cache.get(USD_BRL_QUOTE_CACHE_KEY)
+    if entry is None:
+        saved = ExchangeRateQuote.objects.filter(pair="USD-BRL").first()
+        if saved is None:
+            schedule_usd_brl_quote_refresh()
+            return fallback_usd_brl_quote()
+        entry = cache_usd_brl_quote(
+            {
+                "rate": float(saved.rate),
+                "timestamp": saved.quote_timestamp or None,
+                "create_date": saved.quote_create_date or None,
+                "name": saved.name or None,
+                "source": saved.source,
+            },
+            saved.fetched_at,
+        )
+
+    if time.time() - entry["fetched_at"] >= int(os.getenv("GENFIN_FX_QUOTE_TTL", "300")):
+        schedule_usd_brl_quote_refresh()
+    return entry["quote"]
+
+
+@functools.lru_cache(maxsize=8192)
+def invoice_calendar_period(closing_day, due_day, year, month, after_close):
+    # Calendario de faturas memoizado pela regra do cartao (fechamento/vencimento):
+    # dentro de um mes so ha dois resultados possiveis (antes/depois do fechamento),
+    # entao a chave nao depende do dia da compra.
+    close_year, close_month = year, month
+    if after_close:
+        close_year, close_month = shift_month(close_year, close_month, 1)
+
+    due_year, due_month = close_year, close_month
+    # Se o dia de vencimento vier antes/igual ao fechamento, desloca para o mês seguinte.
+    if due_day <= closing_day:
+        due_year, due_month = shift_month(close_year, close_month, 1)
+    due_date = datetime(due_year, due_month, clamp_day(due_year, due_month, due_day)).date()
+    return close_year, close_month, due_date, close_year, close_month
 
 
 def card_invoice_period_and_due(card, purchase_date):
@@ -593,75 +768,164 @@ def card_invoice_period_and_due(card, purchase_date):
     # 3) competência financeira = mês da fatura que FECHA (não mês seguinte)
     # Ex.: fechamento 14 / vencimento 20
     # compras de 15/01 até 14/02 => fatura de fevereiro (competência fevereiro)
-    close_year = purchase_date.year
-    close_month = purchase_date.month
     closing_day = int(getattr(card, "closing_day", 20) or 20)
-    if purchase_date.day > closing_day:
-        close_year, close_month = shift_month(close_year, close_month, 1)
+    return invoice_calendar_period(
+        closing_day,
+        int(card.due_day),
+        purchase_date.year,
+        purchase_date.month,
+        purchase_date.day > closing_day,
+    )
 
-    due_year, due_month = close_year, close_month
-    # Se o dia de vencimento vier antes/igual ao fechamento, desloca para o mês seguinte.
-    if int(card.due_day) <= closing_day:
-        due_year, due_month = shift_month(close_year, close_month, 1)
-    due_day = clamp_day(due_year, due_month, int(card.due_day))
-    due_date = datetime(due_year, due_month, due_day).date()
-    return close_year, close_month, due_date, close_year, close_month
 
+def card_invoice_purchase_range(card, comp_year, comp_month):
+    # Intervalo de compras [inicio, fim] que cai na fatura de competência comp_month/comp_year.
+    closing_day = int(getattr(card, "closing_day", 20) or 20)
+    end_day = min(closing_day, calendar.monthrange(comp_year, comp_month)[1])
+    end_date = datetime(comp_year, comp_month, end_day).date()
+    prev_year, prev_month = shift_month(comp_year, comp_month, -1)
+    if closing_day < calendar.monthrange(prev_year, prev_month)[1]:
+        start_date = datetime(prev_year, prev_month, closing_day + 1).date()
+    else:
+        start_date = datetime(comp_year, comp_month, 1).date()
+    return start_date, end_date
 
-def sync_credit_card_bills(user, card):
-    cards = list(user.credit_cards.select_related("parent_card").all())
-    cards_by_id = {c.id: c for c in cards}
-    owner = resolve_billing_owner(cards_by_id.get(card.id, card), cards_by_id) or card
-    owner_id = owner.id
-    owner_card = cards_by_id.get(owner_id, owner)
 
-    family_card_ids = [
-        c.id
-        for c in cards
-        if get_owner_id_for_card(c, cards_by_id) == owner_id
-    ]
+def credit_card_bill_key(owner_id, comp_year, comp_month):
+    return f"CC:{owner_id}:{comp_year:04d}-{comp_month:02d}"
+
+
+def parse_date_value(value):
+    return CreditCardExpense._meta.get_field("date").to_python(value)
+
 
-    grouped = defaultdict(lambda: {"amount": 0.0, "due_date": None, "close_year": None, "close_month": None})
-    expenses = user.credit_card_expenses.filter(card_id__in=family_card_ids).order_by("date", "id")
-    for expense in expenses:
-        close_year, close_month, due_date, comp_year, comp_month = card_invoice_period_and_due(owner_card, expense.date)
-        key = f"CC:{owner_id}:{comp_year:04d}-{comp_month:02d}"
-        grouped[key]["amount"] += float(expense.amount or 0)
+def resolve_card_family(user, card):
+    owner_id = card.billing_owner_id or refresh_billing_owners(user)[card.id]
+    family = list(user.credit_cards.filter(billing_owner_id=owner_id))
+    owner_card = next((c for c in family if c.id == owner_id), card)
+    return owner_card, [c.id for c in family] or [card.id]
+
+
+def write_credit_card_bills(user, owner_card, expense_rows, existing_qs):
+    grouped = defaultdict(lambda: {"amount": Decimal("0"), "due_date": None, "close_year": None, "close_month": None})
+    for purchase_date, amount in expense_rows:
+        close_year, close_month, due_date, comp_year, comp_month = card_invoice_period_and_due(owner_card, purchase_date)
+        key = credit_card_bill_key(owner_card.id, comp_year, comp_month)
+        grouped[key]["amount"] += amount or 0
         grouped[key]["due_date"] = due_date
         grouped[key]["close_year"] = close_year
         grouped[key]["close_month"] = close_month
 
-    active_keys = set(grouped.keys())
-    existing_qs = user.planned_expenses.filter(source_key__startswith=f"CC:{owner_id}:")
+    existing_by_key = {}
+    stale_ids = []
     for planned in existing_qs:
-        if planned.source_key not in active_keys:
-            planned.delete()
+        if planned.source_key in grouped and planned.source_key not in existing_by_key:
+            existing_by_key[planned.source_key] = planned
+        else:
+            stale_ids.append(planned.id)
 
+    fields = ["date", "category", "description", "amount", "is_recurring"]
+    to_create = []
+    to_update = []
     for source_key, data in grouped.items():
-        due_date = data["due_date"]
-        total = round(data["amount"], 2)
         period = source_key.split(":")[-1]
-        close_year = data["close_year"]
-        close_month = data["close_month"]
-        defaults = {
-            "date": due_date,
+        values = {
+            "date": data["due_date"],
             "category": f"Fatura Cartão {owner_card.last4}",
-            "description": f"Fatura cartão final {owner_card.last4} (fechamento {close_month:02d}/{close_year}, competência {period})",
-            "amount": total,
+            "description": f"Fatura cartão final {owner_card.last4} (fechamento {data['close_month']:02d}/{data['close_year']}, competência {period})",
+            "amount": data["amount"],
             "is_recurring": True,
         }
-        planned, created = PlannedExpense.objects.get_or_create(
-            user=user,
-            source_key=source_key,
-            defaults=defaults,
+        planned = existing_by_key.get(source_key)
+        if planned is None:
+            to_create.append(PlannedExpense(user=user, source_key=source_key, **values))
+            continue
+        if any(getattr(planned, field) != values[field] for field in fields):
+            for field in fields:
+                setattr(planned, field, values[field])
+            to_update.append(planned)
+
+    if stale_ids:
+        PlannedExpense.objects.filter(id__in=stale_ids).delete()
+    if to_update:
+        PlannedExpense.objects.bulk_update(to_update, fields)
+    if to_create:
+        PlannedExpense.objects.bulk_create(to_create)
+    if stale_ids or to_update or to_create:
+        invalidate_planned_projection(user.id)
+    return {"created": len(to_create), "updated": len(to_update), "deleted": len(stale_ids)}
+
+
+def stamp_expense_competence(owner_card, expenses):
+    # Grava competence_year/competence_month das compras pela regra do titular;
+    # um UPDATE por competência e so nas linhas que mudaram.
+    periods = {
+        card_invoice_period_and_due(owner_card, purchase_date)[3:]
+        for purchase_date in expenses.order_by().values_list("date", flat=True).distinct()
+    }
+    updated = 0
+    for comp_year, comp_month in periods:
+        updated += (
+            expenses.filter(date__range=card_invoice_purchase_range(owner_card, comp_year, comp_month))
+            .exclude(competence_year=comp_year, competence_month=comp_month)
+            .update(competence_year=comp_year, competence_month=comp_month)
+        )
+    return updated
+
+
+def sync_credit_card_bills(user, card, purchase_dates=None):
+    # Sem purchase_dates recalcula todas as faturas da família do cartão (reparo);
+    # com purchase_dates recalcula apenas as competências tocadas por essas compras.
+    owner_card, family_card_ids = resolve_card_family(user, card)
+    expenses = user.credit_card_expenses.filter(card_id__in=family_card_ids)
+    existing_qs = user.planned_expenses.filter(source_key__startswith=f"CC:{owner_card.id}:")
+
+    if purchase_dates is not None:
+        periods = set()
+        for purchase_date in purchase_dates:
+            purchase_date = parse_date_value(purchase_date)
+            if purchase_date:
+                periods.add(card_invoice_period_and_due(owner_card, purchase_date)[3:])
+        if not periods:
+            return {"created": 0, "updated": 0, "deleted": 0}
+        date_filter = Q()
+        for comp_year, comp_month in periods:
+            date_filter |= Q(date__range=card_invoice_purchase_range(owner_card, comp_year, comp_month))
+        expenses = expenses.filter(date_filter)
+        existing_qs = existing_qs.filter(
+            source_key__in=[credit_card_bill_key(owner_card.id, y, m) for y, m in periods]
+        )
+
+    with transaction.atomic():
+        stamp_expense_competence(owner_card, expenses)
+        return write_credit_card_bills(
+            user,
+            owner_card,
+            expenses.values_list("date", "amount"),
+            existing_qs,
         )
-        if not created:
-            planned.date = defaults["date"]
-            planned.category = defaults["category"]
-            planned.description = defaults["description"]
-            planned.amount = defaults["amount"]
-            planned.is_recurring = True
-            planned.save()
+
+
+def rebuild_credit_card_bills(user):
+    owner_ids = set(refresh_billing_owners(user).values())
+    cards_by_id = user.credit_cards.in_bulk(owner_ids)
+    totals = {"created": 0, "updated": 0, "deleted": 0}
+    owner_keys = {str(owner_id) for owner_id in owner_ids}
+    with transaction.atomic():
+        orphan_ids = [
+            p.id
+            for p in user.planned_expenses.filter(source_key__startswith="CC:").only("id", "source_key")
+            if p.source_key.split(":")[1] not in owner_keys
+        ]
+        if orphan_ids:
+            PlannedExpense.objects.filter(id__in=orphan_ids).delete()
+            invalidate_planned_projection(user.id)
+            totals["deleted"] += len(orphan_ids)
+        for owner_id in owner_ids:
+            result = sync_credit_card_bills(user, cards_by_id[owner_id])
+            for key, value in result.items():
+                totals[key] += value
+    return totals
 
 
 class ValidatePhoneView(APIView):
@@ -745,7 +1009,7 @@ class RegisterView(APIView):
         user.set_password(password)
         user.save()
 
-        request.session["user_phone"] = user.phone_number
+        login_session_user(request, user)
 
         return Response(
             {"message": "Cadastro realizado com sucesso"},
@@ -797,13 +1061,15 @@ class FinancialEntryCreateView(APIView):
             entry_type = "DESPESA"
             amount = despesa
 
-        entry = FinancialEntry.objects.create(
-            user=user,
-            entry_type=entry_type,
-            amount=amount,
-            category=categoria,
-            date=entry_date,
-        )
+        with transaction.atomic():
+            entry = FinancialEntry.objects.create(
+                user=user,
+                entry_type=entry_type,
+                amount=amount,
+                category=categoria,
+                date=entry_date,
+            )
+            apply_entry_rollups(user, added=[entry])
 
         return Response(
             {
@@ -818,6 +1084,114 @@ class FinancialEntryCreateView(APIView):
         )
 
 
+def parse_financial_entry_row(row):
+    if not isinstance(row, dict):
+        return None, "Linha invalida"
+    phone_number = str(row.get("phone_number") or "").strip()
+    categoria = row.get("categoria")
+    data_str = row.get("data")
+    receita = row.get("receita")
+    despesa = row.get("despesa")
+
+    if not phone_number or not categoria or not data_str:
+        return None, "phone_number, categoria e data sao obrigatorios"
+    if receita is None and despesa is None:
+        return None, "Informe receita ou despesa"
+    try:
+        entry_date = datetime.strptime(str(data_str), "%d/%m/%Y").date()
+    except ValueError:
+        return None, "Formato de data invalido. Use DD/MM/YYYY"
+
+    entry_type = "RECEITA" if receita is not None else "DESPESA"
+    try:
+        amount = Decimal(str(receita if receita is not None else despesa)).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        return None, "Valor invalido"
+    if not amount.is_finite() or abs(amount) >= Decimal("1e10"):
+        return None, "Valor invalido"
+
+    return {
+        "phone_number": phone_number,
+        "entry_type": entry_type,
+        "amount": amount,
+        "category": str(categoria)[:100],
+        "date": entry_date,
+    }, None
+
+
+def iter_ndjson_rows(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+class FinancialEntryBulkCreateView(APIView):
+    max_rows = 20000
+
+    def post(self, request):
+        if (request.content_type or "").startswith("application/x-ndjson"):
+            rows = iter_ndjson_rows(request._request)
+        else:
+            rows = request.data.get("entries") if isinstance(request.data, dict) else request.data
+            if not isinstance(rows, list):
+                return Response(
+                    {"error": "Envie uma lista de lancamentos (ou NDJSON)"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        results = []
+        parsed = []
+        for index, row in enumerate(rows):
+            if index >= self.max_rows:
+                return Response(
+                    {"error": f"Maximo de {self.max_rows} lancamentos por envio"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            values, error = parse_financial_entry_row(row)
+            results.append({"index": index, "error": error} if error else {"index": index})
+            if values:
+                parsed.append((index, values))
+
+        users = UserAccount.objects.in_bulk(
+            {values["phone_number"] for _, values in parsed},
+            field_name="phone_number",
+        )
+        to_create = []
+        for index, values in parsed:
+            user = users.get(values.pop("phone_number"))
+            if user is None:
+                results[index]["error"] = "Usuario nao encontrado"
+                continue
+            to_create.append((index, FinancialEntry(user=user, **values)))
+
+        with transaction.atomic():
+            created = FinancialEntry.objects.bulk_create([entry for _, entry in to_create], batch_size=1000)
+            by_user = defaultdict(list)
+            for entry in created:
+                by_user[entry.user_id].append(entry)
+            for user_entries in by_user.values():
+                apply_entry_rollups(user_entries[0].user, added=user_entries)
+
+        for (index, _), entry in zip(to_create, created):
+            results[index].update({"id": entry.id, "tipo": entry.entry_type, "valor": entry.amount})
+
+        error_count = sum(1 for r in results if r.get("error"))
+        return Response(
+            {
+                "message": "Lancamentos processados",
+                "created": len(created),
+                "errors": error_count,
+                "results": results,
+            },
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+        )
+
+
 @method_decorator(csrf_exempt, name="dispatch")
 class PhoneLoginView(APIView):
     authentication_classes = []
@@ -850,7 +1224,7 @@ class PhoneLoginView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
-        request.session["user_phone"] = user.phone_number
+        login_session_user(request, user)
 
         return Response(
             {"message": "Login realizado com sucesso"},
@@ -882,6 +1256,8 @@ class ProfileView(APIView):
         user = get_logged_user(request)
         if not user:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
+        # o registro da sessao pode vir do cache; edita sempre a versao do banco
+        user = UserAccount.objects.get(id=user.id)
 
         first_name = str(request.data.get("first_name", user.first_name)).strip()
         last_name = str(request.data.get("last_name", user.last_name)).strip()
@@ -922,7 +1298,8 @@ class ProfileView(APIView):
         if password:
             user.set_password(password)
         user.save()
-        request.session["user_phone"] = user.phone_number
+        forget_session_user(user.id)
+        login_session_user(request, user)
         return Response({"message": "Perfil atualizado com sucesso"})
 
 
@@ -931,12 +1308,220 @@ class UserManualPdfView(APIView):
         user = get_logged_user(request)
         if not user:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
-        pdf_bytes = build_manual_pdf_bytes()
-        response = HttpResponse(pdf_bytes, content_type="application/pdf")
-        response["Content-Disposition"] = 'attachment; filename="Manual-GenFin.pdf"'
+        pdf_bytes, etag, last_modified = load_manual_pdf(manual_pdf_version())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(pdf_bytes, content_type="application/pdf")
+            response["Content-Disposition"] = 'attachment; filename="Manual-GenFin.pdf"'
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+
+def format_brl(value):
+    text = f"{float(value or 0):,.2f}"
+    return "R$ " + text.replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def statement_row(*columns):
+    return ("mono", " | ".join(str(col) for col in columns)[:92])
+
+
+def iter_statement_items(user, month, year):
+    # lancamentos vem do banco em lotes via iterator(); nenhuma lista do mes inteiro e montada
+    month_q = month_range_q(year, month)
+    entry_totals = {
+        row["entry_type"]: row["total"] or 0
+        for row in user.entries.filter(month_q).values("entry_type").annotate(total=Sum("amount"))
+    }
+    receitas = entry_totals.get("RECEITA", 0)
+    despesas = entry_totals.get("DESPESA", 0)
+    planned_qs = user.planned_expenses.filter(month_q)
+    bills_total = planned_qs.filter(source_key__startswith="CC:").aggregate(total=Sum("amount"))["total"] or 0
+    planned_total = planned_qs.exclude(source_key__startswith="CC:").aggregate(total=Sum("amount"))["total"] or 0
+    vehicle_summary = build_vehicle_summary_payload(user, month, year)
+
+    yield ("h2", "Resumo")
+    yield statement_row("Receitas", format_brl(receitas))
+    yield statement_row("Despesas", format_brl(despesas))
+    yield statement_row("Saldo", format_brl(receitas - despesas))
+    yield statement_row("Despesas planejadas", format_brl(planned_total))
+    yield statement_row("Faturas de cartao", format_brl(bills_total))
+    yield statement_row("Custos de veiculos", format_brl(vehicle_summary["monthly_total"]))
+    yield ("sp", "")
+
+    yield ("h2", "Lancamentos")
+    entries = user.entries.filter(month_q).order_by("date", "id").values_list("date", "entry_type", "category", "amount")
+    for entry_date, entry_type, category, amount in entries.iterator(chunk_size=2000):
+        yield statement_row(entry_date.strftime("%d/%m/%Y"), entry_type, category[:40], format_brl(amount))
+    yield ("sp", "")
+
+    yield ("h2", "Despesas planejadas")
+    planned = (
+        planned_qs.exclude(source_key__startswith="CC:")
+        .order_by("date", "id")
+        .values_list("date", "category", "amount", "is_paid")
+    )
+    for planned_date, category, amount, is_paid in planned.iterator(chunk_size=2000):
+        yield statement_row(
+            planned_date.strftime("%d/%m/%Y"), category[:40], format_brl(amount), "Pago" if is_paid else "Pendente"
+        )
+    yield ("sp", "")
+
+    yield ("h2", "Faturas de cartao")
+    bills = planned_qs.filter(source_key__startswith="CC:").order_by("date", "id").values_list("date", "category", "amount")
+    for due_date, category, amount in bills.iterator(chunk_size=2000):
+        yield statement_row(f"Vence {due_date.strftime('%d/%m/%Y')}", category, format_brl(amount))
+    yield ("sp", "")
+
+    yield ("h2", "Custos de veiculos")
+    for vehicle in vehicle_summary["vehicle_totals"]:
+        yield statement_row(vehicle["name"][:40], "Custo mensal", format_brl(vehicle["monthly_cost"]))
+    vehicle_expenses = (
+        user.vehicle_expenses.filter(Q(is_recurring=True) | (month_q & Q(is_recurring=False)))
+        .order_by("date", "id")
+        .values_list("date", "vehicle__name", "expense_type", "amount", "is_recurring")
+    )
+    for expense_date, vehicle_name, expense_type, amount, is_recurring in vehicle_expenses.iterator(chunk_size=2000):
+        label = "Recorrente" if is_recurring else expense_date.strftime("%d/%m/%Y")
+        yield statement_row(label, vehicle_name[:30], expense_type, format_brl(amount))
+
+
+def iter_statement_pdf(user, month, year):
+    # cada pagina e enviada assim que fica pronta; o writer guarda so os offsets do xref
+    generated_at = timezone.now().strftime("%d/%m/%Y %H:%M")
+    name = f"{user.first_name} {user.last_name}".strip() or user.phone_number
+    header = ("GenFin - Extrato Mensal", f"{month:02d}/{year}")
+    writer = PdfStreamWriter()
+    yield writer.begin()
+    pages = paginate_items(
+        iter_statement_items(user, month, year),
+        f"Extrato {month:02d}/{year}",
+        subtitle=name,
+    )
+    for idx, page in enumerate(pages, start=1):
+        footer = f"Pagina {idx} | Gerado em {generated_at}"
+        yield writer.add_page(render_page_commands(page, footer, header=header))
+    yield writer.finish()
+
+
+class FinancialStatementPdfView(APIView):
+    def get(self, request):
+        user = get_logged_user(request)
+        if not user:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        month, year = parse_month_year(request.query_params)
+        if not 1 <= month <= 12 or not 1 <= year <= 9999:
+            return Response({"error": "Periodo invalido"}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(iter_statement_pdf(user, month, year), content_type="application/pdf")
+        response["Content-Disposition"] = f'attachment; filename="Extrato-GenFin-{year}-{month:02d}.pdf"'
+        response["Cache-Control"] = "private, no-store"
         return response
 
 
+def entry_rollup_snapshot(entry):
+    return FinancialEntry(
+        entry_type=entry.entry_type,
+        category=entry.category,
+        amount=entry.amount,
+        date=entry.date,
+    )
+
+
+def apply_entry_rollups(user, added=(), removed=()):
+    # Mantem FinancialEntryMonthlyRollup em dia aplicando apenas a diferenca
+    # dos lancamentos criados/removidos; chamar dentro da mesma transacao da escrita.
+    deltas = defaultdict(lambda: [Decimal("0"), 0])
+    for sign, entries in ((1, added), (-1, removed)):
+        for entry in entries:
+            entry_date = parse_date_value(entry.date)
+            bucket = deltas[(entry_date.year, entry_date.month, entry.entry_type, entry.category)]
+            bucket[0] += sign * Decimal(str(entry.amount or 0))
+            bucket[1] += sign
+
+    touched = Q(pk__in=[])
+    for (year, month, entry_type, category), (amount, count) in deltas.items():
+        if not amount and not count:
+            continue
+        lookup = {"user": user, "year": year, "month": month, "entry_type": entry_type, "category": category}
+        touched |= Q(year=year, month=month, entry_type=entry_type, category=category)
+        changes = {"total_amount": F("total_amount") + amount, "entry_count": F("entry_count") + count}
+        if FinancialEntryMonthlyRollup.objects.filter(**lookup).update(**changes) or count <= 0:
+            continue
+        try:
+            with transaction.atomic():
+                FinancialEntryMonthlyRollup.objects.create(total_amount=amount, entry_count=count, **lookup)
+        except IntegrityError:
+            FinancialEntryMonthlyRollup.objects.filter(**lookup).update(**changes)
+    user.entry_rollups.filter(touched, entry_count=0).delete()
+
+
+def rebuild_entry_rollups(user):
+    rows = (
+        user.entries.annotate(year=ExtractYear("date"), month=ExtractMonth("date"))
+        .values("year", "month", "entry_type", "category")
+        .annotate(total=Sum("amount"), count=Count("id"))
+        .order_by()
+    )
+    with transaction.atomic():
+        user.entry_rollups.all().delete()
+        created = FinancialEntryMonthlyRollup.objects.bulk_create(
+            [
+                FinancialEntryMonthlyRollup(
+                    user=user,
+                    year=row["year"],
+                    month=row["month"],
+                    entry_type=row["entry_type"],
+                    category=row["category"],
+                    total_amount=row["total"] or 0,
+                    entry_count=row["count"],
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def entry_category_totals(user):
+    return list(user.entry_rollups.values("entry_type", "category").annotate(total=Sum("total_amount")))
+
+
+def build_dashboard_payload(user, category_totals=None):
+    if category_totals is None:
+        category_totals = user.entry_rollups.values("entry_type").annotate(total=Sum("total_amount"))
+    totals = defaultdict(int)
+    for row in category_totals:
+        totals[row["entry_type"]] += row["total"] or 0
+    total_receita = totals["RECEITA"]
+    total_despesa = totals["DESPESA"]
+    return {
+        "phone_number": user.phone_number,
+        "total_receita": total_receita,
+        "total_despesa": total_despesa,
+        "saldo": total_receita - total_despesa,
+    }
+
+
+def build_dashboard_categories_payload(user, category_totals=None):
+    if category_totals is None:
+        return list(
+            user.entry_rollups.filter(entry_type="DESPESA")
+            .values("category")
+            .annotate(total=Sum("total_amount"))
+            .order_by("-total")
+        )
+    rows = [
+        {"category": row["category"], "total": row["total"]}
+        for row in category_totals
+        if row["entry_type"] == "DESPESA"
+    ]
+    rows.sort(key=lambda x: x["total"] or 0, reverse=True)
+    return rows
+
+
 class DashboardView(APIView):
     def get(self, request):
         user = get_logged_user(request)
@@ -947,21 +1532,7 @@ class DashboardView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
-        receitas = user.entries.filter(entry_type="RECEITA")
-        despesas = user.entries.filter(entry_type="DESPESA")
-
-        total_receita = receitas.aggregate(total=Sum("amount"))["total"] or 0
-        total_despesa = despesas.aggregate(total=Sum("amount"))["total"] or 0
-
-        return Response(
-            {
-                "phone_number": user.phone_number,
-                "total_receita": total_receita,
-                "total_despesa": total_despesa,
-                "saldo": total_receita - total_despesa,
-            },
-            status=status.HTTP_200_OK,
-        )
+        return Response(build_dashboard_payload(user), status=status.HTTP_200_OK)
 
 
 @ensure_csrf_cookie
@@ -1045,34 +1616,131 @@ def logout_page(request):
     return redirect("/login/")
 
 
+def parse_entries_limit(params, default=20):
+    try:
+        limit = int(params.get("limit", default))
+    except ValueError:
+        limit = default
+    return max(1, min(limit, 500))
+
+
+def serialize_entry(e):
+    return {
+        "id": e.id,
+        "date": e.date.strftime("%d/%m/%Y"),
+        "category": e.category,
+        "entry_type": e.entry_type,
+        "amount": e.amount,
+        "has_receipt": bool(e.receipt_file),
+        "receipt_url": f"/api/entries/{e.id}/receipt/" if e.receipt_file else None,
+        "receipt_thumbnail_url": f"/api/entries/{e.id}/receipt/thumbnail/" if e.receipt_blob_id else None,
+    }
+
+
+def build_entries_payload(user, limit):
+    entries = user.entries.order_by("-date", "-id")[:limit]
+    return [serialize_entry(e) for e in entries]
+
+
+def parse_query_date(value):
+    value = (value or "").strip()
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+
+def encode_entry_cursor(entry):
+    raw = f"{entry.date.isoformat()}|{entry.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_entry_cursor(value):
+    padded = value + "=" * (-len(value) % 4)
+    try:
+        raw_date, raw_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.strptime(raw_date, "%Y-%m-%d").date(), int(raw_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(value)
+
+
+def filter_entries_queryset(user, params):
+    # filtros da listagem: date_from, date_to, entry_type, category, has_receipt
+    qs = user.entries.all()
+
+    for param, lookup in (("date_from", "date__gte"), ("date_to", "date__lte")):
+        if params.get(param):
+            try:
+                qs = qs.filter(**{lookup: parse_query_date(params.get(param))})
+            except ValueError:
+                return None, f"{param} invalido"
+
+    entry_type = (params.get("entry_type") or "").strip().upper()
+    if entry_type:
+        if entry_type not in {"RECEITA", "DESPESA"}:
+            return None, "entry_type invalido"
+        qs = qs.filter(entry_type=entry_type)
+
+    category = (params.get("category") or "").strip()
+    if category:
+        qs = qs.filter(category=category)
+
+    has_receipt = (params.get("has_receipt") or "").strip().lower()
+    if has_receipt in {"1", "true", "sim"}:
+        qs = qs.exclude(receipt_file="").exclude(receipt_file__isnull=True)
+    elif has_receipt in {"0", "false", "nao"}:
+        qs = qs.filter(Q(receipt_file="") | Q(receipt_file__isnull=True))
+
+    return qs.order_by("-date", "-id"), None
+
+
+def stream_entries_json(queryset):
+    yield "["
+    first = True
+    for entry in queryset.iterator(chunk_size=2000):
+        item = serialize_entry(entry)
+        item["amount"] = str(item["amount"])
+        yield ("" if first else ",") + json.dumps(item, ensure_ascii=False)
+        first = False
+    yield "]"
+
+
 class FinancialEntryListView(APIView):
     def get(self, request):
         user = get_logged_user(request)
         if not user:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-        try:
-            limit = int(request.query_params.get("limit", 20))
-        except ValueError:
-            limit = 20
-        limit = max(1, min(limit, 500))
+        params = request.query_params
+        qs, error = filter_entries_queryset(user, params)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
-        entries = user.entries.order_by("-date")[:limit]
+        # exportacao completa sem montar a lista inteira em memoria
+        if params.get("stream") in {"1", "true"}:
+            response = StreamingHttpResponse(stream_entries_json(qs), content_type="application/json")
+            response["Content-Disposition"] = 'attachment; filename="movimentacoes.json"'
+            return response
 
-        return Response(
-            [
-                {
-                    "id": e.id,
-                    "date": e.date.strftime("%d/%m/%Y"),
-                    "category": e.category,
-                    "entry_type": e.entry_type,
-                    "amount": e.amount,
-                    "has_receipt": bool(e.receipt_file),
-                    "receipt_url": f"/api/entries/{e.id}/receipt/" if e.receipt_file else None,
-                }
-                for e in entries
-            ]
-        )
+        cursor = (params.get("cursor") or "").strip()
+        if cursor:
+            try:
+                cursor_date, cursor_id = decode_entry_cursor(cursor)
+            except ValueError:
+                return Response({"error": "cursor invalido"}, status=status.HTTP_400_BAD_REQUEST)
+            qs = qs.filter(Q(date__lt=cursor_date) | Q(date=cursor_date, id__lt=cursor_id))
+
+        limit = parse_entries_limit(params)
+        page = list(qs[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        response = Response([serialize_entry(e) for e in page])
+        if has_more:
+            response["X-Next-Cursor"] = encode_entry_cursor(page[-1])
+        return response
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -1100,6 +1768,7 @@ class FinancialEntryDetailView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        previous = entry_rollup_snapshot(entry)
         entry_type = request.data.get("entry_type")
         if entry_type and entry_type in {"RECEITA", "DESPESA"}:
             entry.entry_type = entry_type
@@ -1117,7 +1786,9 @@ class FinancialEntryDetailView(APIView):
 
         entry.category = category
         entry.amount = amount
-        entry.save()
+        with transaction.atomic():
+            entry.save()
+            apply_entry_rollups(user, added=[entry], removed=[previous])
 
         return Response({"message": "Movimentacao atualizada"}, status=status.HTTP_200_OK)
 
@@ -1134,10 +1805,249 @@ class FinancialEntryDetailView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        entry.delete()
+        with transaction.atomic():
+            apply_entry_rollups(user, removed=[entry])
+            entry.delete()
+            release_receipt_blobs([entry.receipt_blob_id])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+RECEIPT_CHUNK_SIZE = 64 * 1024
+
+
+def parse_byte_range(header, size):
+    # so um intervalo por requisicao; multiplos intervalos recebem o arquivo inteiro (RFC 9110 permite ignorar)
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            suffix = int(end_text)
+            if suffix <= 0:
+                return "invalid"
+            start, end = max(size - suffix, 0), size - 1
+    except ValueError:
+        return None
+    if start < 0 or start > end or start >= size:
+        return "invalid"
+    return start, min(end, size - 1)
+
+
+def iter_file_range(fh, start, length):
+    try:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(RECEIPT_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
+
+
+def receipt_sendfile_header():
+    # GENFIN_RECEIPT_SENDFILE=nginx|apache delega a entrega dos bytes ao proxy da frente
+    mode = os.getenv("GENFIN_RECEIPT_SENDFILE", "").strip().lower()
+    return {"nginx": "X-Accel-Redirect", "apache": "X-Sendfile"}.get(mode)
+
+
+def serve_receipt_file(request, field_file, filename=None):
+    # blobs sao nomeados pelo sha256; o nome original do upload vai no Content-Disposition
+    path = field_file.path
+    stat = os.stat(path)
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = f'"{stat.st_ino:x}-{size:x}-{int(stat.st_mtime_ns):x}"'
+    filename = filename or field_file.name.rsplit("/", 1)[-1]
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        sendfile_header = receipt_sendfile_header()
+        byte_range = parse_byte_range(request.headers.get("Range"), size)
+        if_range = request.headers.get("If-Range")
+        if if_range and if_range != etag:
+            byte_range = None
+
+        if sendfile_header:
+            # o proxy trata Range e envia o arquivo via sendfile; o Django so autorizou
+            response = HttpResponse(content_type=content_type)
+            if sendfile_header == "X-Accel-Redirect":
+                prefix = os.getenv("GENFIN_RECEIPT_ACCEL_PREFIX", "/protected-media/")
+                response[sendfile_header] = prefix.rstrip("/") + "/" + field_file.name
+            else:
+                response[sendfile_header] = path
+        elif byte_range == "invalid":
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+        elif byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                iter_file_range(field_file.open("rb"), start, end - start + 1),
+                status=206,
+                content_type=content_type,
+            )
+            response["Content-Length"] = str(end - start + 1)
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        else:
+            response = FileResponse(field_file.open("rb"), content_type=content_type)
+        if response.status_code != 416:
+            response["Content-Disposition"] = content_disposition_header(False, filename)
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+RECEIPT_BLOB_DIR = "receipt_blobs"
+RECEIPT_THUMBNAIL_DIR = "receipt_thumbnails"
+RECEIPT_THUMBNAIL_SIZE = (320, 320)
+
+
+def receipt_blob_name(digest):
+    return f"{RECEIPT_BLOB_DIR}/{digest[:2]}/{digest}"
+
+
+def store_receipt_blob(upload):
+    # Um unico passe pelo upload: grava os chunks num temporario enquanto calcula o sha256.
+    # O nome final e so o sha256 (sem extensao), entao reenvios do mesmo conteudo, com
+    # qualquer nome, caem no mesmo arquivo e so ganham +1 referencia.
+    blob_root = os.path.join(settings.MEDIA_ROOT, RECEIPT_BLOB_DIR)
+    os.makedirs(blob_root, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=blob_root, suffix=".tmp")
+    digest = hashlib.sha256()
+    size = 0
+    wrote_file = False
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            for chunk in upload.chunks():
+                digest.update(chunk)
+                size += len(chunk)
+                fh.write(chunk)
+        sha256 = digest.hexdigest()
+        name = receipt_blob_name(sha256)
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            wrote_file = True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    content_type = getattr(upload, "content_type", "") or mimetypes.guess_type(upload.name or "")[0] or ""
+    while True:
+        # get_or_create ja trata a corrida de dois uploads iguais; o update volta 0 se o
+        # blob foi liberado entre a leitura e o incremento, e entao ele e recriado
+        blob, created = ReceiptBlob.objects.get_or_create(
+            sha256=sha256,
+            defaults={
+                "file": name,
+                "size": size,
+                "content_type": content_type[:100],
+                "ref_count": 1,
+                "thumbnail_status": "PENDENTE" if content_type.startswith("image/") else "SEM_PREVIA",
+            },
+        )
+        if created or ReceiptBlob.objects.filter(id=blob.id).update(ref_count=F("ref_count") + 1):
+            if wrote_file and blob.file.name != name:
+                # blob antigo, gravado com a extensao no nome: reaproveita o arquivo dele
+                os.remove(path)
+            return blob
+
+
+def delete_receipt_blob_files(sha256, names):
+    # roda depois do commit; se outro upload recriou o blob nesse meio tempo os arquivos ficam
+    if ReceiptBlob.objects.filter(sha256=sha256).exists():
+        return
+    for name in names:
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def release_receipt_blobs(blob_ids):
+    # Decrementa as referencias e remove os blobs que ficaram sem uso; os arquivos
+    # so sao apagados depois do commit da transacao do chamador.
+    counts = defaultdict(int)
+    for blob_id in blob_ids:
+        if blob_id:
+            counts[blob_id] += 1
+    if not counts:
+        return 0
+    with transaction.atomic():
+        for blob_id, count in counts.items():
+            ReceiptBlob.objects.filter(id=blob_id).update(ref_count=F("ref_count") - count)
+        unreferenced = list(
+            ReceiptBlob.objects.select_for_update()
+            .filter(id__in=list(counts), ref_count__lte=0)
+            .values_list("id", "sha256", "file", "thumbnail")
+        )
+        ReceiptBlob.objects.filter(id__in=[row[0] for row in unreferenced]).delete()
+        for _, sha256, file_name, thumbnail_name in unreferenced:
+            names = [n for n in (file_name, thumbnail_name) if n]
+            transaction.on_commit(functools.partial(delete_receipt_blob_files, sha256, names))
+    return len(unreferenced)
+
+
+def detach_entry_receipt(entry):
+    # desvincula o comprovante atual; arquivos anteriores aos blobs sao apagados direto
+    blob_id = entry.receipt_blob_id
+    if not blob_id and entry.receipt_file:
+        entry.receipt_file.delete(save=False)
+    entry.receipt_file = None
+    entry.receipt_blob = None
+    entry.receipt_original_name = ""
+    entry.save(update_fields=["receipt_file", "receipt_blob", "receipt_original_name"])
+    release_receipt_blobs([blob_id])
+
+
+def generate_receipt_thumbnail(blob):
+    thumb_name = f"{RECEIPT_THUMBNAIL_DIR}/{blob.sha256[:2]}/{blob.sha256}.jpg"
+    thumb_path = os.path.join(settings.MEDIA_ROOT, thumb_name)
+    try:
+        with Image.open(blob.file.path) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(RECEIPT_THUMBNAIL_SIZE)
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            tmp_path = f"{thumb_path}.{os.getpid()}.tmp"
+            image.convert("RGB").save(tmp_path, "JPEG", quality=80)
+            os.replace(tmp_path, thumb_path)
+    except (OSError, Image.DecompressionBombError):
+        ReceiptBlob.objects.filter(id=blob.id).update(thumbnail_status="SEM_PREVIA")
+        return False
+    ReceiptBlob.objects.filter(id=blob.id).update(thumbnail=thumb_name, thumbnail_status="PRONTA")
+    return True
+
+
+def process_receipt_thumbnails(limit=50):
+    # uma transacao curta por blob; skip_locked deixa varios workers dividirem a fila
+    totals = {"generated": 0, "skipped": 0}
+    for _ in range(limit):
+        with transaction.atomic():
+            blob = (
+                ReceiptBlob.objects.select_for_update(skip_locked=True)
+                .filter(thumbnail_status="PENDENTE")
+                .order_by("id")
+                .first()
+            )
+            if blob is None:
+                break
+            if generate_receipt_thumbnail(blob):
+                totals["generated"] += 1
+            else:
+                totals["skipped"] += 1
+    return totals
+
+
 @method_decorator(csrf_exempt, name="dispatch")
 class FinancialEntryReceiptView(APIView):
     def get(self, request, entry_id):
@@ -1156,8 +2066,15 @@ class FinancialEntryReceiptView(APIView):
                 {"error": "Comprovante nao encontrado"},
                 status=status.HTTP_404_NOT_FOUND,
             )
-        filename = entry.receipt_file.name.rsplit("/", 1)[-1]
-        return FileResponse(entry.receipt_file.open("rb"), as_attachment=False, filename=filename)
+        try:
+            return serve_receipt_file(
+                request, entry.receipt_file, entry.receipt_original_name or None
+            )
+        except FileNotFoundError:
+            return Response(
+                {"error": "Comprovante nao encontrado"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
 
     def post(self, request, entry_id):
         user = get_logged_user(request)
@@ -1184,8 +2101,13 @@ class FinancialEntryReceiptView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        entry.receipt_file = receipt
-        entry.save(update_fields=["receipt_file"])
+        blob = store_receipt_blob(receipt)
+        with transaction.atomic():
+            detach_entry_receipt(entry)
+            entry.receipt_blob = blob
+            entry.receipt_file = blob.file.name
+            entry.receipt_original_name = os.path.basename(receipt.name or "")[:255]
+            entry.save(update_fields=["receipt_file", "receipt_blob", "receipt_original_name"])
         return Response(
             {
                 "message": "Comprovante anexado",
@@ -1207,96 +2129,354 @@ class FinancialEntryReceiptView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
         if entry.receipt_file:
-            entry.receipt_file.delete(save=False)
-            entry.receipt_file = None
-            entry.save(update_fields=["receipt_file"])
+            with transaction.atomic():
+                detach_entry_receipt(entry)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class DashboardCategoryView(APIView):
-    def get(self, request):
+class FinancialEntryReceiptThumbnailView(APIView):
+    def get(self, request, entry_id):
         user = get_logged_user(request)
         if not user:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
+        entry = user.entries.select_related("receipt_blob").filter(id=entry_id).first()
+        if entry is None:
+            return Response(
+                {"error": "Movimentacao nao encontrada"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if not entry.receipt_blob or not entry.receipt_blob.thumbnail:
+            return Response(
+                {"error": "Previa nao disponivel"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        try:
+            return serve_receipt_file(request, entry.receipt_blob.thumbnail)
+        except FileNotFoundError:
+            return Response(
+                {"error": "Previa nao disponivel"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
 
-        data = (
-            user.entries.filter(entry_type="DESPESA")
-            .values("category")
-            .annotate(total=Sum("amount"))
-            .order_by("-total")
+
+class DashboardCategoryView(APIView):
+    def get(self, request):
+        user = get_logged_user(request)
+        if not user:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        return Response(build_dashboard_categories_payload(user))
+
+
+def build_planner_payload(user):
+    return [
+        {
+            "id": p.id,
+            "date": p.date.strftime("%Y-%m-%d"),
+            "category": p.category,
+            "description": p.description,
+            "amount": p.amount,
+            "is_recurring": p.is_recurring,
+            "is_paid": p.is_paid,
+            **serialize_recurrence(p),
+        }
+        for p in user.planned_expenses.all().order_by("date")
+    ]
+
+
+def build_planned_incomes_payload(user):
+    return [
+        {
+            "id": p.id,
+            "date": p.date.strftime("%Y-%m-%d"),
+            "category": p.category,
+            "description": p.description,
+            "amount": p.amount,
+            "is_recurring": p.is_recurring,
+            **serialize_recurrence(p),
+        }
+        for p in user.planned_incomes.all().order_by("date")
+    ]
+
+
+def build_planned_reserves_payload(user):
+    return [
+        {
+            "id": p.id,
+            "date": p.date.strftime("%Y-%m-%d"),
+            "category": p.category,
+            "description": p.description,
+            "amount": p.amount,
+            "is_recurring": p.is_recurring,
+            **serialize_recurrence(p),
+        }
+        for p in user.planned_reserves.all().order_by("date")
+    ]
+
+
+def serialize_recurrence(item):
+    return {
+        "recurrence_frequency": item.recurrence_frequency,
+        "recurrence_interval": item.recurrence_interval,
+        "recurrence_end": item.recurrence_end.strftime("%Y-%m-%d") if item.recurrence_end else None,
+        "recurrence_exceptions": item.recurrence_exceptions,
+    }
+
+
+def parse_recurrence_fields(data, current=None):
+    # Campos ausentes mantem o valor atual (ou o padrao na criacao); devolve (campos, erro).
+    frequency = str(data.get("recurrence_frequency") or getattr(current, "recurrence_frequency", "MENSAL")).upper()
+    if frequency not in dict(FREQUENCY_CHOICES):
+        return None, "recurrence_frequency invalida"
+    interval = data.get("recurrence_interval")
+    if interval in (None, ""):
+        # 0 e enviado de proposito e cai na validacao abaixo; so ausente/vazio usa o atual
+        interval = getattr(current, "recurrence_interval", 1)
+    try:
+        interval = int(interval)
+    except (TypeError, ValueError):
+        return None, "recurrence_interval invalido"
+    if interval < 1 or interval > 366:
+        return None, "recurrence_interval deve estar entre 1 e 366"
+
+    end = data.get("recurrence_end", getattr(current, "recurrence_end", None))
+    try:
+        end = parse_date_value(end) if end not in (None, "") else None
+    except ValidationError:
+        return None, "recurrence_end invalida"
+    try:
+        start = parse_date_value(data.get("date"))
+    except ValidationError:
+        return None, "date invalida"
+    if end and start and end < start:
+        return None, "recurrence_end deve ser posterior a date"
+
+    exceptions = data.get("recurrence_exceptions", getattr(current, "recurrence_exceptions", []))
+    if not isinstance(exceptions, (list, tuple)):
+        return None, "recurrence_exceptions deve ser uma lista de datas"
+    parsed = parse_exception_dates(exceptions)
+    if len(parsed) != len({str(value) for value in exceptions}):
+        return None, "recurrence_exceptions deve ser uma lista de datas AAAA-MM-DD"
+    return {
+        "recurrence_frequency": frequency,
+        "recurrence_interval": interval,
+        "recurrence_end": end,
+        "recurrence_exceptions": sorted(value.isoformat() for value in parsed),
+    }, None
+
+
+PLANNED_SERIES_KINDS = ("expense", "income", "reserve")
+PLANNED_SERIES_RELATIONS = {
+    "expense": "planned_expenses",
+    "income": "planned_incomes",
+    "reserve": "planned_reserves",
+}
+PLANNED_SERIES_FIELDS = (
+    "id",
+    "date",
+    "category",
+    "description",
+    "amount",
+    "is_recurring",
+    "recurrence_frequency",
+    "recurrence_interval",
+    "recurrence_end",
+    "recurrence_exceptions",
+)
+
+
+def planned_series_window_q(start, end):
+    # itens avulsos dentro da janela ou series que comecam antes do fim e terminam depois do inicio
+    return Q(date__range=(start, end)) | (
+        Q(is_recurring=True, date__lte=end) & (Q(recurrence_end__isnull=True) | Q(recurrence_end__gte=start))
+    )
+
+
+def planned_series(user, kinds=PLANNED_SERIES_KINDS, start=None, end=None):
+    # Uma linha por serie, nao por mes: as ocorrencias sao expandidas sob demanda.
+    series = []
+    for kind in kinds:
+        fields = PLANNED_SERIES_FIELDS + (("source_key", "is_paid") if kind == "expense" else ())
+        queryset = getattr(user, PLANNED_SERIES_RELATIONS[kind]).all()
+        if start is not None and end is not None:
+            queryset = queryset.filter(planned_series_window_q(start, end))
+        for row in queryset.values(*fields):
+            # faturas de cartao (source_key CC:...) ja sao gravadas uma linha por competencia
+            recurring = row["is_recurring"] and not row.get("source_key")
+            rule = RecurrenceRule(
+                row["date"],
+                row["recurrence_frequency"] if recurring else None,
+                row["recurrence_interval"],
+                row["recurrence_end"],
+                parse_exception_dates(row["recurrence_exceptions"]),
+            )
+            row["kind"] = kind
+            series.append((rule, row))
+    return series
+
+
+def iter_planned_occurrences(user, start, end, kinds=PLANNED_SERIES_KINDS):
+    return merge_occurrences(planned_series(user, kinds, start, end), start, end)
+
+
+def planned_projection_version_key(user_id):
+    return f"genfin:planned-projection:{user_id}:version"
+
+
+def invalidate_planned_projection(user_id):
+    # chamada em toda escrita de item planejado; as projecoes antigas expiram sozinhas
+    key = planned_projection_version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def build_planned_projection(user, year, month, months):
+    rows = []
+    window_start = datetime(year, month, 1).date()
+    last_year, last_month = shift_month(year, month, months - 1)
+    window_end = datetime(last_year, last_month, calendar.monthrange(last_year, last_month)[1]).date()
+    series = planned_series(user, start=window_start, end=window_end)
+    for offset in range(months):
+        row_year, row_month = shift_month(year, month, offset)
+        start = datetime(row_year, row_month, 1).date()
+        end = start.replace(day=calendar.monthrange(row_year, row_month)[1])
+        totals = {kind: Decimal("0") for kind in PLANNED_SERIES_KINDS}
+        recurring_expense = Decimal("0")
+        for rule, item in series:
+            hits = rule.count(start, end)
+            if not hits:
+                continue
+            totals[item["kind"]] += item["amount"] * hits
+            if rule.frequency is not None and item["kind"] == "expense":
+                recurring_expense += item["amount"] * hits
+        rows.append(
+            {
+                "year": row_year,
+                "month": row_month,
+                "expense": totals["expense"],
+                "income": totals["income"],
+                "reserve": totals["reserve"],
+                "recurring_expense": recurring_expense,
+                "net": totals["income"] - totals["expense"] - totals["reserve"],
+            }
         )
+    return rows
 
-        return Response(list(data))
 
+def planned_projection(user, year, month, months=12):
+    # Projecao mensal das series; cache invalidado pela versao a cada escrita.
+    version = cache.get(planned_projection_version_key(user.id), 0)
+    key = f"genfin:planned-projection:{user.id}:{version}:{year:04d}-{month:02d}:{months}"
+    rows = cache.get(key)
+    if rows is None:
+        rows = build_planned_projection(user, year, month, months)
+        cache.set(key, rows, timeout=int(os.getenv("GENFIN_PLANNED_PROJECTION_TTL", "3600")))
+    return rows
 
-class PlannerListView(APIView):
+
+def parse_iso_date_param(value, default):
+    if value in (None, ""):
+        return default
+    try:
+        return datetime.strptime(str(value), "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+class PlannedOccurrenceListView(APIView):
     def get(self, request):
         user = get_logged_user(request)
         if not user:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-        data = user.planned_expenses.all().order_by("date")
-
+        today = timezone.now().date()
+        start = parse_iso_date_param(request.query_params.get("start"), today.replace(day=1))
+        end = parse_iso_date_param(
+            request.query_params.get("end"),
+            today.replace(day=calendar.monthrange(today.year, today.month)[1]),
+        )
+        if start is None or end is None or end < start:
+            return Response({"error": "start/end invalidos (AAAA-MM-DD)"}, status=status.HTTP_400_BAD_REQUEST)
+        raw_kinds = str(request.query_params.get("kinds", "")).strip()
+        kinds = [k.strip() for k in raw_kinds.split(",") if k.strip()] if raw_kinds else list(PLANNED_SERIES_KINDS)
+        if set(kinds) - set(PLANNED_SERIES_KINDS):
+            return Response({"error": "kinds invalido"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = parse_entries_limit(request.query_params, default=500)
+
+        # o gerador e lazy: para na primeira ocorrencia alem do limite
+        window = list(itertools.islice(iter_planned_occurrences(user, start, end, kinds), limit + 1))
+        occurrences = [
+            {
+                "date": when.strftime("%Y-%m-%d"),
+                "kind": item["kind"],
+                "id": item["id"],
+                "category": item["category"],
+                "description": item["description"],
+                "amount": item["amount"],
+                "is_recurring": item["is_recurring"],
+            }
+            for when, item in window[:limit]
+        ]
         return Response(
-            [
-                {
-                    "id": p.id,
-                    "date": p.date.strftime("%Y-%m-%d"),
-                    "category": p.category,
-                    "description": p.description,
-                    "amount": p.amount,
-                    "is_recurring": p.is_recurring,
-                    "is_paid": p.is_paid,
-                }
-                for p in data
-            ]
+            {
+                "start": start.strftime("%Y-%m-%d"),
+                "end": end.strftime("%Y-%m-%d"),
+                "occurrences": occurrences,
+                "truncated": len(window) > limit,
+            }
         )
 
 
-class PlannedIncomeListView(APIView):
+PROJECTION_MAX_YEAR = 9989
+
+
+class PlannedProjectionView(APIView):
     def get(self, request):
         user = get_logged_user(request)
         if not user:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-        data = user.planned_incomes.all().order_by("date")
+        month, year = parse_month_year(request.query_params)
+        try:
+            months = int(request.query_params.get("months", 12))
+        except ValueError:
+            months = 12
+        if month < 1 or month > 12:
+            return Response({"error": "month invalido"}, status=status.HTTP_400_BAD_REQUEST)
+        # a janela inteira (ate 120 meses) precisa caber em datetime.date
+        if year < 1 or year > PROJECTION_MAX_YEAR:
+            return Response({"error": "year invalido"}, status=status.HTTP_400_BAD_REQUEST)
+        months = max(1, min(months, 120))
+        return Response({"months": planned_projection(user, year, month, months)})
 
-        return Response(
-            [
-                {
-                    "id": p.id,
-                    "date": p.date.strftime("%Y-%m-%d"),
-                    "category": p.category,
-                    "description": p.description,
-                    "amount": p.amount,
-                    "is_recurring": p.is_recurring,
-                }
-                for p in data
-            ]
-        )
 
+class PlannerListView(APIView):
+    def get(self, request):
+        user = get_logged_user(request)
+        if not user:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        return Response(build_planner_payload(user))
 
-class PlannedReserveListView(APIView):
+
+class PlannedIncomeListView(APIView):
     def get(self, request):
         user = get_logged_user(request)
         if not user:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-        data = user.planned_reserves.all().order_by("date")
+        return Response(build_planned_incomes_payload(user))
 
-        return Response(
-            [
-                {
-                    "id": p.id,
-                    "date": p.date.strftime("%Y-%m-%d"),
-                    "category": p.category,
-                    "description": p.description,
-                    "amount": p.amount,
-                    "is_recurring": p.is_recurring,
-                }
-                for p in data
-            ]
-        )
+
+class PlannedReserveListView(APIView):
+    def get(self, request):
+        user = get_logged_user(request)
+        if not user:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        return Response(build_planned_reserves_payload(user))
 
 
 class VehicleListView(APIView):
@@ -1385,9 +2565,19 @@ class VehicleDetailView(APIView):
         vehicle.licensing_cost = request.data.get("licensing_cost") or 0
         vehicle.financing_remaining_installments = request.data.get("financing_remaining_installments") or 0
         vehicle.financing_installment_value = request.data.get("financing_installment_value") or 0
+        fuel = (vehicle.fuel_km_per_liter, vehicle.fuel_price_per_liter)
         vehicle.fuel_km_per_liter = request.data.get("fuel_km_per_liter") or 0
         vehicle.fuel_price_per_liter = request.data.get("fuel_price_per_liter") or 0
-        vehicle.save()
+        with transaction.atomic():
+            vehicle.save()
+            vehicle.refresh_from_db(fields=["fuel_km_per_liter", "fuel_price_per_liter"])
+            if (vehicle.fuel_km_per_liter, vehicle.fuel_price_per_liter) != fuel:
+                if not refresh_vehicle_trip_costs(vehicle):
+                    transaction.set_rollback(True)
+                    return Response(
+                        {"error": "Custo estimado de uma viagem do veiculo acima do limite"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
         return Response({"message": "Veiculo atualizado"}, status=status.HTTP_200_OK)
 
     def delete(self, request, vehicle_id):
@@ -1515,23 +2705,216 @@ def destination_occurrences_per_month(periodicity):
     return periodicity_map.get(str(periodicity or "").upper(), 1.0)
 
 
-def evaluate_trip_payload(user, payload):
-    today = timezone.now().date()
+TRIP_FORECAST_MONTHS = 6
+TRIP_FORECAST_MAX_MONTHS = 24
+
+
+def current_balance(user):
+    totals = defaultdict(float)
+    for row in user.entry_rollups.values("entry_type").annotate(total=Sum("total_amount")):
+        totals[row["entry_type"]] += float(row["total"] or 0)
+    return totals["RECEITA"] - totals["DESPESA"]
+
+
+def build_cash_flow_forecast(user, months=3, history_days=90, start_balance=None, today=None):
+    """Saldo projetado dia a dia de hoje ate `months` meses a frente.
+
+    Eventos datados (itens planejados, faturas de cartao) entram num array de
+    fluxos por dia; custos continuos (veiculos, gasto variavel do historico) num
+    array de diferencas de taxa diaria. O saldo sai de dois accumulate sobre os
+    arrays, sem laco em Python por dia.
+    """
+    today = today or timezone.now().date()
+    end = add_months(today, months) - timedelta(days=1)
+    days = (end - today).days + 1
+    if start_balance is None:
+        start_balance = current_balance(user)
+
+    flows = array("d", bytes(8 * days))
+    totals = defaultdict(float)
+    # o array e indexado pelo dia: nao precisa da intercalacao ordenada de merge_occurrences
+    for rule, item in planned_series(user, start=today, end=end):
+        amount = float(item["amount"] or 0)
+        kind = "card_bill" if str(item.get("source_key") or "").startswith("CC:") else item["kind"]
+        signed = amount if kind == "income" else -amount
+        for when in rule.dates(today, end):
+            # despesa ja paga so conta a partir do mes seguinte
+            if item.get("is_paid") and (when.year, when.month) == (today.year, today.month):
+                continue
+            flows[(when - today).days] += signed
+            totals[kind] += amount
+
+    # custo mensal dos veiculos em regime (mes seguinte: so recorrentes e custos fixos)
+    next_year, next_month = shift_month(today.year, today.month, 1)
+    vehicle_monthly = float(build_vehicle_summary_payload(user, next_month, next_year)["monthly_total"])
+
+    # gasto variavel = despesas lancadas no historico que nao vieram de itens planejados nem de veiculos
+    history_start = today - timedelta(days=history_days)
+    history_end = today - timedelta(days=1)
+    spent = float(
+        user.entries.filter(entry_type="DESPESA", date__range=(history_start, history_end)).aggregate(total=Sum("amount"))["total"]
+        or 0
+    )
+    planned_spent = sum(
+        float(item["amount"] or 0) * rule.count(history_start, history_end)
+        for rule, item in planned_series(user, ("expense",), history_start, history_end)
+    )
+    variable_daily = max(spent - planned_spent - vehicle_monthly * history_days / 30, 0) / history_days
+
+    rates = array("d", bytes(8 * (days + 1)))
+    rates[0] += variable_daily
+    segment_start = today
+    while segment_start <= end:
+        segment_end = min(segment_start.replace(day=calendar.monthrange(segment_start.year, segment_start.month)[1]), end)
+        daily = vehicle_monthly / calendar.monthrange(segment_start.year, segment_start.month)[1]
+        rates[(segment_start - today).days] += daily
+        rates[(segment_end - today).days + 1] -= daily
+        totals["vehicle"] += daily * ((segment_end - segment_start).days + 1)
+        segment_start = segment_end + timedelta(days=1)
+    totals["variable"] = variable_daily * days
+
+    daily_rates = itertools.accumulate(rates[:days])
+    balances = array("d", itertools.accumulate(map(operator.sub, flows, daily_rates), initial=start_balance))[1:]
+    return {
+        "start_date": today,
+        "end_date": end,
+        "start_balance": start_balance,
+        "balances": balances,
+        "totals": totals,
+        "vehicle_monthly_cost": vehicle_monthly,
+        "variable_daily_spend": variable_daily,
+    }
+
+
+def forecast_runway_days(balances, reserve=0.0):
+    # dias ate o saldo (menos `reserve`) ficar negativo; o horizonte inteiro se nunca ficar
+    return next((day for day, balance in enumerate(balances) if balance < reserve), len(balances))
+
+
+def serialize_cash_flow_forecast(forecast):
+    balances = forecast["balances"]
+    today = forecast["start_date"]
+    runway = forecast_runway_days(balances)
+    low_day = min(range(len(balances)), key=balances.__getitem__)
+    outflow = sum(value for kind, value in forecast["totals"].items() if kind != "income")
+    return {
+        "start_date": today.strftime("%Y-%m-%d"),
+        "end_date": forecast["end_date"].strftime("%Y-%m-%d"),
+        "start_balance": round(forecast["start_balance"], 2),
+        "end_balance": round(balances[-1], 2),
+        "min_balance": round(balances[low_day], 2),
+        "min_balance_date": (today + timedelta(days=low_day)).strftime("%Y-%m-%d"),
+        "first_negative_date": (today + timedelta(days=runway)).strftime("%Y-%m-%d") if runway < len(balances) else None,
+        "runway_days": runway if runway < len(balances) else None,
+        "burn_daily": round(outflow / len(balances), 2),
+        "vehicle_monthly_cost": round(forecast["vehicle_monthly_cost"], 2),
+        "variable_daily_spend": round(forecast["variable_daily_spend"], 2),
+        "totals": {kind: round(value, 2) for kind, value in sorted(forecast["totals"].items())},
+        "daily": [
+            {"date": (today + timedelta(days=day)).strftime("%Y-%m-%d"), "balance": round(balance, 2)}
+            for day, balance in enumerate(balances)
+        ],
+    }
+
+
+class CashFlowForecastView(APIView):
+    def get(self, request):
+        user = get_logged_user(request)
+        if not user:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            months = int(request.query_params.get("months", 3))
+            history_days = int(request.query_params.get("history_days", 90))
+        except ValueError:
+            return Response({"error": "months e history_days devem ser inteiros"}, status=status.HTTP_400_BAD_REQUEST)
+        months = max(1, min(months, 24))
+        history_days = max(7, min(history_days, 365))
+        forecast = build_cash_flow_forecast(user, months=months, history_days=history_days)
+        return Response(serialize_cash_flow_forecast(forecast))
+
+
+TRIP_BATCH_MAX_SCENARIOS = 50
+TRIP_RISK_ORDER = {"baixo": 0, "medio": 1, "alto": 2}
+
+
+class TripRunwayIndex:
+    """Runway de varios custos de viagem sobre a mesma projecao de caixa.
+
+    Para cada dia de partida guarda o minimo acumulado do saldo a partir dele
+    (sequencia monotona), entao cada cenario e um bisect em vez de uma nova
+    varredura do horizonte.
+    """
+
+    def __init__(self, balances):
+        self.balances = balances
+        self.first_negative = forecast_runway_days(balances)
+        self._minima = {}
+
+    def runway(self, cost, offset=0):
+        # o custo sai do caixa no dia `offset`; antes disso vale o saldo sem a viagem
+        if offset >= len(self.balances) or self.first_negative < offset:
+            return self.first_negative
+        minima = self._minima.get(offset)
+        if minima is None:
+            # minimo acumulado negado: nao decrescente, pronto para bisect
+            minima = array("d", (-value for value in itertools.accumulate(self.balances[offset:], min)))
+            self._minima[offset] = minima
+        return offset + bisect.bisect_right(minima, -cost)
+
+
+def trip_forecast_months(offset_days):
+    # horizonte de cada viagem: 6 meses, estendido ate a data dela (teto de 24).
+    # Depende so da propria viagem, entao a rota unica e o lote dao o mesmo resultado.
+    return max(TRIP_FORECAST_MONTHS, min(offset_days // 28 + 2, TRIP_FORECAST_MAX_MONTHS))
+
+
+def trip_runway_forecast(user, months, start_balance, today):
+    # runway pela projecao de caixa (compromissos futuros), nao pela media do mes corrente
+    forecast = build_cash_flow_forecast(user, months=months, start_balance=start_balance, today=today)
+    balances = forecast["balances"]
+    outflow = sum(value for kind, value in forecast["totals"].items() if kind != "income")
+    return {"burn_daily": outflow / len(balances), "runway": TripRunwayIndex(balances)}
+
+
+def trip_financial_baseline(user, months=TRIP_FORECAST_MONTHS, today=None):
+    """Numeros do usuario que nao dependem da viagem: calculados uma vez por requisicao."""
+    today = today or timezone.now().date()
     month = today.month
     year = today.year
-    month_entries = user.entries.filter(date__year=year, date__month=month)
-    total_receita_mes = float(month_entries.filter(entry_type="RECEITA").aggregate(total=Sum("amount"))["total"] or 0)
-    total_despesa_mes = float(month_entries.filter(entry_type="DESPESA").aggregate(total=Sum("amount"))["total"] or 0)
-    total_receita_all = float(user.entries.filter(entry_type="RECEITA").aggregate(total=Sum("amount"))["total"] or 0)
-    total_despesa_all = float(user.entries.filter(entry_type="DESPESA").aggregate(total=Sum("amount"))["total"] or 0)
-    saldo_atual = total_receita_all - total_despesa_all
-    recurring_fixed = float(user.planned_expenses.filter(is_recurring=True).aggregate(total=Sum("amount"))["total"] or 0)
+    month_totals = defaultdict(float)
+    all_totals = defaultdict(float)
+    for row in user.entry_rollups.values("year", "month", "entry_type").annotate(total=Sum("total_amount")):
+        all_totals[row["entry_type"]] += float(row["total"] or 0)
+        if row["year"] == year and row["month"] == month:
+            month_totals[row["entry_type"]] += float(row["total"] or 0)
+    saldo_atual = all_totals["RECEITA"] - all_totals["DESPESA"]
+    # despesas recorrentes expandidas no mes corrente (series semanais contam cada ocorrencia)
+    recurring_fixed = float(planned_projection(user, year, month, 1)[0]["recurring_expense"])
+    return {
+        "today": today,
+        "months": months,
+        "monthly_income": month_totals["RECEITA"],
+        "monthly_expense": month_totals["DESPESA"],
+        "current_balance": saldo_atual,
+        "recurring_fixed": recurring_fixed,
+        **trip_runway_forecast(user, months, saldo_atual, today),
+    }
+
+
+def trip_offset_days(baseline, value):
+    # dias entre hoje e a data da viagem; sem data (ou no passado) o custo sai hoje.
+    # ValueError para qualquer outra coisa que nao seja data ou texto AAAA-MM-DD
+    if value is None or value == "":
+        return 0
+    try:
+        value = parse_date_value(value[:10] if isinstance(value, str) else value)
+    except (ValidationError, TypeError):
+        raise ValueError(value)
+    return max((value - baseline["today"]).days, 0)
 
-    vehicle_id = payload.get("vehicle_id")
-    vehicle = user.vehicles.filter(id=vehicle_id).first()
-    if not vehicle:
-        return {"error": "Veiculo nao encontrado"}
 
+def evaluate_trip_scenario(baseline, vehicle, payload):
     distance_km = float(payload.get("distance_km") or 0)
     lodging_cost = float(payload.get("lodging_cost") or 0)
     meal_cost = float(payload.get("meal_cost") or 0)
@@ -1546,9 +2929,11 @@ def evaluate_trip_payload(user, payload):
     fuel_cost = (distance_km / km_per_liter) * fuel_price if km_per_liter > 0 else 0.0
 
     total_trip_cost = fuel_cost + toll_total + lodging_cost + meal_cost + extra_cost
-    burn_daily = total_despesa_mes / max(today.day, 1)
-    runway_before = saldo_atual / burn_daily if burn_daily > 0 else 0
-    runway_after = (saldo_atual - total_trip_cost) / burn_daily if burn_daily > 0 else 0
+    saldo_atual = baseline["current_balance"]
+    total_receita_mes = baseline["monthly_income"]
+    runway = baseline["runway"]
+    runway_before = runway.first_negative
+    runway_after = runway.runway(total_trip_cost, trip_offset_days(baseline, payload.get("date")))
     commitment_pct_balance = (total_trip_cost / saldo_atual * 100) if saldo_atual > 0 else 999
     commitment_pct_income = (total_trip_cost / total_receita_mes * 100) if total_receita_mes > 0 else 999
 
@@ -1579,10 +2964,10 @@ def evaluate_trip_payload(user, payload):
         "extra_cost": round(extra_cost, 2),
         "trip_total_cost": round(total_trip_cost, 2),
         "monthly_income": round(total_receita_mes, 2),
-        "monthly_expense": round(total_despesa_mes, 2),
+        "monthly_expense": round(baseline["monthly_expense"], 2),
         "current_balance": round(saldo_atual, 2),
-        "recurring_fixed": round(recurring_fixed, 2),
-        "burn_daily": round(burn_daily, 2),
+        "recurring_fixed": round(baseline["recurring_fixed"], 2),
+        "burn_daily": round(baseline["burn_daily"], 2),
         "runway_days_before": round(runway_before, 1),
         "runway_days_after": round(runway_after, 1),
         "commitment_pct_balance": round(commitment_pct_balance, 2),
@@ -1593,6 +2978,91 @@ def evaluate_trip_payload(user, payload):
     }
 
 
+def evaluate_trip_payload(user, payload):
+    vehicle_id = payload.get("vehicle_id")
+    vehicle = user.vehicles.filter(id=vehicle_id).first()
+    if not vehicle:
+        return {"error": "Veiculo nao encontrado"}
+    today = timezone.now().date()
+    try:
+        offset = trip_offset_days({"today": today}, payload.get("date"))
+    except ValueError:
+        return {"error": "date invalida"}
+    baseline = trip_financial_baseline(user, months=trip_forecast_months(offset), today=today)
+    return evaluate_trip_scenario(baseline, vehicle, payload)
+
+
+def evaluate_trip_batch(user, scenarios):
+    """Avalia varios cenarios com a mesma linha de base, do menor para o maior risco."""
+    baseline = trip_financial_baseline(user)
+    # uma projecao por horizonte distinto; o resto da linha de base e compartilhado
+    baselines = {baseline["months"]: baseline}
+    horizons = {}
+    for index, payload in enumerate(scenarios):
+        try:
+            months = trip_forecast_months(trip_offset_days(baseline, payload.get("date")))
+        except ValueError:
+            continue
+        horizons[index] = months
+        if months not in baselines:
+            baselines[months] = {
+                **baseline,
+                "months": months,
+                **trip_runway_forecast(user, months, baseline["current_balance"], baseline["today"]),
+            }
+
+    vehicle_ids = set()
+    for payload in scenarios:
+        try:
+            vehicle_ids.add(int(payload.get("vehicle_id")))
+        except (TypeError, ValueError):
+            continue
+    vehicles = user.vehicles.in_bulk(vehicle_ids)
+
+    results = []
+    for index, payload in enumerate(scenarios):
+        try:
+            vehicle = vehicles.get(int(payload.get("vehicle_id")))
+        except (TypeError, ValueError):
+            vehicle = None
+        if vehicle is None:
+            results.append({"index": index, "label": payload.get("label"), "error": "Veiculo nao encontrado"})
+            continue
+        if index not in horizons:
+            results.append({"index": index, "label": payload.get("label"), "error": "date invalida"})
+            continue
+        try:
+            analysis = evaluate_trip_scenario(baselines[horizons[index]], vehicle, payload)
+        except (TypeError, ValueError, AttributeError):
+            results.append({"index": index, "label": payload.get("label"), "error": "Cenario invalido"})
+            continue
+        results.append({"index": index, "label": payload.get("label"), **analysis})
+
+    # erros por ultimo; entre os validos: nivel de risco, comprometimento do saldo, runway
+    results.sort(
+        key=lambda item: (
+            "error" in item,
+            TRIP_RISK_ORDER.get(item.get("risk_level"), 3),
+            item.get("commitment_pct_balance", 0),
+            -item.get("runway_days_after", 0),
+            item["index"],
+        )
+    )
+    for rank, item in enumerate(results, start=1):
+        item["rank"] = rank
+    return {
+        "baseline": {
+            "monthly_income": round(baseline["monthly_income"], 2),
+            "monthly_expense": round(baseline["monthly_expense"], 2),
+            "current_balance": round(baseline["current_balance"], 2),
+            "recurring_fixed": round(baseline["recurring_fixed"], 2),
+            "burn_daily": round(baseline["burn_daily"], 2),
+            "runway_days": baseline["runway"].first_negative,
+        },
+        "scenarios": results,
+    }
+
+
 class VehicleDestinationListView(APIView):
     def get(self, request):
         user = get_logged_user(request)
@@ -1699,29 +3169,212 @@ class VehicleDestinationDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+TRIP_AMOUNT_FIELDS = ("distance_km", "lodging_cost", "meal_cost", "extra_cost")
+CENTS = Decimal("0.01")
+
+
+def parse_trip_decimal(value, field):
+    """Valor monetario validado contra o campo do modelo (finito e dentro de max_digits)."""
+    try:
+        amount = Decimal(str(value or 0))
+        if not amount.is_finite() or amount.adjusted() >= field.max_digits - field.decimal_places:
+            raise ValueError(value)
+        amount = amount.quantize(CENTS)
+    except InvalidOperation:
+        raise ValueError(value)
+    # o arredondamento pode levar 99999999.999 para 100000000.00
+    if not fits_decimal_field(amount, field):
+        raise ValueError(value)
+    return amount
+
+
+def fits_decimal_field(value, field):
+    return value.adjusted() < field.max_digits - field.decimal_places
+
+
+def parse_trip_amounts(data):
+    values = {}
+    for name in TRIP_AMOUNT_FIELDS:
+        try:
+            values[name] = parse_trip_decimal(data.get(name), TripPlan._meta.get_field(name))
+        except ValueError:
+            return None, f"{name} invalido"
+    return values, None
+
+
+def parse_trip_tolls(items):
+    field = TripToll._meta.get_field("amount")
+    tolls = []
+    for item in items or []:
+        item = item or {}
+        try:
+            amount = parse_trip_decimal(item.get("amount"), field)
+        except ValueError:
+            return None, "amount do pedagio invalido"
+        tolls.append({"id": item.get("id"), "name": str(item.get("name", "")).strip()[:120], "amount": amount})
+    return tolls, None
+
+
+def apply_trip_costs(trip, vehicle, toll_total):
+    # mesma conta de evaluate_trip_scenario, guardada para a listagem
+    km_per_liter = Decimal(str(vehicle.fuel_km_per_liter or 0))
+    fuel_price = Decimal(str(vehicle.fuel_price_per_liter or 0))
+    fuel_cost = Decimal(str(trip.distance_km or 0)) / km_per_liter * fuel_price if km_per_liter > 0 else Decimal("0")
+    trip.toll_total = Decimal(str(toll_total)).quantize(CENTS)
+    trip.estimated_cost = (
+        fuel_cost
+        + trip.toll_total
+        + Decimal(str(trip.lodging_cost or 0))
+        + Decimal(str(trip.meal_cost or 0))
+        + Decimal(str(trip.extra_cost or 0))
+    ).quantize(CENTS)
+
+
+def sync_trip_tolls(trip, tolls):
+    """Aplica a lista de pedagios reaproveitando as linhas que ja existem.
+
+    Casa primeiro por id, depois por (nome, valor) e o que sobrar por posicao;
+    so as linhas alteradas sao atualizadas e o excedente e criado ou apagado
+    em lote.
+    """
+    existing = {toll.id: toll for toll in trip.tolls.order_by("id")}
+    pending = []
+    pairs = []
+    for item in tolls:
+        toll = existing.pop(item["id"], None) if isinstance(item["id"], int) else None
+        if toll is None:
+            pending.append(item)
+        else:
+            pairs.append((toll, item))
+
+    by_content = defaultdict(list)
+    for toll in existing.values():
+        by_content[(toll.name, toll.amount)].append(toll)
+    unmatched = []
+    for item in pending:
+        same = by_content.get((item["name"], item["amount"]))
+        if same:
+            toll = same.pop(0)
+            existing.pop(toll.id)
+            pairs.append((toll, item))
+        else:
+            unmatched.append(item)
+
+    leftovers = list(existing.values())
+    pairs.extend(zip(leftovers, unmatched))
+    reused = min(len(leftovers), len(unmatched))
+
+    changed = []
+    for toll, item in pairs:
+        if toll.name != item["name"] or toll.amount != item["amount"]:
+            toll.name, toll.amount = item["name"], item["amount"]
+            changed.append(toll)
+    if changed:
+        TripToll.objects.bulk_update(changed, ["name", "amount"])
+    if len(unmatched) > reused:
+        TripToll.objects.bulk_create(
+            [TripToll(trip=trip, name=item["name"], amount=item["amount"]) for item in unmatched[reused:]]
+        )
+    if len(leftovers) > reused:
+        TripToll.objects.filter(id__in=[toll.id for toll in leftovers[reused:]]).delete()
+
+
+def trip_totals_fit(trip):
+    return all(
+        fits_decimal_field(getattr(trip, name), TripPlan._meta.get_field(name)) for name in ("toll_total", "estimated_cost")
+    )
+
+
+def refresh_trip_totals(trip):
+    # caminho do admin: os pedagios foram salvos pelo inline, reagrega uma vez
+    toll_total = trip.tolls.aggregate(total=Sum("amount"))["total"] or 0
+    apply_trip_costs(trip, trip.vehicle, toll_total)
+    trip.save(update_fields=["toll_total", "estimated_cost"])
+
+
+def refresh_vehicle_trip_costs(vehicle):
+    # consumo ou preco do combustivel mudou: recalcula o custo estimado das viagens do veiculo.
+    # Devolve False sem gravar nada se algum custo novo nao cabe na coluna.
+    trips = list(vehicle.trip_plans.only(*TRIP_AMOUNT_FIELDS, "toll_total", "estimated_cost"))
+    for trip in trips:
+        apply_trip_costs(trip, vehicle, trip.toll_total)
+        if not trip_totals_fit(trip):
+            return False
+    TripPlan.objects.bulk_update(trips, ["estimated_cost"], batch_size=500)
+    return True
+
+
+def trip_analysis_payload(trip, tolls):
+    return {
+        "vehicle_id": trip.vehicle_id,
+        "date": trip.date,
+        "distance_km": trip.distance_km,
+        "lodging_cost": trip.lodging_cost,
+        "meal_cost": trip.meal_cost,
+        "extra_cost": trip.extra_cost,
+        "tolls": [{"name": item["name"], "amount": float(item["amount"])} for item in tolls],
+    }
+
+
+def encode_trip_cursor(trip):
+    raw = f"{trip.created_at.isoformat()}|{trip.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_trip_cursor(value):
+    padded = value + "=" * (-len(value) % 4)
+    try:
+        raw_created, raw_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(raw_created), int(raw_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(value)
+
+
+def serialize_trip(t):
+    return {
+        "id": t.id,
+        "vehicle_id": t.vehicle_id,
+        "vehicle_name": t.vehicle.name,
+        "title": t.title,
+        "date": t.date.strftime("%Y-%m-%d") if t.date else None,
+        "distance_km": t.distance_km,
+        "lodging_cost": t.lodging_cost,
+        "meal_cost": t.meal_cost,
+        "extra_cost": t.extra_cost,
+        "toll_total": t.toll_total,
+        "estimated_cost": t.estimated_cost,
+        "tolls": [{"id": x.id, "name": x.name, "amount": x.amount} for x in t.tolls.all()],
+    }
+
+
 class TripPlanListView(APIView):
     def get(self, request):
         user = get_logged_user(request)
         if not user:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
-        data = user.trip_plans.select_related("vehicle").all().order_by("-created_at")
-        return Response(
-            [
-                {
-                    "id": t.id,
-                    "vehicle_id": t.vehicle_id,
-                    "vehicle_name": t.vehicle.name,
-                    "title": t.title,
-                    "date": t.date.strftime("%Y-%m-%d") if t.date else None,
-                    "distance_km": t.distance_km,
-                    "lodging_cost": t.lodging_cost,
-                    "meal_cost": t.meal_cost,
-                    "extra_cost": t.extra_cost,
-                    "tolls": [{"id": x.id, "name": x.name, "amount": x.amount} for x in t.tolls.all()],
-                }
-                for t in data
-            ]
+        params = request.query_params
+        qs = (
+            user.trip_plans.select_related("vehicle")
+            .prefetch_related(Prefetch("tolls", queryset=TripToll.objects.order_by("id")))
+            .order_by("-created_at", "-id")
         )
+        cursor = (params.get("cursor") or "").strip()
+        if cursor:
+            try:
+                cursor_created, cursor_id = decode_trip_cursor(cursor)
+            except ValueError:
+                return Response({"error": "cursor invalido"}, status=status.HTTP_400_BAD_REQUEST)
+            qs = qs.filter(Q(created_at__lt=cursor_created) | Q(created_at=cursor_created, id__lt=cursor_id))
+
+        limit = parse_entries_limit(params, default=100)
+        page = list(qs[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        response = Response([serialize_trip(t) for t in page])
+        if has_more:
+            response["X-Next-Cursor"] = encode_trip_cursor(page[-1])
+        return response
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -1737,34 +3390,26 @@ class TripPlanCreateView(APIView):
         except Vehicle.DoesNotExist:
             return Response({"error": "Veiculo nao encontrado"}, status=status.HTTP_404_NOT_FOUND)
 
-        trip = TripPlan.objects.create(
+        amounts, error = parse_trip_amounts(request.data)
+        if error is None:
+            tolls, error = parse_trip_tolls(request.data.get("tolls"))
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        trip = TripPlan(
             user=user,
             vehicle=vehicle,
             title=str(request.data.get("title", "")).strip(),
             date=request.data.get("date") or None,
-            distance_km=request.data.get("distance_km") or 0,
-            lodging_cost=request.data.get("lodging_cost") or 0,
-            meal_cost=request.data.get("meal_cost") or 0,
-            extra_cost=request.data.get("extra_cost") or 0,
-        )
-        tolls = request.data.get("tolls") or []
-        for item in tolls:
-            TripToll.objects.create(
-                trip=trip,
-                name=str((item or {}).get("name", "")).strip(),
-                amount=(item or {}).get("amount") or 0,
-            )
-        analysis = evaluate_trip_payload(
-            user,
-            {
-                "vehicle_id": vehicle_id,
-                "distance_km": trip.distance_km,
-                "lodging_cost": trip.lodging_cost,
-                "meal_cost": trip.meal_cost,
-                "extra_cost": trip.extra_cost,
-                "tolls": tolls,
-            },
+            **amounts,
         )
+        apply_trip_costs(trip, vehicle, sum((item["amount"] for item in tolls), Decimal("0")))
+        if not trip_totals_fit(trip):
+            return Response({"error": "Custo estimado acima do limite"}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            trip.save()
+            TripToll.objects.bulk_create([TripToll(trip=trip, name=item["name"], amount=item["amount"]) for item in tolls])
+        analysis = evaluate_trip_payload(user, trip_analysis_payload(trip, tolls))
         return Response({"message": "Viagem criada", "id": trip.id, "analysis": analysis}, status=status.HTTP_201_CREATED)
 
 
@@ -1785,34 +3430,34 @@ class TripPlanDetailView(APIView):
         except Vehicle.DoesNotExist:
             return Response({"error": "Veiculo nao encontrado"}, status=status.HTTP_404_NOT_FOUND)
 
+        amounts, error = parse_trip_amounts(request.data)
+        tolls = None
+        if error is None and "tolls" in request.data:
+            tolls, error = parse_trip_tolls(request.data.get("tolls"))
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
         trip.title = str(request.data.get("title", trip.title)).strip()
         trip.date = request.data.get("date") or None
-        trip.distance_km = request.data.get("distance_km") or 0
-        trip.lodging_cost = request.data.get("lodging_cost") or 0
-        trip.meal_cost = request.data.get("meal_cost") or 0
-        trip.extra_cost = request.data.get("extra_cost") or 0
-        trip.save()
-
-        if "tolls" in request.data:
-            trip.tolls.all().delete()
-            for item in request.data.get("tolls") or []:
-                TripToll.objects.create(
-                    trip=trip,
-                    name=str((item or {}).get("name", "")).strip(),
-                    amount=(item or {}).get("amount") or 0,
-                )
+        for field, value in amounts.items():
+            setattr(trip, field, value)
 
-        analysis = evaluate_trip_payload(
-            user,
-            {
-                "vehicle_id": trip.vehicle_id,
-                "distance_km": trip.distance_km,
-                "lodging_cost": trip.lodging_cost,
-                "meal_cost": trip.meal_cost,
-                "extra_cost": trip.extra_cost,
-                "tolls": [{"name": x.name, "amount": float(x.amount or 0)} for x in trip.tolls.all()],
-            },
-        )
+        if tolls is None:
+            toll_total = trip.toll_total
+        else:
+            toll_total = sum((item["amount"] for item in tolls), Decimal("0"))
+        apply_trip_costs(trip, trip.vehicle, toll_total)
+        if not trip_totals_fit(trip):
+            return Response({"error": "Custo estimado acima do limite"}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            if tolls is None:
+                tolls = [{"name": x.name, "amount": x.amount} for x in trip.tolls.order_by("id")]
+            else:
+                sync_trip_tolls(trip, tolls)
+            trip.save()
+
+        analysis = evaluate_trip_payload(user, trip_analysis_payload(trip, tolls))
         return Response({"message": "Viagem atualizada", "analysis": analysis}, status=status.HTTP_200_OK)
 
     def delete(self, request, trip_id):
@@ -1839,112 +3484,163 @@ class TripEvaluateView(APIView):
         return Response(analysis)
 
 
-class VehicleSummaryView(APIView):
-    def get(self, request):
+@method_decorator(csrf_exempt, name="dispatch")
+class TripEvaluateBatchView(APIView):
+    def post(self, request):
         user = get_logged_user(request)
         if not user:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
-
-        today = timezone.now().date()
-        try:
-            month = int(request.query_params.get("month", today.month))
-        except ValueError:
-            month = today.month
-        try:
-            year = int(request.query_params.get("year", today.year))
-        except ValueError:
-            year = today.year
-
-        vehicles = list(user.vehicles.all())
-        recurring_expenses = user.vehicle_expenses.filter(is_recurring=True)
-        month_expenses = user.vehicle_expenses.filter(date__year=year, date__month=month, is_recurring=False)
-
-        by_category = {
-            "COMBUSTIVEL": 0,
-            "MANUTENCAO": 0,
-            "SEGURO": 0,
-            "PEDAGIO": 0,
-            "ESTACIONAMENTO": 0,
-            "OUTRO": 0,
-            "DESLOCAMENTO": 0,
-            "DOCUMENTACAO": 0,
-            "IPVA": 0,
-            "LICENCIAMENTO": 0,
-            "FINANCIAMENTO": 0,
-        }
-
-        vehicle_totals = []
-        monthly_total = 0
-        for v in vehicles:
-            base_doc = float(v.documentation_cost or 0) / 12
-            base_ipva = float(v.ipva_cost or 0) / 12
-            base_lic = float(v.licensing_cost or 0) / 12
-            financing = float(v.financing_installment_value or 0) if int(v.financing_remaining_installments or 0) > 0 else 0
-
-            recurrent_total = sum(float(e.amount or 0) for e in recurring_expenses.filter(vehicle=v))
-            month_total = sum(float(e.amount or 0) for e in month_expenses.filter(vehicle=v))
-            destinations = user.vehicle_destinations.filter(vehicle=v)
-            monthly_km = 0.0
-            monthly_parking = 0.0
-            for d in destinations:
-                occ = destination_occurrences_per_month(d.periodicity)
-                monthly_km += float(d.distance_km or 0) * occ
-                if d.has_paid_parking:
-                    monthly_parking += float(d.parking_cost or 0) * occ
-            fuel_km_per_liter = float(v.fuel_km_per_liter or 0)
-            fuel_price_per_liter = float(v.fuel_price_per_liter or 0)
-            commute_fuel_cost = (monthly_km / fuel_km_per_liter) * fuel_price_per_liter if fuel_km_per_liter > 0 else 0.0
-            commute_monthly_cost = commute_fuel_cost + monthly_parking
-
-            vehicle_monthly_total = base_doc + base_ipva + base_lic + financing + recurrent_total + month_total + commute_monthly_cost
-            monthly_total += vehicle_monthly_total
-
-            by_category["DOCUMENTACAO"] += base_doc
-            by_category["IPVA"] += base_ipva
-            by_category["LICENCIAMENTO"] += base_lic
-            by_category["FINANCIAMENTO"] += financing
-            by_category["DESLOCAMENTO"] += commute_monthly_cost
-            for e in recurring_expenses.filter(vehicle=v):
-                by_category[e.expense_type] += float(e.amount or 0)
-            for e in month_expenses.filter(vehicle=v):
-                by_category[e.expense_type] += float(e.amount or 0)
-
-            vehicle_totals.append(
-                {
-                    "vehicle_id": v.id,
-                    "name": v.name,
-                    "monthly_cost": round(vehicle_monthly_total, 2),
-                    "commute_monthly_cost": round(commute_monthly_cost, 2),
-                    "commute_fuel_cost": round(commute_fuel_cost, 2),
-                    "commute_parking_cost": round(monthly_parking, 2),
-                    "monthly_km": round(monthly_km, 2),
-                    "fipe_value": float(v.fipe_value or 0),
-                    "fipe_variation_percent": float(v.fipe_variation_percent or 0),
-                    "financing_remaining_installments": int(v.financing_remaining_installments or 0),
-                }
+        scenarios = request.data.get("scenarios")
+        if not isinstance(scenarios, list) or not scenarios:
+            return Response({"error": "Informe scenarios como lista"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(scenarios) > TRIP_BATCH_MAX_SCENARIOS:
+            return Response(
+                {"error": f"Maximo de {TRIP_BATCH_MAX_SCENARIOS} cenarios por requisicao"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
+        if not all(isinstance(item, dict) for item in scenarios):
+            return Response({"error": "Cada cenario deve ser um objeto"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(evaluate_trip_batch(user, scenarios))
 
-        category_rows = [
-            {"category": k, "total": round(val, 2)}
-            for k, val in by_category.items()
-            if val > 0
-        ]
-        category_rows.sort(key=lambda x: x["total"], reverse=True)
-        vehicle_totals.sort(key=lambda x: x["monthly_cost"], reverse=True)
-        commute_total = sum(v["commute_monthly_cost"] for v in vehicle_totals)
 
-        return Response(
+def parse_month_year(params):
+    today = timezone.now().date()
+    try:
+        month = int(params.get("month", today.month))
+    except ValueError:
+        month = today.month
+    try:
+        year = int(params.get("year", today.year))
+    except ValueError:
+        year = today.year
+    return month, year
+
+
+def build_vehicle_summary_payload(user, month, year):
+    vehicles = list(user.vehicles.prefetch_related("frequent_destinations"))
+    expense_rows = (
+        user.vehicle_expenses.filter(
+            Q(is_recurring=True)
+            | (month_range_q(year, month) & Q(is_recurring=False))
+        )
+        .values("vehicle_id", "expense_type")
+        .annotate(total=Sum("amount"))
+    )
+    expenses_by_vehicle = defaultdict(list)
+    for row in expense_rows:
+        expenses_by_vehicle[row["vehicle_id"]].append((row["expense_type"], float(row["total"] or 0)))
+
+    by_category = {
+        "COMBUSTIVEL": 0,
+        "MANUTENCAO": 0,
+        "SEGURO": 0,
+        "PEDAGIO": 0,
+        "ESTACIONAMENTO": 0,
+        "OUTRO": 0,
+        "DESLOCAMENTO": 0,
+        "DOCUMENTACAO": 0,
+        "IPVA": 0,
+        "LICENCIAMENTO": 0,
+        "FINANCIAMENTO": 0,
+    }
+
+    vehicle_totals = []
+    monthly_total = 0
+    for v in vehicles:
+        base_doc = float(v.documentation_cost or 0) / 12
+        base_ipva = float(v.ipva_cost or 0) / 12
+        base_lic = float(v.licensing_cost or 0) / 12
+        financing = float(v.financing_installment_value or 0) if int(v.financing_remaining_installments or 0) > 0 else 0
+
+        expense_total = sum(total for _, total in expenses_by_vehicle[v.id])
+        monthly_km = 0.0
+        monthly_parking = 0.0
+        for d in v.frequent_destinations.all():
+            occ = destination_occurrences_per_month(d.periodicity)
+            monthly_km += float(d.distance_km or 0) * occ
+            if d.has_paid_parking:
+                monthly_parking += float(d.parking_cost or 0) * occ
+        fuel_km_per_liter = float(v.fuel_km_per_liter or 0)
+        fuel_price_per_liter = float(v.fuel_price_per_liter or 0)
+        commute_fuel_cost = (monthly_km / fuel_km_per_liter) * fuel_price_per_liter if fuel_km_per_liter > 0 else 0.0
+        commute_monthly_cost = commute_fuel_cost + monthly_parking
+
+        vehicle_monthly_total = base_doc + base_ipva + base_lic + financing + expense_total + commute_monthly_cost
+        monthly_total += vehicle_monthly_total
+
+        by_category["DOCUMENTACAO"] += base_doc
+        by_category["IPVA"] += base_ipva
+        by_category["LICENCIAMENTO"] += base_lic
+        by_category["FINANCIAMENTO"] += financing
+        by_category["DESLOCAMENTO"] += commute_monthly_cost
+        for expense_type, total in expenses_by_vehicle[v.id]:
+            by_category[expense_type] = by_category.get(expense_type, 0) + total
+
+        vehicle_totals.append(
             {
-                "month": month,
-                "year": year,
-                "monthly_total": round(monthly_total, 2),
-                "commute_monthly_cost": round(commute_total, 2),
-                "vehicle_count": len(vehicles),
-                "by_category": category_rows,
-                "vehicle_totals": vehicle_totals,
+                "vehicle_id": v.id,
+                "name": v.name,
+                "monthly_cost": round(vehicle_monthly_total, 2),
+                "commute_monthly_cost": round(commute_monthly_cost, 2),
+                "commute_fuel_cost": round(commute_fuel_cost, 2),
+                "commute_parking_cost": round(monthly_parking, 2),
+                "monthly_km": round(monthly_km, 2),
+                "fipe_value": float(v.fipe_value or 0),
+                "fipe_variation_percent": float(v.fipe_variation_percent or 0),
+                "financing_remaining_installments": int(v.financing_remaining_installments or 0),
             }
         )
 
+    category_rows = [
+        {"category": k, "total": round(val, 2)}
+        for k, val in by_category.items()
+        if val > 0
+    ]
+    category_rows.sort(key=lambda x: x["total"], reverse=True)
+    vehicle_totals.sort(key=lambda x: x["monthly_cost"], reverse=True)
+    commute_total = sum(v["commute_monthly_cost"] for v in vehicle_totals)
+
+    return {
+        "month": month,
+        "year": year,
+        "monthly_total": round(monthly_total, 2),
+        "commute_monthly_cost": round(commute_total, 2),
+        "vehicle_count": len(vehicles),
+        "by_category": category_rows,
+        "vehicle_totals": vehicle_totals,
+    }
+
+
+class VehicleSummaryView(APIView):
+    def get(self, request):
+        user = get_logged_user(request)
+        if not user:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        month, year = parse_month_year(request.query_params)
+        return Response(build_vehicle_summary_payload(user, month, year))
+
+
+def build_credit_cards_payload(user):
+    cards = list(user.credit_cards.select_related("parent_card").all().order_by("-created_at"))
+    cards_by_id = {c.id: c for c in cards}
+    return [
+        {
+            "id": c.id,
+            "nickname": c.nickname,
+            "last4": c.last4,
+            "parent_card_id": c.parent_card_id,
+            "parent_card_last4": c.parent_card.last4 if c.parent_card else None,
+            "closing_day": c.closing_day,
+            "due_day": c.due_day,
+            "best_purchase_day": c.best_purchase_day,
+            "limit_amount": c.limit_amount,
+            "miles_per_point": c.miles_per_point,
+            "billing_owner_id": get_owner_id_for_card(c, cards_by_id),
+        }
+        for c in cards
+    ]
+
 
 class CreditCardListView(APIView):
     def get(self, request):
@@ -1952,26 +3648,7 @@ class CreditCardListView(APIView):
         if not user:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-        cards = list(user.credit_cards.select_related("parent_card").all().order_by("-created_at"))
-        cards_by_id = {c.id: c for c in cards}
-        return Response(
-            [
-                {
-                    "id": c.id,
-                    "nickname": c.nickname,
-                    "last4": c.last4,
-                    "parent_card_id": c.parent_card_id,
-                    "parent_card_last4": c.parent_card.last4 if c.parent_card else None,
-                    "closing_day": c.closing_day,
-                    "due_day": c.due_day,
-                    "best_purchase_day": c.best_purchase_day,
-                    "limit_amount": c.limit_amount,
-                    "miles_per_point": c.miles_per_point,
-                    "billing_owner_id": get_owner_id_for_card(c, cards_by_id),
-                }
-                for c in cards
-            ]
-        )
+        return Response(build_credit_cards_payload(user))
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -2015,6 +3692,7 @@ class CreditCardCreateView(APIView):
             limit_amount=request.data.get("limit_amount") or 0,
             miles_per_point=request.data.get("miles_per_point") or 1,
         )
+        refresh_billing_owners(user)
         return Response({"message": "Cartão criado", "id": card.id}, status=status.HTTP_201_CREATED)
 
 
@@ -2054,15 +3732,11 @@ class CreditCardDetailView(APIView):
             if new_parent.id == card.id:
                 return Response({"error": "Um cartão não pode herdar de si mesmo"}, status=status.HTTP_400_BAD_REQUEST)
 
-            walk = new_parent
-            seen = set()
-            while walk and walk.parent_card_id and walk.id not in seen:
-                if walk.parent_card_id == card.id:
-                    return Response({"error": "Relação inválida de herança entre cartões"}, status=status.HTTP_400_BAD_REQUEST)
-                seen.add(walk.id)
-                walk = walk.parent_card
+            parent_by_id = dict(user.credit_cards.values_list("id", "parent_card_id"))
+            if is_card_ancestor(parent_by_id, card.id, new_parent.id):
+                return Response({"error": "Relação inválida de herança entre cartões"}, status=status.HTTP_400_BAD_REQUEST)
 
-        old_owner = resolve_billing_owner(card)
+        old_owner_id = card.billing_owner_id or refresh_billing_owners(user)[card.id]
         card.nickname = str(request.data.get("nickname", card.nickname)).strip()
         card.last4 = last4
         card.parent_card = new_parent
@@ -2072,9 +3746,12 @@ class CreditCardDetailView(APIView):
         card.limit_amount = request.data.get("limit_amount") or 0
         card.miles_per_point = request.data.get("miles_per_point") or 1
         card.save()
+        card.billing_owner_id = refresh_billing_owners(user)[card.id]
         sync_credit_card_bills(user, card)
-        if old_owner and old_owner.id != (resolve_billing_owner(card).id if resolve_billing_owner(card) else card.id):
-            sync_credit_card_bills(user, old_owner)
+        if old_owner_id != card.billing_owner_id:
+            old_owner = user.credit_cards.filter(id=old_owner_id).first()
+            if old_owner:
+                sync_credit_card_bills(user, old_owner)
         return Response({"message": "Cartão atualizado"}, status=status.HTTP_200_OK)
 
     def delete(self, request, card_id):
@@ -2086,44 +3763,49 @@ class CreditCardDetailView(APIView):
         except CreditCard.DoesNotExist:
             return Response({"error": "Cartão não encontrado"}, status=status.HTTP_404_NOT_FOUND)
 
-        old_owner = resolve_billing_owner(card)
-        child_ids = list(user.credit_cards.filter(parent_card=card).values_list("id", flat=True))
-        user.planned_expenses.filter(source_key__startswith=f"CC:{card.id}:").delete()
+        deleted_id = card.id
+        owner_id = card.billing_owner_id or refresh_billing_owners(user)[deleted_id]
+        family_ids = list(
+            user.credit_cards.filter(billing_owner_id=owner_id)
+            .exclude(id=deleted_id)
+            .values_list("id", flat=True)
+        )
+        user.planned_expenses.filter(source_key__startswith=f"CC:{deleted_id}:").delete()
         card.delete()
-        if old_owner and old_owner.id != card.id:
-            sync_credit_card_bills(user, old_owner)
-        for child_id in child_ids:
-            child = user.credit_cards.filter(id=child_id).first()
-            if child:
-                sync_credit_card_bills(user, child)
+        invalidate_planned_projection(user.id)
+        # filhos perdem o parent_card (SET_NULL): a familia antiga pode virar varias
+        owners = refresh_billing_owners(user)
+        for owner in user.credit_cards.filter(id__in={owners[card_id] for card_id in family_ids}):
+            sync_credit_card_bills(user, owner)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def build_credit_card_expenses_payload(user, card_id=None):
+    data = user.credit_card_expenses.select_related("card").all().order_by("-date", "-id")
+    if card_id:
+        data = data.filter(card_id=card_id)
+    return [
+        {
+            "id": e.id,
+            "card_id": e.card_id,
+            "card_last4": e.card.last4,
+            "card_name": e.card.nickname or f"****{e.card.last4}",
+            "date": e.date.strftime("%Y-%m-%d"),
+            "category": e.category,
+            "description": e.description,
+            "amount": e.amount,
+        }
+        for e in data
+    ]
+
+
 class CreditCardExpenseListView(APIView):
     def get(self, request):
         user = get_logged_user(request)
         if not user:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-        data = user.credit_card_expenses.select_related("card").all().order_by("-date", "-id")
-        card_id = request.query_params.get("card_id")
-        if card_id:
-            data = data.filter(card_id=card_id)
-        return Response(
-            [
-                {
-                    "id": e.id,
-                    "card_id": e.card_id,
-                    "card_last4": e.card.last4,
-                    "card_name": e.card.nickname or f"****{e.card.last4}",
-                    "date": e.date.strftime("%Y-%m-%d"),
-                    "category": e.category,
-                    "description": e.description,
-                    "amount": e.amount,
-                }
-                for e in data
-            ]
-        )
+        return Response(build_credit_card_expenses_payload(user, request.query_params.get("card_id")))
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -2156,7 +3838,7 @@ class CreditCardExpenseCreateView(APIView):
             description=request.data.get("description", "") or "",
             amount=amount,
         )
-        sync_credit_card_bills(user, card)
+        sync_credit_card_bills(user, card, purchase_dates=[expense.date])
         return Response({"message": "Gasto no cartão criado", "id": expense.id}, status=status.HTTP_201_CREATED)
 
 
@@ -2172,6 +3854,7 @@ class CreditCardExpenseDetailView(APIView):
             return Response({"error": "Gasto não encontrado"}, status=status.HTTP_404_NOT_FOUND)
 
         old_card = expense.card
+        old_date = expense.date
         card_id = request.data.get("card_id") or expense.card_id
         try:
             card = user.credit_cards.get(id=card_id)
@@ -2194,9 +3877,11 @@ class CreditCardExpenseDetailView(APIView):
         expense.amount = amount
         expense.save()
 
-        sync_credit_card_bills(user, card)
         if old_card.id != card.id:
-            sync_credit_card_bills(user, old_card)
+            sync_credit_card_bills(user, card, purchase_dates=[expense.date])
+            sync_credit_card_bills(user, old_card, purchase_dates=[old_date])
+        else:
+            sync_credit_card_bills(user, card, purchase_dates=[old_date, expense.date])
         return Response({"message": "Gasto no cartão atualizado"}, status=status.HTTP_200_OK)
 
     def delete(self, request, expense_id):
@@ -2209,135 +3894,128 @@ class CreditCardExpenseDetailView(APIView):
             return Response({"error": "Gasto não encontrado"}, status=status.HTTP_404_NOT_FOUND)
 
         card = expense.card
+        purchase_date = expense.date
         expense.delete()
-        sync_credit_card_bills(user, card)
+        sync_credit_card_bills(user, card, purchase_dates=[purchase_date])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def build_credit_card_summary_payload(user, month, year):
+    cards = list(user.credit_cards.all())
+    cards_by_id = {c.id: c for c in cards}
+    # competence_* e mantida na escrita (stamp_expense_competence): filtra o mes no banco
+    month_expenses = user.credit_card_expenses.filter(
+        competence_year=year,
+        competence_month=month,
+    ).values_list("card_id", "category", "amount")
+    owner_limit_map = {}
+    owner_card_map = {}
+    members_by_owner = defaultdict(list)
+    for card in cards:
+        owner_id = get_owner_id_for_card(card, cards_by_id)
+        owner_card = cards_by_id.get(owner_id, card)
+        owner_card_map[owner_id] = owner_card
+        owner_limit_map[owner_id] = float(owner_card.limit_amount or 0)
+        members_by_owner[owner_id].append(card)
+    total_limit = sum(owner_limit_map.values())
+    total_spent = 0.0
+
+    by_category = defaultdict(float)
+    by_card = defaultdict(float)
+    by_billing = defaultdict(float)
+    points_total = 0.0
+    points_brl_base = 0.0
+    usd_brl_quote = get_usd_brl_quote()
+    effective_rate = float((usd_brl_quote or {}).get("rate") or 0)
+    for card_id, category, amount in month_expenses:
+        card = cards_by_id[card_id]
+        owner_id = get_owner_id_for_card(card, cards_by_id)
+        total_spent += float(amount or 0)
+        by_category[category] += float(amount or 0)
+        by_card[f"****{card.last4}"] += float(amount or 0)
+        by_billing[owner_id] += float(amount or 0)
+        amount_brl = float(amount or 0)
+        points_per_usd = float(card.miles_per_point or 0)
+        points_brl_base += amount_brl * points_per_usd
+        if effective_rate > 0:
+            points_total += (amount_brl / effective_rate) * points_per_usd
+
+    by_category_rows = [{"category": k, "total": round(v, 2)} for k, v in by_category.items()]
+    by_category_rows.sort(key=lambda x: x["total"], reverse=True)
+    by_card_rows = [{"card": k, "total": round(v, 2)} for k, v in by_card.items()]
+    by_card_rows.sort(key=lambda x: x["total"], reverse=True)
+    by_billing_rows = []
+    for owner_id in owner_limit_map.keys():
+        used = by_billing.get(owner_id, 0.0)
+        owner = owner_card_map.get(owner_id)
+        if not owner:
+            continue
+        members = members_by_owner[owner_id]
+        by_billing_rows.append(
+            {
+                "owner_card_id": owner_id,
+                "owner_name": owner.nickname or f"Cartão {owner.last4}",
+                "owner_last4": owner.last4,
+                "limit_amount": round(float(owner.limit_amount or 0), 2),
+                "used_amount": round(float(used), 2),
+                "used_percent": round((float(used) / float(owner.limit_amount or 1)) * 100, 2) if float(owner.limit_amount or 0) > 0 else 0,
+                "member_cards": [
+                    {
+                        "id": c.id,
+                        "nickname": c.nickname,
+                        "last4": c.last4,
+                    }
+                    for c in members
+                ],
+            }
+        )
+    by_billing_rows.sort(key=lambda x: x["used_amount"], reverse=True)
+
+    upcoming = user.planned_expenses.filter(
+        month_range_q(year, month),
+        source_key__startswith="CC:",
+    ).order_by("date")
+    upcoming_rows = [
+        {
+            "id": p.id,
+            "date": p.date.strftime("%Y-%m-%d"),
+            "category": p.category,
+            "amount": p.amount,
+            "is_paid": p.is_paid,
+        }
+        for p in upcoming
+    ]
+
+    return {
+        "month": month,
+        "year": year,
+        "card_count": len(cards),
+        "total_spent": round(total_spent, 2),
+        "total_limit": round(total_limit, 2),
+        "usage_percent": round((total_spent / total_limit) * 100, 2) if total_limit > 0 else 0,
+        "usd_brl_rate": round(effective_rate, 4) if effective_rate > 0 else None,
+        "usd_brl_timestamp": (usd_brl_quote or {}).get("timestamp"),
+        "usd_brl_create_date": (usd_brl_quote or {}).get("create_date"),
+        "usd_brl_name": (usd_brl_quote or {}).get("name"),
+        "usd_brl_source": (usd_brl_quote or {}).get("source"),
+        "points_brl_base": round(points_brl_base, 4),
+        "estimated_points": round(points_total, 2),
+        "estimated_miles": round(points_total, 2),
+        "by_category": by_category_rows,
+        "by_card": by_card_rows,
+        "by_billing": by_billing_rows,
+        "upcoming_bills": upcoming_rows,
+    }
+
+
 class CreditCardSummaryView(APIView):
     def get(self, request):
         user = get_logged_user(request)
         if not user:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-        today = timezone.now().date()
-        try:
-            month = int(request.query_params.get("month", today.month))
-        except ValueError:
-            month = today.month
-        try:
-            year = int(request.query_params.get("year", today.year))
-        except ValueError:
-            year = today.year
-
-        cards = list(user.credit_cards.select_related("parent_card").all())
-        cards_by_id = {c.id: c for c in cards}
-        all_expenses = user.credit_card_expenses.select_related("card").all()
-        owner_limit_map = {}
-        owner_card_map = {}
-        for card in cards:
-            owner_id = get_owner_id_for_card(card, cards_by_id)
-            owner_card = cards_by_id.get(owner_id, card)
-            owner_card_map[owner_id] = owner_card
-            owner_limit_map[owner_id] = float(owner_card.limit_amount or 0)
-        total_limit = sum(owner_limit_map.values())
-        total_spent = 0.0
-
-        by_category = defaultdict(float)
-        by_card = defaultdict(float)
-        by_billing = defaultdict(float)
-        points_total = 0.0
-        points_brl_base = 0.0
-        usd_brl_quote = fetch_usd_brl_quote()
-        effective_rate = float((usd_brl_quote or {}).get("rate") or 0)
-        for expense in all_expenses:
-            owner_id = get_owner_id_for_card(expense.card, cards_by_id)
-            owner_card = owner_card_map.get(owner_id, expense.card)
-            _, _, _, comp_year, comp_month = card_invoice_period_and_due(owner_card, expense.date)
-            if comp_year != year or comp_month != month:
-                continue
-            total_spent += float(expense.amount or 0)
-            by_category[expense.category] += float(expense.amount or 0)
-            by_card[f"****{expense.card.last4}"] += float(expense.amount or 0)
-            by_billing[owner_id] += float(expense.amount or 0)
-            amount_brl = float(expense.amount or 0)
-            points_per_usd = float(expense.card.miles_per_point or 0)
-            points_brl_base += amount_brl * points_per_usd
-            if effective_rate > 0:
-                points_total += (amount_brl / effective_rate) * points_per_usd
-
-        by_category_rows = [{"category": k, "total": round(v, 2)} for k, v in by_category.items()]
-        by_category_rows.sort(key=lambda x: x["total"], reverse=True)
-        by_card_rows = [{"card": k, "total": round(v, 2)} for k, v in by_card.items()]
-        by_card_rows.sort(key=lambda x: x["total"], reverse=True)
-        by_billing_rows = []
-        for owner_id in owner_limit_map.keys():
-            used = by_billing.get(owner_id, 0.0)
-            owner = owner_card_map.get(owner_id)
-            if not owner:
-                continue
-            members = [
-                c for c in cards
-                if get_owner_id_for_card(c, cards_by_id) == owner_id
-            ]
-            by_billing_rows.append(
-                {
-                    "owner_card_id": owner_id,
-                    "owner_name": owner.nickname or f"Cartão {owner.last4}",
-                    "owner_last4": owner.last4,
-                    "limit_amount": round(float(owner.limit_amount or 0), 2),
-                    "used_amount": round(float(used), 2),
-                    "used_percent": round((float(used) / float(owner.limit_amount or 1)) * 100, 2) if float(owner.limit_amount or 0) > 0 else 0,
-                    "member_cards": [
-                        {
-                            "id": c.id,
-                            "nickname": c.nickname,
-                            "last4": c.last4,
-                        }
-                        for c in members
-                    ],
-                }
-            )
-        by_billing_rows.sort(key=lambda x: x["used_amount"], reverse=True)
-
-        upcoming = user.planned_expenses.filter(
-            source_key__startswith="CC:",
-            date__year=year,
-            date__month=month,
-        ).order_by("date")
-        upcoming_rows = [
-            {
-                "id": p.id,
-                "date": p.date.strftime("%Y-%m-%d"),
-                "category": p.category,
-                "amount": p.amount,
-                "is_paid": p.is_paid,
-            }
-            for p in upcoming
-        ]
-
-        return Response(
-            {
-                "month": month,
-                "year": year,
-                "card_count": len(cards),
-                "total_spent": round(total_spent, 2),
-                "total_limit": round(total_limit, 2),
-                "usage_percent": round((total_spent / total_limit) * 100, 2) if total_limit > 0 else 0,
-                "usd_brl_rate": round(effective_rate, 4) if effective_rate > 0 else None,
-                "usd_brl_timestamp": (usd_brl_quote or {}).get("timestamp"),
-                "usd_brl_create_date": (usd_brl_quote or {}).get("create_date"),
-                "usd_brl_name": (usd_brl_quote or {}).get("name"),
-                "usd_brl_source": (usd_brl_quote or {}).get("source"),
-                "points_brl_base": round(points_brl_base, 4),
-                "estimated_points": round(points_total, 2),
-                "estimated_miles": round(points_total, 2),
-                "by_category": by_category_rows,
-                "by_card": by_card_rows,
-                "by_billing": by_billing_rows,
-                "upcoming_bills": upcoming_rows,
-            }
-        )
+        month, year = parse_month_year(request.query_params)
+        return Response(build_credit_card_summary_payload(user, month, year))
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -2357,6 +4035,10 @@ class PlannerCreateView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        recurrence, error = parse_recurrence_fields(request.data)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
         planned = PlannedExpense.objects.create(
             user=user,
             date=date,
@@ -2365,8 +4047,11 @@ class PlannerCreateView(APIView):
             amount=amount,
             is_recurring=parse_bool(request.data.get("is_recurring", False)),
             is_paid=parse_bool(request.data.get("is_paid", False)),
+            **recurrence,
         )
 
+        invalidate_planned_projection(user.id)
+
         return Response(
             {
                 "message": "Despesa fixa criada",
@@ -2393,6 +4078,10 @@ class PlannedIncomeCreateView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        recurrence, error = parse_recurrence_fields(request.data)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
         planned = PlannedIncome.objects.create(
             user=user,
             date=date,
@@ -2400,8 +4089,11 @@ class PlannedIncomeCreateView(APIView):
             description=request.data.get("description", ""),
             amount=amount,
             is_recurring=parse_bool(request.data.get("is_recurring", False)),
+            **recurrence,
         )
 
+        invalidate_planned_projection(user.id)
+
         return Response(
             {
                 "message": "Entrada fixa criada",
@@ -2428,6 +4120,10 @@ class PlannedReserveCreateView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        recurrence, error = parse_recurrence_fields(request.data)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
         planned = PlannedReserve.objects.create(
             user=user,
             date=date,
@@ -2435,8 +4131,11 @@ class PlannedReserveCreateView(APIView):
             description=request.data.get("description", ""),
             amount=amount,
             is_recurring=parse_bool(request.data.get("is_recurring", False)),
+            **recurrence,
         )
 
+        invalidate_planned_projection(user.id)
+
         return Response(
             {
                 "message": "Reserva criada",
@@ -2471,13 +4170,20 @@ class PlannerDetailView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        recurrence, error = parse_recurrence_fields(request.data, planned)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
         planned.date = date
         planned.category = category
         planned.description = request.data.get("description", "")
         planned.amount = amount
         planned.is_recurring = parse_bool(request.data.get("is_recurring", False))
         planned.is_paid = parse_bool(request.data.get("is_paid", False))
+        for field, value in recurrence.items():
+            setattr(planned, field, value)
         planned.save()
+        invalidate_planned_projection(user.id)
 
         return Response({"message": "Despesa fixa atualizada"}, status=status.HTTP_200_OK)
 
@@ -2495,6 +4201,7 @@ class PlannerDetailView(APIView):
             )
 
         planned.delete()
+        invalidate_planned_projection(user.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -2523,12 +4230,19 @@ class PlannedIncomeDetailView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        recurrence, error = parse_recurrence_fields(request.data, planned)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
         planned.date = date
         planned.category = category
         planned.description = request.data.get("description", "")
         planned.amount = amount
         planned.is_recurring = parse_bool(request.data.get("is_recurring", False))
+        for field, value in recurrence.items():
+            setattr(planned, field, value)
         planned.save()
+        invalidate_planned_projection(user.id)
 
         return Response({"message": "Entrada fixa atualizada"}, status=status.HTTP_200_OK)
 
@@ -2546,6 +4260,7 @@ class PlannedIncomeDetailView(APIView):
             )
 
         planned.delete()
+        invalidate_planned_projection(user.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -2574,12 +4289,19 @@ class PlannedReserveDetailView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        recurrence, error = parse_recurrence_fields(request.data, planned)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
         planned.date = date
         planned.category = category
         planned.description = request.data.get("description", "")
         planned.amount = amount
         planned.is_recurring = parse_bool(request.data.get("is_recurring", False))
+        for field, value in recurrence.items():
+            setattr(planned, field, value)
         planned.save()
+        invalidate_planned_projection(user.id)
 
         return Response({"message": "Reserva atualizada"}, status=status.HTTP_200_OK)
 
@@ -2597,41 +4319,107 @@ class PlannedReserveDetailView(APIView):
             )
 
         planned.delete()
+        invalidate_planned_projection(user.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class StatsBaseView(APIView):
-    delta_days = 1
+def build_stats_payload(total_receita, total_despesa, movimentacoes):
+    total = total_receita + total_despesa or 1
 
-    def get(self, request):
-        user = get_logged_user(request)
-        if not user:
-            return Response(status=status.HTTP_401_UNAUTHORIZED)
+    percent_receita = round((total_receita / total) * 100)
+    percent_despesa = round((total_despesa / total) * 100)
 
-        start_date = timezone.now().date() - timedelta(days=self.delta_days - 1)
+    return {
+        "total_receita": total_receita,
+        "total_despesa": total_despesa,
+        "movimentacoes": movimentacoes,
+        "percent_receita": percent_receita,
+        "percent_despesa": percent_despesa,
+    }
+
+
+STATS_DEFAULT_WINDOWS = (1, 7, 30)
+STATS_MAX_WINDOWS = 12
+STATS_MAX_WINDOW_DAYS = 3660
 
-        qs = FinancialEntry.objects.filter(user=user, date__gte=start_date)
 
-        total_receita = qs.filter(entry_type="RECEITA").aggregate(total=Sum("amount"))["total"] or 0
-        total_despesa = qs.filter(entry_type="DESPESA").aggregate(total=Sum("amount"))["total"] or 0
-        movimentacoes = qs.count()
+def parse_stats_windows(raw):
+    raw = str(raw or "").strip()
+    if not raw:
+        return list(STATS_DEFAULT_WINDOWS), None
+    windows = set()
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            days = int(part)
+        except ValueError:
+            return None, f"Janela invalida: {part}"
+        if not 1 <= days <= STATS_MAX_WINDOW_DAYS:
+            return None, f"Janelas devem ficar entre 1 e {STATS_MAX_WINDOW_DAYS} dias"
+        windows.add(days)
+    if not windows:
+        return list(STATS_DEFAULT_WINDOWS), None
+    if len(windows) > STATS_MAX_WINDOWS:
+        return None, f"Maximo de {STATS_MAX_WINDOWS} janelas"
+    return sorted(windows), None
+
+
+def rolling_window_stats(user, windows, today=None):
+    """Estatisticas de cada janela movel (ultimos N dias, hoje incluso) numa unica consulta.
+
+    Cada janela vira um SUM/COUNT com filtro condicional sobre o mesmo recorte
+    de FinancialEntry, limitado pela janela mais larga.
+    """
+    today = today or timezone.now().date()
+    aggregates = {}
+    for days in windows:
+        since = Q(date__gte=today - timedelta(days=days - 1))
+        aggregates[f"receita_{days}"] = Sum("amount", filter=since & Q(entry_type="RECEITA"))
+        aggregates[f"despesa_{days}"] = Sum("amount", filter=since & Q(entry_type="DESPESA"))
+        aggregates[f"count_{days}"] = Count("id", filter=since)
+    widest = max(windows)
+    row = user.entries.filter(date__gte=today - timedelta(days=widest - 1)).aggregate(**aggregates)
+    return {
+        days: build_stats_payload(row[f"receita_{days}"] or 0, row[f"despesa_{days}"] or 0, row[f"count_{days}"])
+        for days in windows
+    }
 
-        total = total_receita + total_despesa or 1
 
-        percent_receita = round((total_receita / total) * 100)
-        percent_despesa = round((total_despesa / total) * 100)
+class StatsView(APIView):
+    def get(self, request):
+        user = get_logged_user(request)
+        if not user:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
 
+        windows, error = parse_stats_windows(request.query_params.get("windows"))
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        today = timezone.now().date()
+        stats = rolling_window_stats(user, windows, today)
         return Response(
             {
-                "total_receita": total_receita,
-                "total_despesa": total_despesa,
-                "movimentacoes": movimentacoes,
-                "percent_receita": percent_receita,
-                "percent_despesa": percent_despesa,
+                "date": today.strftime("%Y-%m-%d"),
+                "windows": {
+                    str(days): {"start_date": (today - timedelta(days=days - 1)).strftime("%Y-%m-%d"), **stats[days]}
+                    for days in windows
+                },
             }
         )
 
 
+class StatsBaseView(APIView):
+    delta_days = 1
+
+    def get(self, request):
+        user = get_logged_user(request)
+        if not user:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        return Response(rolling_window_stats(user, (self.delta_days,))[self.delta_days])
+
+
 class DailyStatsView(StatsBaseView):
     delta_days = 1
 
@@ -2644,6 +4432,189 @@ class MonthlyStatsView(StatsBaseView):
     delta_days = 30
 
 
+DASHBOARD_BOOTSTRAP_FIELDS = (
+    "dashboard",
+    "categories",
+    "entries",
+    "planner",
+    "fixed_incomes",
+    "reserves",
+    "stats_daily",
+    "stats_weekly",
+    "stats_monthly",
+    "credit_cards",
+    "credit_card_expenses",
+    "credit_card_summary",
+    "vehicle_summary",
+)
+DASHBOARD_BOOTSTRAP_STATS = {
+    "stats_daily": DailyStatsView.delta_days,
+    "stats_weekly": WeeklyStatsView.delta_days,
+    "stats_monthly": MonthlyStatsView.delta_days,
+}
+
+
+def build_dashboard_bootstrap_payload(user, fields, month, year, entries_limit):
+    data = {}
+    if "dashboard" in fields or "categories" in fields:
+        category_totals = entry_category_totals(user)
+        if "dashboard" in fields:
+            data["dashboard"] = build_dashboard_payload(user, category_totals)
+        if "categories" in fields:
+            data["categories"] = build_dashboard_categories_payload(user, category_totals)
+
+    stats_fields = [f for f in fields if f in DASHBOARD_BOOTSTRAP_STATS]
+    if stats_fields:
+        stats = rolling_window_stats(user, sorted({DASHBOARD_BOOTSTRAP_STATS[f] for f in stats_fields}))
+        for field in stats_fields:
+            data[field] = stats[DASHBOARD_BOOTSTRAP_STATS[field]]
+
+    if "entries" in fields:
+        data["entries"] = build_entries_payload(user, entries_limit)
+    if "planner" in fields:
+        data["planner"] = build_planner_payload(user)
+    if "fixed_incomes" in fields:
+        data["fixed_incomes"] = build_planned_incomes_payload(user)
+    if "reserves" in fields:
+        data["reserves"] = build_planned_reserves_payload(user)
+    if "credit_cards" in fields:
+        data["credit_cards"] = build_credit_cards_payload(user)
+    if "credit_card_expenses" in fields:
+        data["credit_card_expenses"] = build_credit_card_expenses_payload(user)
+    if "credit_card_summary" in fields:
+        data["credit_card_summary"] = build_credit_card_summary_payload(user, month, year)
+    if "vehicle_summary" in fields:
+        data["vehicle_summary"] = build_vehicle_summary_payload(user, month, year)
+
+    return data
+
+
+class DashboardBootstrapView(APIView):
+    def get(self, request):
+        user = get_logged_user(request)
+        if not user:
+            return Response(
+                {"error": "Nao autenticado"},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        raw_fields = str(request.query_params.get("fields", "")).strip()
+        if raw_fields:
+            fields = [f.strip() for f in raw_fields.split(",") if f.strip()]
+            unknown = sorted(set(fields) - set(DASHBOARD_BOOTSTRAP_FIELDS))
+            if unknown:
+                return Response(
+                    {"error": f"Campos invalidos: {', '.join(unknown)}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        else:
+            fields = list(DASHBOARD_BOOTSTRAP_FIELDS)
+        month, year = parse_month_year(request.query_params)
+
+        data = build_dashboard_bootstrap_payload(
+            user,
+            fields,
+            month,
+            year,
+            parse_entries_limit(request.query_params, default=500),
+        )
+        return Response(data)
+
+
+def outbound_retry_delay(attempts):
+    base = int(os.getenv("GENFIN_OUTBOUND_RETRY_BASE", "30"))
+    return timedelta(seconds=min(base * (2 ** max(attempts - 1, 0)), 3600))
+
+
+def claim_outbound_messages(limit=100, lease_seconds=300):
+    # Reserva mensagens vencidas empurrando next_attempt_at para frente; se o worker
+    # cair no meio do envio a mensagem volta a ficar elegivel quando o prazo expirar.
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundMessage.objects.select_for_update(skip_locked=True)
+            .filter(status="PENDENTE", next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")
+            .values_list("id", flat=True)[:limit]
+        )
+        OutboundMessage.objects.filter(id__in=ids).update(next_attempt_at=now + timedelta(seconds=lease_seconds))
+    return list(OutboundMessage.objects.filter(id__in=ids).order_by("id"))
+
+
+def deliver_outbound_batch(target_url, messages):
+    # Todas as mensagens do mesmo destino reaproveitam uma unica conexao HTTP.
+    parsed = urlsplit(target_url)
+    connection_class = HTTPSConnection if parsed.scheme == "https" else HTTPConnection
+    conn = connection_class(parsed.netloc, timeout=12)
+    path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+    sent = []
+    failed = []
+    try:
+        for message in messages:
+            message.attempts += 1
+            try:
+                with external_call("n8n"):
+                    conn.request(
+                        "POST",
+                        path,
+                        body=json.dumps(message.payload).encode("utf-8"),
+                        headers={"Content-Type": "application/json"},
+                    )
+                    response = conn.getresponse()
+                    response.read()
+                message.last_status_code = response.status
+                if response.status >= 400:
+                    raise ValueError(f"HTTP {response.status}")
+            except Exception as exc:
+                conn.close()
+                message.last_error = str(exc)[:500]
+                if message.attempts >= message.max_attempts:
+                    message.status = "FALHOU"
+                else:
+                    message.next_attempt_at = timezone.now() + outbound_retry_delay(message.attempts)
+                failed.append(message)
+                continue
+            message.status = "ENVIADO"
+            message.last_error = ""
+            message.sent_at = timezone.now()
+            sent.append(message)
+    finally:
+        conn.close()
+
+    OutboundMessage.objects.bulk_update(
+        sent + failed,
+        ["status", "attempts", "next_attempt_at", "last_status_code", "last_error", "sent_at"],
+    )
+    return len(sent), len(failed)
+
+
+def process_outbound_messages(limit=100):
+    by_target = defaultdict(list)
+    for message in claim_outbound_messages(limit=limit):
+        by_target[message.target_url].append(message)
+
+    totals = {"sent": 0, "failed": 0}
+    for target_url, messages in by_target.items():
+        sent, failed = deliver_outbound_batch(target_url, messages)
+        totals["sent"] += sent
+        totals["failed"] += failed
+    return totals
+
+
+def serialize_outbound_message(message):
+    return {
+        "id": message.id,
+        "status": message.status,
+        "attempts": message.attempts,
+        "max_attempts": message.max_attempts,
+        "next_attempt_at": message.next_attempt_at if message.status == "PENDENTE" else None,
+        "last_status_code": message.last_status_code,
+        "last_error": message.last_error or None,
+        "created_at": message.created_at,
+        "sent_at": message.sent_at,
+    }
+
+
 class WhatsAppSummaryWebhookView(APIView):
     def post(self, request):
         user = get_logged_user(request)
@@ -2669,28 +4640,74 @@ class WhatsAppSummaryWebhookView(APIView):
             webhook_url = "https://n8n.lowcodeforward.com/webhook-test/genfinWpp"
         else:
             webhook_url = "https://n8n.lowcodeforward.com/webhook/genfinWpp"
-        req = urllib_request.Request(
-            webhook_url,
-            data=json.dumps(outbound).encode("utf-8"),
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
 
-        try:
-            with urllib_request.urlopen(req, timeout=12) as resp:
-                webhook_status = resp.getcode()
-        except Exception as exc:
-            return Response(
-                {"error": "Falha ao enviar para webhook", "detail": str(exc)},
-                status=status.HTTP_502_BAD_GATEWAY,
-            )
+        message = OutboundMessage.objects.create(
+            user=user,
+            target_url=webhook_url,
+            payload=outbound,
+            next_attempt_at=timezone.now(),
+        )
 
         return Response(
-            {"message": "Resumo enviado", "webhook_status": webhook_status, "mode": mode},
-            status=status.HTTP_200_OK,
+            {"message": "Resumo enfileirado", "id": message.id, "status": message.status, "mode": mode},
+            status=status.HTTP_202_ACCEPTED,
         )
 
 
+class WhatsAppSummaryStatusView(APIView):
+    def get(self, request, message_id):
+        user = get_logged_user(request)
+        if not user:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+        try:
+            message = user.outbound_messages.get(id=message_id)
+        except OutboundMessage.DoesNotExist:
+            return Response({"error": "Mensagem nao encontrada"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(serialize_outbound_message(message))
+
+
+def delete_media_files(names):
+    for name in names:
+        try:
+            os.remove(os.path.join(settings.MEDIA_ROOT, name))
+        except OSError:
+            pass
+
+
+def reset_user_financial_data(user):
+    # DELETEs por conjunto na ordem das dependencias (filhos antes dos pais); _raw_delete
+    # nao carrega linhas nem dispara cascatas/sinais do ORM, entao a transacao fica curta.
+    entries = user.entries.exclude(receipt_file="").exclude(receipt_file__isnull=True)
+    blob_ids = list(entries.filter(receipt_blob__isnull=False).values_list("receipt_blob_id", flat=True))
+    legacy_files = list(entries.filter(receipt_blob__isnull=True).values_list("receipt_file", flat=True))
+
+    steps = [
+        ("credit_card_expenses", CreditCardExpense.objects.filter(user=user)),
+        ("credit_cards", CreditCard.objects.filter(user=user)),
+        ("trip_tolls", TripToll.objects.filter(trip__user=user)),
+        ("trip_plans", TripPlan.objects.filter(user=user)),
+        ("vehicle_expenses", VehicleExpense.objects.filter(user=user)),
+        ("vehicle_destinations", VehicleFrequentDestination.objects.filter(user=user)),
+        ("vehicles", Vehicle.objects.filter(user=user)),
+        ("planned_reserves", PlannedReserve.objects.filter(user=user)),
+        ("planned_incomes", PlannedIncome.objects.filter(user=user)),
+        ("planned_expenses", PlannedExpense.objects.filter(user=user)),
+        ("entries", FinancialEntry.objects.filter(user=user)),
+        ("entry_rollups", FinancialEntryMonthlyRollup.objects.filter(user=user)),
+    ]
+    counts = {}
+    with transaction.atomic():
+        for label, queryset in steps:
+            counts[label] = queryset._raw_delete(queryset.db)
+        counts["receipt_blobs"] = release_receipt_blobs(blob_ids)
+        # apagados na propria requisicao, logo apos o commit (mesmo caminho dos blobs):
+        # uma thread daemon perderia o trabalho se o worker reciclasse
+        if legacy_files:
+            transaction.on_commit(functools.partial(delete_media_files, legacy_files))
+    invalidate_planned_projection(user.id)
+    return counts
+
+
 class ProfileResetDataView(APIView):
     def delete(self, request):
         user = get_logged_user(request)
@@ -2711,43 +4728,8 @@ class ProfileResetDataView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        entries_with_receipts = list(
-            user.entries
-            .exclude(receipt_file="")
-            .exclude(receipt_file__isnull=True)
-        )
-
         try:
-            with transaction.atomic():
-
-                # Remove comprovantes físicos
-                for entry in entries_with_receipts:
-                    if entry.receipt_file:
-                        try:
-                            entry.receipt_file.delete(save=False)
-                        except Exception:
-                            pass
-
-                # Cartões
-                user.credit_card_expenses.all().delete()
-                user.credit_cards.all().delete()
-
-                # Viagens
-                user.trip_plans.all().delete()
-
-                # Veículos
-                user.vehicle_expenses.all().delete()
-                user.vehicle_destinations.all().delete()
-                user.vehicles.all().delete()
-
-                # Planejamento
-                user.planned_reserves.all().delete()
-                user.planned_incomes.all().delete()
-                user.planned_expenses.all().delete()
-
-                # Movimentações
-                user.entries.all().delete()
-
+            deleted = reset_user_financial_data(user)
         except Exception as error:
             print("ERRO RESET GENFIN:", error)
 
@@ -2758,7 +4740,28 @@ class ProfileResetDataView(APIView):
 
         return Response(
             {
-                "message": "Dados financeiros zerados com sucesso."
+                "message": "Dados financeiros zerados com sucesso.",
+                "deleted": deleted,
             },
             status=status.HTTP_200_OK,
-        )
\ No newline at end of file
+        )
+
+
+class RequestMetricsView(APIView):
+    # so staff do admin do Django; os histogramas sao do processo que atendeu a chamada
+    def get(self, request):
+        if not request.user.is_staff:
+            return Response(status=status.HTTP_403_FORBIDDEN)
+        return Response(
+            {
+                "enabled": request_metrics_enabled(),
+                "pid": os.getpid(),
+                "routes": route_histograms.snapshot(),
+            }
+        )
+
+    def delete(self, request):
+        if not request.user.is_staff:
+            return Response(status=status.HTTP_403_FORBIDDEN)
+        route_histograms.snapshot(reset=True)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,10 +45,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "accounts.middleware.RequestMetricsMiddleware",
         "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'accounts.middleware.LoggedUserMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -90,6 +93,28 @@ DATABASES = {
 }
 
 
+# Cache
+# Usuario da sessao, versao da projecao do planner e cotacao USD/BRL ficam no cache.
+# Com varios processos (workers do gunicorn, refresh_fx_quote) ele precisa ser
+# compartilhado: GENFIN_CACHE_URL=redis://host:6379/0. Sem a variavel o LocMemCache
+# vale so dentro de um processo; serve para desenvolvimento ou um unico worker.
+GENFIN_CACHE_URL = os.getenv("GENFIN_CACHE_URL", "")
+
+if GENFIN_CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": GENFIN_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -138,6 +163,18 @@ CSRF_TRUSTED_ORIGINS = [
 CSRF_COOKIE_SECURE = True
 SESSION_COOKIE_SECURE = True
 
+# linhas JSON do RequestMetricsMiddleware (ativo com GENFIN_REQUEST_METRICS=1)
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "genfin.requests": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
 JAZZMIN_SETTINGS = {
     "site_title": "GenFin Admin",
     "site_header": "GenFin",